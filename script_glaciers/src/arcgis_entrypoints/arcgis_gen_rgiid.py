@@ -42,6 +42,8 @@ except: ARCPY.AddError('RGI Version Information Error')
 # Run the Generate RGI ID function
 try:
     DP.generate_RGIIDs(rgi_file, rgi_version, rgi_region)
+except ValueError as error: # IDs do not fit the field or are not unique
+    ARCPY.AddError('RGI IDs NOT generated - ' + str(error))
 except:
     ARCPY.AddError('Errors generated during function execution')
 
@@ -85,8 +85,8 @@ class Populate_GLIMS_GUI (object):
             if self.__input_string.get() <> 'Required':
             
                 # Write variables to .var file
-                VAR.set_variable("INPUT_FILE", "STRING", self.__input_string.get())
-                VAR.set_variable("WORKSPACE", "STRING", self.__workspace_string.get())
+                VAR.set_variables({"INPUT_FILE": ("STRING", self.__input_string.get()),
+                                   "WORKSPACE":  ("STRING", self.__workspace_string.get())})
                 
                 # Remove GUI window and destroy it.
                 try: master.destroy()
@@ -86,9 +86,9 @@ class Populate_RGI_GUI (object):
             if self.__input_string.get() <> 'Required':
             
                 # Write variables to .var file
-                VAR.set_variable("INPUT_FILE", "STRING", self.__input_string.get())
-                VAR.set_variable("RGIVERSION", "STRING", self.__rgi_version.get())
-                VAR.set_variable("RGIREGION", "STRING", self.__rgi_region.get())
+                VAR.set_variables({"INPUT_FILE": ("STRING", self.__input_string.get()),
+                                   "RGIVERSION": ("STRING", self.__rgi_version.get()),
+                                   "RGIREGION":  ("STRING", self.__rgi_region.get())})
                 
                 # Remove GUI window and destroy it.
                 try: master.destroy()
@@ -103,8 +103,10 @@ class Populate_RGI_GUI (object):
                     print 'STARTING RGI ID GENERATION'
                     data_pop.generate_RGIIDs(self.__input_string.get(), self.__rgi_version.get(), self.__rgi_region.get())
                     print 'FINISHED RGI ID GENERATION'
+                except ValueError as error: # IDs do not fit the field or are not unique
+                    tkMessageBox.showwarning ('Warning', 'RGI IDs NOT generated. ' + str(error))
                 except:
-                    tkMessageBox.showwarning ('Warning', 'Could NOT Analyze Folder. Check folder paths.')
+                    tkMessageBox.showwarning ('Warning', 'Could NOT generate RGI IDs. Check the input file path.')
             else: 
                 tkMessageBox.showwarning ('Warning', 'You must select Input and Output files.')
                 
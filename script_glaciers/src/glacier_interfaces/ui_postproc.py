@@ -181,24 +181,24 @@ class GUI (object):
             if self.__input_string.get() <> 'Required' and self.__output_string.get() <> 'Required' and self.__dem_string.get() <> 'Required':
             
                 # Write variables to .var file
-                VAR.set_variable("INPUT_FILE", "STRING", self.__input_string.get())
-                VAR.set_variable("DEM", "STRING", self.__dem_string.get())
-                VAR.set_variable("OUTPUT_FOLDER", "STRING", self.__output_string.get())
-                VAR.set_variable("CENTERLINES", "BOOLEAN", self.__centerline_boolean.get())
-                VAR.set_variable("EU_CELL_SIZE", "INTEGER", self.__cellsize_string.get())
-                VAR.set_variable("POWER", "INTEGER", self.__smoothing_string.get())
-                VAR.set_variable("HYPSOMETRY", "BOOLEAN", self.__hypsometry_boolean.get())
-                VAR.set_variable("SLOPE", "BOOLEAN", self.__slope_boolean.get())
-                VAR.set_variable("ASPECT", "BOOLEAN", self.__aspect_boolean.get())
-                VAR.set_variable("GLIMSIDS", "BOOLEAN", self.__glims_boolean.get())
-                VAR.set_variable("RGIIDS", "BOOLEAN", self.__rgi_boolean.get())
-                VAR.set_variable("RGIVERSION", "STRING", self.__rgi_version.get())
-                VAR.set_variable("RGIREGION", "STRING", self.__rgi_region.get())
-                VAR.set_variable("SCALING", "INTEGER", self.__scaling_string.get())
-                VAR.set_variable("BUFFER", "INTEGER", self.__buffer_string.get())
-                VAR.set_variable("MINBIN", "INTEGER", self.__min_string.get())
-                VAR.set_variable("MAXBIN", "INTEGER", self.__max_string.get())
-                VAR.set_variable("BINSIZE", "INTEGER", self.__size_string.get())
+                VAR.set_variables({"INPUT_FILE":    ("STRING", self.__input_string.get()),
+                                   "DEM":           ("STRING", self.__dem_string.get()),
+                                   "OUTPUT_FOLDER": ("STRING", self.__output_string.get()),
+                                   "CENTERLINES":   ("BOOLEAN", self.__centerline_boolean.get()),
+                                   "EU_CELL_SIZE":  ("INTEGER", self.__cellsize_string.get()),
+                                   "POWER":         ("INTEGER", self.__smoothing_string.get()),
+                                   "HYPSOMETRY":    ("BOOLEAN", self.__hypsometry_boolean.get()),
+                                   "SLOPE":         ("BOOLEAN", self.__slope_boolean.get()),
+                                   "ASPECT":        ("BOOLEAN", self.__aspect_boolean.get()),
+                                   "GLIMSIDS":      ("BOOLEAN", self.__glims_boolean.get()),
+                                   "RGIIDS":        ("BOOLEAN", self.__rgi_boolean.get()),
+                                   "RGIVERSION":    ("STRING", self.__rgi_version.get()),
+                                   "RGIREGION":     ("STRING", self.__rgi_region.get()),
+                                   "SCALING":       ("INTEGER", self.__scaling_string.get()),
+                                   "BUFFER":        ("INTEGER", self.__buffer_string.get()),
+                                   "MINBIN":        ("INTEGER", self.__min_string.get()),
+                                   "MAXBIN":        ("INTEGER", self.__max_string.get()),
+                                   "BINSIZE":       ("INTEGER", self.__size_string.get())})
                 
                 output_created = False
                 try: # Creates an output folder to place files. This guarantees and empty folder
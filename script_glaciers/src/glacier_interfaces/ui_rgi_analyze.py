@@ -140,9 +140,9 @@ class Analyze_RGI (object):
             if self.__input_string.get() <> 'Required' and self.__output_string.get() <> 'REQUIRED':
             
                 # Write variables to .var file
-                VAR.set_variable("INPUT_FOLDER", "STRING", self.__input_string.get())
-                VAR.set_variable("OUTPUT_FOLDER", "STRING", self.__output_string.get())
-                VAR.set_variable("RGIVERSION", "STRING", self.__rgi_version.get())
+                VAR.set_variables({"INPUT_FOLDER":  ("STRING", self.__input_string.get()),
+                                   "OUTPUT_FOLDER": ("STRING", self.__output_string.get()),
+                                   "RGIVERSION":    ("STRING", self.__rgi_version.get())})
                 
                 # Remove GUI window and destroy it.
                 try: master.destroy()
@@ -96,8 +96,8 @@ class format_RGI_GUI (object):
             if self.__input_string.get() <> 'Required' and self.__output_string.get() <> 'Required':
             
                 # Write variables to .var file
-                VAR.set_variable("INPUT_FILE", "STRING", self.__input_string.get())
-                VAR.set_variable("OUTPUT_FILE", "STRING", self.__output_string.get())
+                VAR.set_variables({"INPUT_FILE":  ("STRING", self.__input_string.get()),
+                                   "OUTPUT_FILE": ("STRING", self.__output_string.get())})
                 
                 # Put together mapping dictionary
                 mapping_dict = {}
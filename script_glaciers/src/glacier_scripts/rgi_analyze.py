@@ -24,11 +24,13 @@ import sys, os
 sys.path.append (os.path.dirname(os.path.dirname(__file__)))
 
 import glob
+import multiprocessing
 import arcpy as ARCPY                                        #@UnresolvedImport
 import glacier_utilities.functions.data_prep as DP
 import glacier_utilities.functions.data_pop as POP
 import glacier_utilities.functions.data_checks as CHECK
 import glacier_utilities.general_utilities.environment as ENV
+import glacier_utilities.general_utilities.file_cache as FILE_CACHE
 
 class rgi_analysis ():
     
@@ -39,6 +41,8 @@ class rgi_analysis ():
         output_folder = variables.read_variable('OUTPUT_FOLDER')
         check_header = variables.read_variable('RGI_SPEC')
         version = variables.read_variable('RGIVERSION')
+        workers = variables.read_variable('WORKERS')
+        backend = variables.read_variable('GEOMETRY_BACKEND')
 
         # Setup working environment
         environment = ENV.setup_arcgis(output_folder)
@@ -50,113 +54,43 @@ class rgi_analysis ():
         __Log.print_line('Output Folder: ' + output_folder)
         __Log.print_line('RGI Header to Match (Name Only): ')
         __Log.print_line('   ' + str(check_header))
+        __Log.print_line('Worker Processes: ' + str(workers))
+        __Log.print_line('Geometry Backend: ' + str(backend))
         __Log.print_break()
         
         tracking_list = [["File Name", "Tot.", "GM", "M-P", "Area km2", "% Diff.", "Topology Errors", "Date Error", "Format Error", "Case Error", "Sliver Error"]] # A list to hold tracking information
         
+        # Files unchanged since they were last analyzed with the same settings
+        # reuse their tracking information and log section from the cache.
+        cache = FILE_CACHE.FileCache(output_folder + '\\Analysis_Cache.json')
+        settings = str(check_header) + '|' + str(version) + '|' + str(backend)
+        
+        shapefiles = glob.glob (os.path.join (input_folder, '*.shp'))
+        cached = {} # Shapefile: [tracking information, log lines]
+        pending = [] # Shapefiles to analyze
+        for shapefile in shapefiles:
+            result = cache.lookup(os.path.basename(shapefile), FILE_CACHE.shapefile_parts(shapefile), settings)
+            if result is not None and ARCPY.Exists(output_folder + '\\' + os.path.basename(shapefile)):
+                cached[shapefile] = result
+            else:
+                pending.append(shapefile)
+        
+        if workers > 1: # Analyze each shapefile in its own process
+            analyzed = analyze_parallel(pending, output_folder, workspace, check_header, version, workers, backend)
+        else:
+            analyzed = (analyze_shapefile(shapefile, output_folder, workspace, check_header, version, backend) for shapefile in pending)
+        
         # For each feature class within the input folder...
-        for shapefile in glob.glob (os.path.join (input_folder, '*.shp')):
-            tracking_info = [] # A list to hold individual tracking information
-            
-            __Log.print_line(os.path.basename(shapefile))
-            tracking_info.append(os.path.basename(shapefile)[0:12])
-            tracking_info.append(str(ARCPY.GetCount_management(shapefile)))
-                    
-            # Copy feature to workspace (output folder)
-            working_shapefile = output_folder + '\\' + os.path.basename(shapefile)
-            ARCPY.CopyFeatures_management (shapefile, working_shapefile)
-
-
-            # Check to see if the input file follows RGI table headings.
-            formate_error, not_found = DP.check_formate(working_shapefile, check_header)
-            if formate_error == False:
-                __Log.print_line('    Input header information is consistent with the standard set')
-            if formate_error == True:
-                __Log.print_line('    ERROR - Input header information is NOT consistent with the standard set')
-                __Log.print_line('        Items not found: ' + not_found)
-                
-            # Check geometries. If there are errors, correct them and print the
-            # results to the log file
-            repair = DP.repair_geometry(working_shapefile)
-            __Log.print_line('    Geometry - ' + repair[0] + ' errors found (Repaired ' + str(int(repair [0]) - int(repair[1])) + ')')
-            tracking_info.append(str(repair[0]))
-                
-            # Check to see if there are any multi-part polygons in the input file. If
-            # so, prompt the user to stop and correct. Print to log file.
-            multipart = DP.check_multipart(working_shapefile, workspace) # Check for multi-part Polygons
-            __Log.print_line('    Multi-Part Polygons - ' + multipart + ' found')
-            tracking_info.append(str(multipart))
-             
-            # Check to see if the area from the AREA column matches the actual area
-            # calculated. If not signal the user to correct. Print results to log.
-            area = DP.check_area(working_shapefile, workspace)
-            __Log.print_line('    Area - ' + area[2] + ' difference')
-            __Log.print_line('        Original area: ' + area[0] + ' , Final area: ' + area[1], True)
-            tracking_info.append(area [0])
-            tracking_info.append(str(round(( (float(area[0])/float(area[1])) *100.0) -100.0, 1)))
-             
-            # Check to see if there are any topology errors in the input file. If there 
-            # are signal the user to correct before moving forward. Print to log.
-            topology = DP.check_topology(working_shapefile, workspace)
-            __Log.print_line('    Topology - ' + topology[0] + ' errors on ' + topology[1] + ' features')
-            __Log.print_line('        Rule set - Must Not Overlap (Area)', True)
-            tracking_info.append(str(topology[0]))
-             
-            # Check to see if the fix column lengths such as RGIID, GLIMSID, GLACTYPE
-            # are consistent with what is expected.      
-            __Log.print_line('    Field Length Check:')
-            RGI_length = CHECK.check_attribute_length(working_shapefile, 'RGIID')
-            GLIMS_length = CHECK.check_attribute_length(working_shapefile, 'GLIMSID')
-            GLACTYPE_Length = CHECK.check_attribute_length(working_shapefile, 'GLACTYPE')
-            BGNDATE_Length = CHECK.check_attribute_length(working_shapefile, 'BGNDATE')
-            ENDDATE_Length = CHECK.check_attribute_length(working_shapefile, 'ENDDATE')
-            __Log.print_line('        RGID Expected: 14 - Actual Length(s): ' + ','.join(RGI_length), True)
-            __Log.print_line('        GLID Expected: 14 - Actual Length(s): ' + ','.join(GLIMS_length), True)
-            __Log.print_line('        GLAC Expected:  4 - Actual Length(s): ' + ','.join(GLACTYPE_Length), True)
-            __Log.print_line('        BGND Expected:  8 - Actual Length(s): ' + ','.join(BGNDATE_Length), True)
-            __Log.print_line('        ENDD Expected:  8 - Actual Length(s): ' + ','.join(ENDDATE_Length), True)
-            
-            # Check to see if the values in the RGIFLAG column has values that are expected
-            RGIFLAG = CHECK.check_attributes(working_shapefile, 'RGIFLAG')
-            GLACTYPE = CHECK.check_attributes(working_shapefile, 'GLACTYPE')
-            __Log.print_line('    RGIFLAG Entries: ' + ','.join(RGIFLAG))
-            __Log.print_line('    GLACTYPE Entries: ' + ','.join(GLACTYPE))
-             
-            # Check no data date values are 9's and not 0's
-            nodata_bgndate = CHECK.check_nodata_data (working_shapefile, 'BGNDATE')
-            __Log.print_line('    Start Date Format 9 and not 0: ' + str(nodata_bgndate))
-            nodata_enddate = CHECK.check_nodata_data (working_shapefile, 'ENDDATE')
-            __Log.print_line('    End Date Format 9 and not 0: ' + str(nodata_enddate))
-            tracking_info.append(str(sum(nodata_bgndate.values()) + sum(nodata_enddate.values())))
-           
-            # Check the date format. Dates should be 'YYYYMMDD'
-            format_error = CHECK.check_date_format (working_shapefile, 'BGNDATE', 'ENDDATE')
-            __Log.print_line('    Date Format Errors: ' + str(format_error))
-            tracking_info.append(str(format_error))
-           
-           
-            # Check for case errors in fields. Should be first letter upper case, 
-            # lower case everything else.
-            case_errors = CHECK.check_is_uppercase(working_shapefile, 'RGIFLAG')
-            __Log.print_line('    RGIFLAG Case Errors: ' + str(case_errors))
-            tracking_info.append(str(case_errors))
-            
-            # Check the number of glaciers that do not meet the threshold
-            threshold_error = CHECK.check_area(working_shapefile, 0.001, 'AREA')
-            __Log.print_line('    Threshold (0.001 km2) Errors: ' + str(threshold_error))
-            tracking_info.append(str(threshold_error))
-           
-            # Regenerate basic stats.
-            POP.auto_generate_RGIIDs (working_shapefile, version)
-            __Log.print_line ('    Recalculated RGI IDs')
+        for shapefile in shapefiles:
+            if shapefile in cached:
+                tracking_info, log_lines = cached[shapefile]
+                log_lines = log_lines + [['    Unchanged since the last analysis - results reused', False]]
+            else: # Results arrive in the same order as the shapefiles
+                tracking_info, log_lines = analyzed.next()
+                cache.store(os.path.basename(shapefile), FILE_CACHE.shapefile_parts(shapefile), 
+                            [tracking_info, log_lines], settings)
             
-            POP.generate_GLIMSIDs(working_shapefile, workspace)
-            __Log.print_line ('    Recalculated GLIMS IDs')
-            
-            POP.generate_centroid(working_shapefile)
-            __Log.print_line ('    Recalculated CENLAT and CENLON')
-            
-           
+            for text, supress_ts in log_lines: __Log.print_line(text, supress_ts)
             __Log.print_break() # Break for next section in the log file.
             tracking_list.append(tracking_info)
             
@@ -178,6 +112,155 @@ class rgi_analysis ():
             __Log.print_line('Workspace Could not be deleted')
             __Log.print_line('Processing Complete')
         
+#_______________________________________________________________________________
+#***  SHAPEFILE ANALYSIS *******************************************************
+def analyze_shapefile (shapefile, output_folder, workspace, check_header, version, backend = 'ARCGIS'):
+    """Copy a shapefile to the output folder, check and repair it and
+    regenerate its IDs and centroids. Returns the tracking information for
+    the summary table and a list of [text, suppress time stamp] log lines.
+    Nothing is written to the log so this can be run in a worker process."""
+    tracking_info = [] # A list to hold individual tracking information
+    log_lines = [[os.path.basename(shapefile), False]]
+    tracking_info.append(os.path.basename(shapefile)[0:12])
+    tracking_info.append(str(ARCPY.GetCount_management(shapefile)))
+            
+    # Copy feature to workspace (output folder), replacing the copy from any
+    # previous analysis.
+    working_shapefile = output_folder + '\\' + os.path.basename(shapefile)
+    if ARCPY.Exists(working_shapefile): ARCPY.Delete_management(working_shapefile)
+    ARCPY.CopyFeatures_management (shapefile, working_shapefile)
+
+
+    # Check to see if the input file follows RGI table headings.
+    formate_error, not_found = DP.check_formate(working_shapefile, check_header)
+    if formate_error == False:
+        log_lines.append(['    Input header information is consistent with the standard set', False])
+    if formate_error == True:
+        log_lines.append(['    ERROR - Input header information is NOT consistent with the standard set', False])
+        log_lines.append(['        Items not found: ' + not_found, False])
+        
+    # Check geometries. If there are errors, correct them and print the
+    # results to the log file
+    repair = DP.repair_geometry(working_shapefile, backend)
+    if backend == 'NUMPY': # Checked without ArcGIS, nothing is repaired
+        log_lines.append(['    Geometry - ' + repair[0] + ' features with ring errors found (Not repaired)', False])
+    else:
+        log_lines.append(['    Geometry - ' + repair[0] + ' errors found (Repaired ' + str(int(repair [0]) - int(repair[1])) + ')', False])
+    tracking_info.append(str(repair[0]))
+        
+    # Check to see if there are any multi-part polygons in the input file. If
+    # so, prompt the user to stop and correct. Print to log file.
+    multipart = DP.check_multipart(working_shapefile, workspace, backend) # Check for multi-part Polygons
+    log_lines.append(['    Multi-Part Polygons - ' + multipart + ' found', False])
+    tracking_info.append(str(multipart))
+     
+    # Check to see if the area from the AREA column matches the actual area
+    # calculated. If not signal the user to correct. Print results to log.
+    area = DP.check_area(working_shapefile, workspace, backend)
+    log_lines.append(['    Area - ' + area[2] + ' difference', False])
+    log_lines.append(['        Original area: ' + area[0] + ' , Final area: ' + area[1], True])
+    tracking_info.append(area [0])
+    tracking_info.append(str(round(( (float(area[0])/float(area[1])) *100.0) -100.0, 1)))
+     
+    # Check to see if there are any topology errors in the input file. If there 
+    # are signal the user to correct before moving forward. Print to log.
+    topology = DP.check_topology(working_shapefile, workspace, backend)
+    log_lines.append(['    Topology - ' + topology[0] + ' errors on ' + topology[1] + ' features', False])
+    log_lines.append(['        Rule set - Must Not Overlap (Area)', True])
+    for first, second, overlap_area in topology[2]:
+        log_lines.append(['        FID ' + str(first) + ' / FID ' + str(second) + ' - ' + str(round(overlap_area, 6)) + ' km2', True])
+    tracking_info.append(str(topology[0]))
+     
+    # Run every attribute check in a single pass over the file.
+    report = CHECK.scan(working_shapefile, CHECK.rgi_checks())
+    
+    # Check to see if the fix column lengths such as RGIID, GLIMSID, GLACTYPE
+    # are consistent with what is expected.      
+    log_lines.append(['    Field Length Check:', False])
+    log_lines.append(['        RGID Expected: 14 - Actual Length(s): ' + ','.join(report['RGIID_LENGTH']), True])
+    log_lines.append(['        GLID Expected: 14 - Actual Length(s): ' + ','.join(report['GLIMSID_LENGTH']), True])
+    log_lines.append(['        GLAC Expected:  4 - Actual Length(s): ' + ','.join(report['GLACTYPE_LENGTH']), True])
+    log_lines.append(['        BGND Expected:  8 - Actual Length(s): ' + ','.join(report['BGNDATE_LENGTH']), True])
+    log_lines.append(['        ENDD Expected:  8 - Actual Length(s): ' + ','.join(report['ENDDATE_LENGTH']), True])
+    
+    # Check to see if the values in the RGIFLAG column has values that are expected
+    log_lines.append(['    RGIFLAG Entries: ' + ','.join(report['RGIFLAG']), False])
+    log_lines.append(['    GLACTYPE Entries: ' + ','.join(report['GLACTYPE']), False])
+     
+    # Check no data date values are 9's and not 0's
+    nodata_bgndate = report['BGNDATE_NODATA']
+    log_lines.append(['    Start Date Format 9 and not 0: ' + str(nodata_bgndate), False])
+    nodata_enddate = report['ENDDATE_NODATA']
+    log_lines.append(['    End Date Format 9 and not 0: ' + str(nodata_enddate), False])
+    tracking_info.append(str(sum(nodata_bgndate.values()) + sum(nodata_enddate.values())))
+   
+    # Check the date format. Dates should be 'YYYYMMDD'
+    format_error = report['DATE_FORMAT']
+    log_lines.append(['    Date Format Errors: ' + str(format_error), False])
+    tracking_info.append(str(format_error))
+   
+   
+    # Check for case errors in fields. Should be first letter upper case, 
+    # lower case everything else.
+    case_errors = report['RGIFLAG_CASE']
+    log_lines.append(['    RGIFLAG Case Errors: ' + str(case_errors), False])
+    tracking_info.append(str(case_errors))
+    
+    # Check the number of glaciers that do not meet the threshold
+    threshold_error = report['AREA_THRESHOLD']
+    log_lines.append(['    Threshold (0.001 km2) Errors: ' + str(threshold_error), False])
+    tracking_info.append(str(threshold_error))
+   
+    # Regenerate basic stats.
+    try:
+        POP.auto_generate_RGIIDs (working_shapefile, version)
+        log_lines.append(['    Recalculated RGI IDs', False])
+    except ValueError as error: # IDs do not fit or are not unique
+        log_lines.append(['    Could not recalculate RGI IDs - ' + str(error), False])
+    
+    POP.generate_GLIMSIDs(working_shapefile, workspace)
+    log_lines.append(['    Recalculated GLIMS IDs', False])
+    
+    POP.generate_centroid(working_shapefile)
+    log_lines.append(['    Recalculated CENLAT and CENLON', False])
+    
+    return [tracking_info, log_lines]
+
+
+def analyze_worker (arguments):
+    """Analyze one shapefile in a worker process. Each shapefile gets its own
+    scratch folder within the workspace."""
+    shapefile, output_folder, workspace, check_header, version, backend = arguments
+    
+    try: import arcinfo                 #@UnresolvedImport @UnusedImport
+    except: pass
+    scratch = workspace + '\\' + os.path.splitext(os.path.basename(shapefile))[0]
+    if not os.path.exists(scratch): os.makedirs(scratch)
+    ARCPY.env.workspace = scratch
+    
+    return analyze_shapefile(shapefile, output_folder, scratch, check_header, version, backend)
+
+
+def analyze_parallel (shapefiles, output_folder, workspace, check_header, version, workers, backend = 'ARCGIS'):
+    """Generator that analyzes the shapefiles in a pool of worker processes,
+    one shapefile per task. Results (see analyze_shapefile) are yielded in
+    the same order as the shapefiles."""
+    arguments = [[shapefile, output_folder, workspace, check_header, version, backend] for shapefile in shapefiles]
+    
+    # When run from inside ArcGIS the executable is the ArcGIS application
+    # and not python, so worker processes need to be pointed at python.
+    if os.name == 'nt' and not os.path.basename(sys.executable).lower().startswith('python'):
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, 'python.exe'))
+    
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap(analyze_worker, arguments): # imap keeps file order
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+        
+        
 #_______________________________________________________________________________
 #***  DRIVER *******************************************************************
 # HARD CODE INPUTS HERE !
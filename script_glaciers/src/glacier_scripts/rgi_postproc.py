@@ -20,32 +20,44 @@ License:     Although this application has been produced and tested
  or contained herein.
 ****************************************************************************"""
 import sys, os
+import math
+import multiprocessing
 sys.path.append (os.path.dirname(os.path.dirname(__file__)))
 
 import arcpy as ARCPY                                         #@UnresolvedImport
 import glacier_utilities.functions.data_prep as DP                              
 import glacier_utilities.functions.data_calc as DC
+import glacier_utilities.functions.data_context as CONTEXT
+import glacier_utilities.functions.data_raster as RASTER
+import glacier_utilities.functions.data_order as ORDER
 import glacier_utilities.functions.data_pop as POP                         
 import glacier_utilities.output_file.output_file_log as LOG
 import glacier_utilities.output_file.output_file_csv as CSV                                       
+import glacier_utilities.output_file.output_file_checkpoint as CHECKPOINT
 
 class process (object):
     
-    def __init__ (self, input_features, output_location, DEM, variables):
+    def __init__ (self, input_features, output_location, DEM, variables, resume = False):
         
         # Create a copy of the input file in the output folder. This will be the
         # actual result file after fields are updated. This is done so no changes
-        # are imposed on the original file.
+        # are imposed on the original file. When resuming, the copy from the
+        # interrupted run is used.
+        output = output_location + '\\' + os.path.basename(input_features)
+        if resume == True and not ARCPY.Exists(output):
+            print 'Output Glacier file from the run being resumed was not found.'
+            sys.exit()
         try:
-            output = output_location + '\\' + os.path.basename(input_features)
-            input_copy = ARCPY.CopyFeatures_management(input_features, output)
+            if resume == True: input_copy = output
+            else: input_copy = ARCPY.CopyFeatures_management(input_features, output)
         except:
             print 'Output Glacier file already exists or the output folder is not available.'
             sys.exit()
         
         try: # Start Log file and write it to the output folder
             log_path = os.path.dirname(os.path.abspath(output))
-            __Log = LOG.Log(log_path)
+            if resume == True: __Log = LOG.Log(log_path, 'Log_Resume')
+            else: __Log = LOG.Log(log_path)
         except:
             print 'Log file could not be written to the output folder.'
             sys.exit()
@@ -66,14 +78,17 @@ class process (object):
         
         try: # Set environment
             workspace = output_location + '\\workspace'
-            os.makedirs(workspace) # Create Workspace
+            if not (resume == True and os.path.exists(workspace)):
+                os.makedirs(workspace) # Create Workspace
             ARCPY.env.workspace = workspace
         except:
             __Log.print_line('WARNING - Workspace folder already exists.')
             sys.exit()
                         
         
-        # Read Variables
+        # Read Variables. A snapshot is used so changes made to the .var file
+        # while processing do not affect this run.
+        if hasattr(variables, 'get_snapshot'): variables = variables.get_snapshot()
         centerlines = variables.read_variable('CENTERLINES')
         hypsometry = variables.read_variable('HYPSOMETRY')
         slope = variables.read_variable('SLOPE')
@@ -99,9 +114,17 @@ class process (object):
         scaling = variables.read_variable('SCALING')
         eu_cell_size = variables.read_variable('EU_CELL_SIZE')
         power = variables.read_variable('POWER')
+        workers = variables.read_variable('WORKERS')
+        retries = variables.read_variable('RETRIES')
+        dem_cache = variables.read_variable('DEM_CACHE')
+        order = variables.read_variable('ORDER')
+        simulate_orders = variables.read_variable('SIMULATE_ORDERS')
+        dem_store = variables.read_variable('DEM_STORE')
+        bin_store = variables.read_variable('BIN_STORE')
+        regional = variables.read_variable('REGIONAL')
+        hypso_format = variables.read_variable('HYPSO_FORMAT')
         
         # Other variables
-        currently_processing = 1
         total_features = str(int(ARCPY.GetCount_management(input_copy).getOutput(0)))
 
         # Print run time variables to log file
@@ -126,158 +149,254 @@ class process (object):
         __Log.print_line("     DEM Scaling Factor: " + str(scaling))
         __Log.print_line("     Centerline Euclidean Cell Size: " + str(eu_cell_size))
         __Log.print_line("     Centerline Line Power Factor: " + str(power))
+        __Log.print_line("     Worker Processes: " + str(workers))
+        __Log.print_line("     Feature Retries: " + str(retries))
+        __Log.print_line("     DEM Tile Cache (MB): " + str(dem_cache))
+        __Log.print_line("     Processing Order: " + str(order))
+        __Log.print_line("     Estimate Order Hit Rates: " + str(simulate_orders))
+        __Log.print_line("     Memory Mapped DEM: " + str(dem_store))
+        __Log.print_line("     Precalculated Bins: " + str(bin_store))
+        __Log.print_line("     Regional Hypsometry: " + str(regional))
+        __Log.print_line("     Hypsometry Table Format: " + str(hypso_format))
+        __Log.print_line("     Resume Previous Run: " + str(resume))
         __Log.print_break() # Break for next section in the log file.
         
         #_______________________________________________________________________
         #*******Input File Cleanup**********************************************  
         
-        __Log.print_line('Input Polygon Checks')
-        # Check to see if the input file follows RGI table headings.
-        formate_error, not_found = DP.check_formate(input_features, check_header)
-        if formate_error == False:
-            __Log.print_line('    Input header information is consistent with the standard set')
-        if formate_error == True:
-            __Log.print_line('    ERROR - Input header information is NOT consistent with the standard set')
-            __Log.print_line('        Items not found: ' + not_found)
-            sys.exit()
+        # The input copy was already checked and prepared by the run being resumed.
+        if resume == False:
+            __Log.print_line('Input Polygon Checks')
+            # Check to see if the input file follows RGI table headings.
+            formate_error, not_found = DP.check_formate(input_features, check_header)
+            if formate_error == False:
+                __Log.print_line('    Input header information is consistent with the standard set')
+            if formate_error == True:
+                __Log.print_line('    ERROR - Input header information is NOT consistent with the standard set')
+                __Log.print_line('        Items not found: ' + not_found)
+                sys.exit()
         
-        # Check geometries. If there are errors, correct them and print the
-        # results to the log file
-        repair = DP.repair_geometry(input_copy)
-        __Log.print_line('    Geometry - ' + repair[0] + ' errors found (Repaired ' + repair[1] + ')')
+            # Check geometries. If there are errors, correct them and print the
+            # results to the log file
+            repair = DP.repair_geometry(input_copy)
+            __Log.print_line('    Geometry - ' + repair[0] + ' errors found (Repaired ' + repair[1] + ')')
         
-        # Check to see if there are any multi-part polygons in the input file. If
-        # so, prompt the user to stop and correct. Print to log file.
-        multipart = DP.check_multipart(input_copy, workspace) # Check for multi-part Polygons
-        __Log.print_line('    Multi-Part Polygons - ' + multipart + ' found')
+            # Check to see if there are any multi-part polygons in the input file. If
+            # so, prompt the user to stop and correct. Print to log file.
+            multipart = DP.check_multipart(input_copy, workspace) # Check for multi-part Polygons
+            __Log.print_line('    Multi-Part Polygons - ' + multipart + ' found')
         
-        # Check to see if the area from the AREA column matches the actual area
-        # calculated. If not signal the user to correct. Print results to log.
-        area = DP.check_area(input_copy, workspace)
-        __Log.print_line('    Area - ' + area[2] + ' difference')
-        __Log.print_line('        Original area: ' + area[0] + ' , Final area: ' + area[1], True)
+            # Check to see if the area from the AREA column matches the actual area
+            # calculated. If not signal the user to correct. Print results to log.
+            area = DP.check_area(input_copy, workspace)
+            __Log.print_line('    Area - ' + area[2] + ' difference')
+            __Log.print_line('        Original area: ' + area[0] + ' , Final area: ' + area[1], True)
         
-        # Check to see if there are any topology errors in the input file. If there 
-        # are signal the user to correct before moving forward. Print to log.
-        topology = DP.check_topology(input_copy, workspace)
-        __Log.print_line('    Topology - ' + topology[0] + ' errors on ' + topology[1] + ' features')
-        __Log.print_line('        Rule set - Must Not Overlap (Area)', True)
+            # Check to see if there are any topology errors in the input file. If there 
+            # are signal the user to correct before moving forward. Print to log.
+            topology = DP.check_topology(input_copy, workspace)
+            __Log.print_line('    Topology - ' + topology[0] + ' errors on ' + topology[1] + ' features')
+            __Log.print_line('        Rule set - Must Not Overlap (Area)', True)
+            for first, second, overlap_area in topology[2]:
+                __Log.print_line('        FID ' + str(first) + ' / FID ' + str(second) + ' - ' + str(round(overlap_area, 6)) + ' km2', True)
         
-        # Warnings: 
-        if multipart <> str(0): print "WARNING:  Multi-part features found.."
-        if area [2] > 1 or area[2] < -1: 'WARNING: The AREA difference exceeds the threshold.'
-        if topology[0] <> str(0): raw_input(str(topology[0]) + " WARNINGS: Topology errors found.")
+            # Warnings: 
+            if multipart <> str(0): print "WARNING:  Multi-part features found.."
+            if area [2] > 1 or area[2] < -1: 'WARNING: The AREA difference exceeds the threshold.'
+            if topology[0] <> str(0): raw_input(str(topology[0]) + " WARNINGS: Topology errors found.")
        
-        __Log.print_break() # Break for next section in the log file.
+            __Log.print_break() # Break for next section in the log file.
         
         #_______________________________________________________________________
         #*******Prepare Input file*********************************************
         
-        if glimsids == True: # Generate GLIMS id's if applicable
-            __Log.print_line('Generating GLIMS IDs')
-            glims_ids = POP.generate_GLIMSIDs(input_copy, workspace) # Copy to Output
-            __Log.print_line('   GLIMS IDs - ' + glims_ids + ' GLIMS IDs Generated')
+            if glimsids == True: # Generate GLIMS id's if applicable
+                __Log.print_line('Generating GLIMS IDs')
+                glims_ids = POP.generate_GLIMSIDs(input_copy, workspace) # Copy to Output
+                __Log.print_line('   GLIMS IDs - ' + glims_ids + ' GLIMS IDs Generated')
             
-        if rgiids == True: # Generate RGI id's if applicable
-            __Log.print_line('Generating RGI IDs')
-            rgi_ids = POP.generate_RGIIDs(input_copy, rgiversion, rgiregion) # Copy to Output
-            __Log.print_line('   RGI IDs - ' + rgi_ids + ' RGI IDs Generated')
+            if rgiids == True: # Generate RGI id's if applicable
+                __Log.print_line('Generating RGI IDs')
+                try:
+                    rgi_ids = POP.generate_RGIIDs(input_copy, rgiversion, rgiregion) # Copy to Output
+                    __Log.print_line('   RGI IDs - ' + rgi_ids + ' RGI IDs Generated')
+                except ValueError as error: # IDs do not fit or are not unique
+                    __Log.print_line('   RGI IDs - ERROR - ' + str(error))
         
-        __Log.print_break() # Break for next section in the log file.
+            __Log.print_break() # Break for next section in the log file.
         
         #_______________________________________________________________________
         #*******Calculate Statistics********************************************
 
-        # Generate center lines output file to append centerlines
+        # Settings used to process each feature. These are kept together so
+        # they can be handed to worker processes.
+        settings = {'CENTERLINES': centerlines, 'HYPSOMETRY': hypsometry, 'SLOPE': slope,
+                    'ASPECT': aspect, 'ATTABLE': Attribute_header, 'STATABLE': Statistics_header,
+                    'BIN_HEADER': bin_header, 'MAXBIN': max_bin, 'MINBIN': min_bin,
+                    'BINSIZE': bin_size, 'BUFFER': subset_buffer, 'EU_CELL_SIZE': eu_cell_size,
+                    'POWER': power, 'TOTAL': total_features, 'RETRIES': retries,
+                    'DEM_CACHE': dem_cache, 'BIN_STORE': None}
+        
+        # The checkpoint records each finished feature and its table rows. When
+        # resuming, finished features are skipped.
+        checkpoint = CHECKPOINT.Checkpoint(table_output, 'Checkpoint', resume)
+        completed = checkpoint.get_completed()
+        if resume == True:
+            __Log.print_line('Resuming - ' + str(len(completed)) + ' of ' + str(total_features) + ' features already complete')
+
+        # Generate center lines output file to append centerlines. When resuming,
+        # centerlines of features that did not finish are removed by the FID
+        # of the glacier they came from (GLIMS IDs may be blank or repeated).
+        output_centerlines = None
         if centerlines == True:
-            output_centerlines = ARCPY.CreateFeatureclass_management(output_location, 'centerlines.shp', 'POLYLINE', '', '', 'ENABLED', input_features)
-            ARCPY.AddField_management(output_centerlines, 'GLIMSID', 'TEXT', '', '', '25')
-            ARCPY.AddField_management(output_centerlines, 'LENGTH', 'FLOAT')
-            ARCPY.AddField_management(output_centerlines, 'SLOPE', 'FLOAT')
-            ARCPY.DeleteField_management(output_centerlines, 'Id')
+            output_centerlines = output_location + '\\centerlines.shp'
+            if resume == True and ARCPY.Exists(output_centerlines):
+                rows = ARCPY.UpdateCursor(output_centerlines)
+                for row in rows:
+                    if checkpoint.is_complete(row.SRC_FID) == False: rows.deleteRow(row)
+                del rows
+            else:
+                output_centerlines = create_centerlines(output_location, input_features)
 
             
         # Create an instance of hypsometry, slope and aspect table if applicable
-        if hypsometry == True: hypso_csv = CSV.CSV(table_output, 'Stats_Hypsometry', header) 
+        if hypsometry == True: hypso_csv = CSV.HypsometryCSV(table_output, 'Stats_Hypsometry', Attribute_header + Statistics_header, bin_header, hypso_format) 
         if slope == True: slope_csv = CSV.CSV(table_output, 'Stats_Slope', header) 
         if aspect == True: aspect_csv = CSV.CSV(table_output, 'Stats_Aspect', header) 
         
-
-        if centerlines == True or hypsometry == True or slope == True or aspect == True:
-            rows = ARCPY.SearchCursor(input_copy) # Open shapefile to read features
-            for row in rows: # For each feature in the shapefile
-                
-                # Get Attributes information such as GLIMS ID, Lat, Lon, area... etc.
-                attribute_info, attribute_error = DC.get_attributes(row, Attribute_header)
-                print ''
-                print ''
-                print 'Currently running: ' + str(currently_processing) + ' of ' + str(total_features)
-                print 'Feature ' + str(attribute_info[0]) + ' ' + str(attribute_info[1])
-                print '    Glacier Type: '  + str(attribute_info[2])
-                print '    Area: ' + str(attribute_info[7]) + ' Sqr.'
-                print '    Centroid (DD): ' + str(attribute_info[5]) + ', ' + str(attribute_info[6])
-                if attribute_error == True: # If function failed
-                    __Log.print_line(str(row.GLIMSID) + ' - ERROR - Could not read attributes')
-                                
-                                
-                # Subset the DEM based on a single buffered glacier outline
-                subset, subset_error = DC.subset(row, DEM, workspace, subset_buffer)
-                if subset_error == True: # If function failed
-                    __Log.print_line(str(row.GLIMSID) + ' - ERROR - Could not subset feature')
-                
-                
-                # Get basic statistics such as minimum elevation, mean... etc.
-                if hypsometry == True or slope == True or aspect == True:
-                    statistics_info, statistics_error = DC.get_statistics(row, subset, workspace, scaling) 
-                    print '    Elevation: ' + str(statistics_info[0]) + ' Min. / ' + str (statistics_info[1]) + ' Max.'
-                    print '    Area Weighted Avg. Elev. = ' + str(statistics_info[2])
-                    if statistics_error == True: # If function failed
+        if hypsometry == True and regional == True:
+            # Hypsometry of every glacier from one pass over the DEM using a
+            # label raster of the outlines. No glacier is processed on its own.
+            __Log.print_line('Calculating Regional Hypsometry')
+            label_store = RASTER.get_label_store(output, DEM)
+            overlaps = RASTER.get_label_overlaps(label_store)
+            if len(overlaps) > 0: # Cells given to the higher FID where outlines overlap
+                __Log.print_line('WARNING - ' + str(len(overlaps)) + ' glaciers lost cells to overlapping outlines')
+                for fid in sorted(overlaps.keys()):
+                    __Log.print_line('    FID ' + str(fid) + ' - ' + str(overlaps[fid]) + ' cells', True)
+            dem_input = DEM
+            if dem_store == True: dem_input = RASTER.DEMStore(RASTER.get_dem_store(DEM))
+            region_bins = None
+            if bin_store == True: region_bins = RASTER.BinStore(RASTER.get_bin_store(DEM, min_bin, max_bin, bin_size))
+            regional_bins, regional_statistics, regional_error = DC.get_regional_hypsometry(dem_input, label_store, len(bin_header), 
+                                                                                            min_bin, bin_size, Statistics_header, region_bins)
+            if regional_error == True:
+                __Log.print_line('ERROR - Could not generate regional hypsometry')
+            else:
+                rows = ARCPY.SearchCursor(output, '', '', '', 'FID A')
+                for row in rows:
+                    attribute_info, attribute_error = DC.get_attributes(row, Attribute_header)
+                    if attribute_error == True:
+                        __Log.print_line(str(row.GLIMSID) + ' - ERROR - Could not read attributes')
+                    if row.FID not in regional_statistics: # No DEM cells within the outline
                         __Log.print_line(str(row.GLIMSID) + ' - ERROR - Could not generate basic statistics')
-                
-                
-                if hypsometry == True or slope == True or aspect == True:
-                    print '    Running Hypsometry for Bin Mask & Table Statistics'
-                    hypsometry_info, hypso_error, bin_mask = DC.get_hypsometry(row, subset, workspace, scaling, max_bin, min_bin, bin_size)
-                    if hypsometry == True and hypso_error == False:
-                        hypso_csv.print_line(attribute_info + statistics_info + hypsometry_info) # Print hypsometry data.
-                    if hypso_error == True:
-                        __Log.print_line(str(row.GLIMSID) + 'ERROR - Could not generate hypsometry information')
-                
-                
-                if centerlines == True or slope == True or aspect == True:
-                    print '    Running Center Line'
-                    centerline, center_length, center_angle, centerline_error = DC.get_centerline(row, subset, workspace, power, eu_cell_size)
-                    if centerline_error == False: 
-                        print '    Center Line Length: ' + str(center_length) + ' & Slope Angle: ' + str(center_angle)
-                        if centerlines == True:
-                            ARCPY.Append_management(centerline, output_centerlines)
-                    if centerline_error == True:
-                        __Log.print_line(str(row.GLIMSID) + ' - ERROR - Could not generate center line')
-                
-                
-                    if slope == True:
-                        print '    Running Slope Table Statistics'
-                        slope_info, slope_error = DC.get_slope(centerline, bin_mask, bin_header, workspace, scaling, bin_size)
-                        slope_csv.print_line(attribute_info + statistics_info + slope_info)
-                        if slope_error == True:
-                            __Log.print_line(str(row.GLIMSID) + ' - ERROR - Could not calculate binned slope data')
-                            
-                
-                    if aspect == True:
-                        print '    Running Aspect Table Statistics'
-                        aspect_info, aspect_error = DC.get_aspect(centerline, bin_mask, bin_header, workspace, scaling)        
-                        aspect_csv.print_line(attribute_info + statistics_info + aspect_info)
-                        if aspect_error == True:
-                            __Log.print_line(str(row.GLIMSID) + ' - ERROR - Could not calculate binned aspect data')
-                             
-                # Clean Up Workspace
-                try: ARCPY.Delete_management(subset)
-                except: pass
-                try: ARCPY.Delete_management(centerline)
-                except: pass
+                    statistics_info = regional_statistics.get(row.FID, [''] * len(Statistics_header))
+                    hypsometry_bins = sorted([[index, bin_area] for index, bin_area in regional_bins.get(row.FID, {}).items()])
+                    hypso_csv.print_hypsometry(attribute_info + statistics_info, hypsometry_bins)
+                del rows
+            settings['HYPSOMETRY'] = False # Nothing left to do per glacier
+            __Log.print_break()
+        
+        # Table rows are written in FID order as features finish, whatever the
+        # processing order. Rows of a feature wait in the checkpoint file until
+        # every lower FID has finished and are then read back from it, so only
+        # FIDs are held in memory. When resuming, the tables are started over
+        # and the rows of features finished before are read back the same way.
+        next_fid = [0] # Next FID to write (shapefile FIDs run from 0)
+        skipped = set() # FIDs quarantined in this run, they have no rows
+        
+        def __write_ready ():
+            """Write the table rows of finished features in FID order up to
+            the first feature that has not finished yet."""
+            while next_fid[0] < int(total_features):
+                fid = next_fid[0]
+                if checkpoint.is_complete(fid):
+                    record = checkpoint.read_record(fid)
+                    if settings['HYPSOMETRY'] == True and record['HYPSOMETRY'] is not None: hypso_csv.print_hypsometry(*record['HYPSOMETRY'])
+                    if slope == True and record['SLOPE'] is not None: slope_csv.print_line(record['SLOPE'])
+                    if aspect == True and record['ASPECT'] is not None: aspect_csv.print_line(record['ASPECT'])
+                elif fid not in skipped: break # Not finished yet
+                next_fid[0] += 1
+        
+        def __write_result (result):
+            """Write the log lines of a single feature, record it, with its
+            table rows, in the checkpoint and write any rows now in order."""
+            for line in result[5]: __Log.print_line(line)
+            checkpoint.print_record(*result)
+            if result[6] <> 'DONE': skipped.add(result[0])
+            __write_ready()
+        
 
-                currently_processing += 1
-            del row , rows #Delete cursors and remove locks
+        if centerlines == True or settings['HYPSOMETRY'] == True or slope == True or aspect == True:
+            if simulate_orders == True or order <> 'FID':
+                fids, extents = ORDER.get_extents(output)
+            if simulate_orders == True:
+                # Estimate how often DEM tiles would be found in the cache for each
+                # processing order (one cache, as when running a single process).
+                dem_raster = ARCPY.Raster(DEM)
+                for each_order in ORDER.ORDERS:
+                    hit_rate = ORDER.simulate_tile_cache(fids, extents, ORDER.get_order(fids, extents, each_order), 
+                                                         dem_raster, subset_buffer, 512, dem_cache)
+                    __Log.print_line('DEM Tile Cache Hit Rate (' + each_order + ' order, estimated): ' + str(round(hit_rate, 1)) + '%')
+            
+            # Features read the DEM store (if used) in place of the DEM. Every
+            # worker maps the same file so the DEM is only held in memory once.
+            dem_source = DEM
+            if dem_store == True:
+                __Log.print_line('Opening DEM store (built on first use)')
+                dem_source = RASTER.get_dem_store(DEM)
+                __Log.print_line('   DEM Store - ' + dem_source)
+            if bin_store == True: # Bins of the whole DEM for these bin settings
+                __Log.print_line('Opening bin store (built on first use)')
+                settings['BIN_STORE'] = RASTER.get_bin_store(DEM, min_bin, max_bin, bin_size)
+                __Log.print_line('   Bin Store - ' + settings['BIN_STORE'])
+            
+            fid_order = None # None processes in FID order with a single cursor
+            if order <> 'FID':
+                fid_order = ORDER.get_order(fids, extents, order)
+                indexed = set(fids) # Features with no geometry are not in the index
+                rows = ARCPY.SearchCursor(output, '', '', 'FID', 'FID A')
+                fid_order += [row.FID for row in rows if row.FID not in indexed]
+                del rows
+            
+            __write_ready() # Rows of features finished before the run was resumed
+            cache_counts = {'HITS': 0, 'MISSES': 0} # DEM tile requests of every reader
+            if workers > 1: # Process chunks of features in a pool of worker processes
+                for results, chunk_centerlines, chunk_counts in process_parallel(output, dem_source, workspace, settings, workers, completed, fid_order):
+                    for result in results: __write_result(result)
+                    if chunk_centerlines is not None: # Merge in chunk order
+                        ARCPY.Append_management(chunk_centerlines, output_centerlines)
+                        ARCPY.Delete_management(chunk_centerlines)
+                    for key in cache_counts: cache_counts[key] += chunk_counts[key]
+            else:
+                for result in process_features(output, dem_source, workspace, settings, '', output_centerlines, completed, fid_order, cache_counts):
+                    __write_result(result)
+            
+            requests = cache_counts['HITS'] + cache_counts['MISSES']
+            if requests > 0: # Not counted when reading from the DEM store
+                hit_rate = 100.0 * cache_counts['HITS'] / requests
+                __Log.print_line('DEM Tile Cache Hit Rate (' + order + ' order): ' + str(round(hit_rate, 1)) + '% of ' + str(requests) + ' tile reads')
+            
+            checkpoint.close()
+            
+            # Centerlines are appended as features finish. They are put back in
+            # FID order if processed in another order or if the run was resumed.
+            if output_centerlines is not None and (order <> 'FID' or resume == True):
+                sort_centerlines(str(output_centerlines), workspace)
+            
+            # List features that failed every attempt. They are attempted again
+            # if the run is resumed.
+            quarantined = checkpoint.get_quarantined()
+            if len(quarantined) > 0:
+                __Log.print_break()
+                __Log.print_line('Quarantined Features - ' + str(len(quarantined)) + ' (run again with --resume to retry)')
+                for record in quarantined:
+                    __Log.print_line('    FID ' + str(record['FID']) + ' - ' + str(record['GLIMSID']), True)
+            
+        # Flush and close the tables
+        if hypsometry == True: hypso_csv.close()
+        if slope == True: slope_csv.close()
+        if aspect == True: aspect_csv.close()
             
         try: # Script Complete. Try and delete workspace 
             ARCPY.Delete_management(workspace)
@@ -288,6 +407,248 @@ class process (object):
             __Log.print_line('Workspace Could not be deleted')
             __Log.print_line('Processing Complete')
             
+#_______________________________________________________________________________
+#***  FEATURE PROCESSING *******************************************************
+def create_centerlines (output_location, template):
+    """Create an empty centerline shapefile to append centerlines to."""
+    output_centerlines = ARCPY.CreateFeatureclass_management(output_location, 'centerlines.shp', 'POLYLINE', '', '', 'ENABLED', template)
+    ARCPY.AddField_management(output_centerlines, 'GLIMSID', 'TEXT', '', '', '25')
+    ARCPY.AddField_management(output_centerlines, 'LENGTH', 'FLOAT')
+    ARCPY.AddField_management(output_centerlines, 'SLOPE', 'FLOAT')
+    ARCPY.AddField_management(output_centerlines, 'SRC_FID', 'LONG')
+    ARCPY.DeleteField_management(output_centerlines, 'Id')
+    return output_centerlines
+
+
+def sort_centerlines (output_centerlines, workspace):
+    """Rewrite the centerline shapefile sorted by the FID of the glacier each
+    line came from (SRC_FID)."""
+    sorted_centerlines = workspace + '\\centerlines_sorted.shp'
+    ARCPY.Sort_management(output_centerlines, sorted_centerlines, [['SRC_FID', 'ASCENDING']])
+    if len(ARCPY.ListFields(sorted_centerlines, 'ORIG_FID')) > 0: # Added by the sort
+        ARCPY.DeleteField_management(sorted_centerlines, 'ORIG_FID')
+    ARCPY.Delete_management(output_centerlines)
+    ARCPY.CopyFeatures_management(sorted_centerlines, output_centerlines)
+    ARCPY.Delete_management(sorted_centerlines)
+
+
+def process_feature (row, dem_raster, workspace, settings, output_centerlines = None, bin_store = None):
+    """Run the statistics, hypsometry, centerline, slope and aspect functions
+    on a single glacier. Returns a list of the features FID, GLIMS ID, the
+    hypsometry (attribute and statistics values and the [bin index, area]
+    pairs of bins with area), slope and aspect table rows (None if not run)
+    and the lines to print to the log file. The centerline is appended to
+    output_centerlines, if it is given, once the feature has finished. Bins
+    are sliced from bin_store (a BinStore) if given."""
+    hypso_row = None; slope_row = None; aspect_row = None
+    centerline = None; centerline_error = True
+    log_lines = []
+    
+    # The feature context reads the DEM window for the buffered glacier
+    # outline once and shares it, and its masks, with every statistic.
+    context = CONTEXT.FeatureContext(row, dem_raster, workspace, settings['BUFFER'], settings['MAXBIN'], settings['MINBIN'], settings['BINSIZE'],
+                                     bin_store = bin_store)
+    
+    try:
+        # Get Attributes information such as GLIMS ID, Lat, Lon, area... etc.
+        attribute_info, attribute_error = DC.get_attributes(context, settings['ATTABLE'])
+        print ''
+        print ''
+        print 'Currently running: ' + str(row.FID + 1) + ' of ' + str(settings['TOTAL'])
+        print 'Feature ' + str(attribute_info[0]) + ' ' + str(attribute_info[1])
+        print '    Glacier Type: '  + str(attribute_info[2])
+        print '    Area: ' + str(attribute_info[7]) + ' Sqr.'
+        print '    Centroid (DD): ' + str(attribute_info[5]) + ', ' + str(attribute_info[6])
+        if attribute_error == True: # If function failed
+            log_lines.append(str(row.GLIMSID) + ' - ERROR - Could not read attributes')
+                    
+    
+        # Get basic statistics such as minimum elevation, mean... etc.
+        statistics_info = [''] * len(settings['STATABLE'])
+        if settings['HYPSOMETRY'] == True or settings['SLOPE'] == True or settings['ASPECT'] == True:
+            statistics_info, statistics_error = DC.get_statistics(context, settings['STATABLE']) 
+            for heading, value in zip (settings['STATABLE'], statistics_info):
+                print '    ' + heading + ': ' + str(value)
+            if statistics_error == True: # If function failed
+                log_lines.append(str(row.GLIMSID) + ' - ERROR - Could not generate basic statistics')
+    
+    
+        if settings['HYPSOMETRY'] == True:
+            print '    Running Hypsometry Table Statistics'
+            hypsometry_bins, hypso_error = DC.get_hypsometry_bins(context) # Only bins with area
+            if hypso_error == False:
+                hypso_row = [attribute_info + statistics_info, hypsometry_bins]
+            if hypso_error == True:
+                log_lines.append(str(row.GLIMSID) + ' - ERROR - Could not generate hypsometry information')
+
+
+        if settings['CENTERLINES'] == True or settings['SLOPE'] == True or settings['ASPECT'] == True:
+            print '    Running Center Line'
+            centerline, center_length, center_angle, centerline_error = DC.get_centerline(context, settings['POWER'], settings['EU_CELL_SIZE'])
+            if centerline_error == False: 
+                print '    Center Line Length: ' + str(center_length) + ' & Slope Angle: ' + str(center_angle)
+            if centerline_error == True:
+                log_lines.append(str(row.GLIMSID) + ' - ERROR - Could not generate center line')
+    
+    
+            if settings['SLOPE'] == True or settings['ASPECT'] == True:
+                # Slope and aspect come from a single split of the center line by bins
+                print '    Running Slope and Aspect Table Statistics'
+                slope_info, aspect_info, length_info, segment_info, profile_error = DC.get_centerline_profile(centerline, context, settings['BIN_HEADER'])
+            
+                if settings['SLOPE'] == True:
+                    slope_row = attribute_info + statistics_info + slope_info
+                    if profile_error == True:
+                        log_lines.append(str(row.GLIMSID) + ' - ERROR - Could not calculate binned slope data')
+        
+                if settings['ASPECT'] == True:
+                    aspect_row = attribute_info + statistics_info + aspect_info
+                    if profile_error == True:
+                        log_lines.append(str(row.GLIMSID) + ' - ERROR - Could not calculate binned aspect data')
+                 
+        # The centerline is only added to the output once everything else has
+        # run, so a feature that fails and is retried does not leave a line.
+        if output_centerlines is not None and centerline_error == False:
+            ARCPY.Append_management(centerline, output_centerlines)
+    finally: # Clean Up Workspace
+        context.close()
+        try: ARCPY.Delete_management(centerline)
+        except: pass
+    
+    return [row.FID, str(row.GLIMSID), hypso_row, slope_row, aspect_row, log_lines, 'DONE']
+
+
+def remove_centerlines (output_centerlines, fid):
+    """Delete the centerlines of the glacier with the given FID (SRC_FID)."""
+    rows = ARCPY.UpdateCursor(output_centerlines, '"SRC_FID" = ' + str(fid))
+    for row in rows: rows.deleteRow(row)
+    del rows
+
+
+def read_features (input_file, where_clause = '', order = None, batch_size = 500):
+    """Generator that yields the rows of features selected by the where clause
+    in FID order, or if order (a list of FIDs) is given, the rows of those
+    features in that order. Ordered rows are read in batches so only a batch
+    is held in memory at a time."""
+    if order is None:
+        rows = ARCPY.SearchCursor(input_file, where_clause, '', '', 'FID A') # Open shapefile to read features
+        for row in rows: yield row
+        del rows #Delete cursors and remove locks
+        return
+    
+    for start in range (0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        position = dict((fid, index) for index, fid in enumerate (batch))
+        rows = ARCPY.SearchCursor(input_file, '"FID" IN (' + ','.join([str(fid) for fid in batch]) + ')')
+        batch_rows = sorted([row for row in rows], key = lambda row: position[row.FID])
+        del rows
+        for row in batch_rows: yield row
+
+
+def process_features (input_file, DEM, workspace, settings, where_clause = '', output_centerlines = None, completed = set(), order = None,
+                      cache_counts = None):
+    """Generator that processes each feature selected by the where clause, in
+    FID order or the order of the given list of FIDs (see read_features), and
+    yields its results (see process_feature). Features in the completed set
+    of FIDs are skipped. A feature that raises an error is attempted again up
+    to settings['RETRIES'] times and is then quarantined so the rest of the
+    run can continue. Only errors the statistics functions do not catch
+    themselves (e.g. cursor or license errors) are retried. Failures they
+    catch are returned as log lines and the feature is recorded as done.
+    Centerlines a failed attempt left in output_centerlines are removed
+    before it is attempted again. When every feature is done the DEM tile
+    cache hits and misses are added to cache_counts ({'HITS': 0,
+    'MISSES': 0}) if given."""
+    dem_raster = RASTER.open_dem(DEM, 512, settings['DEM_CACHE']) # Open the DEM once for all features
+    bin_store = None
+    if settings['BIN_STORE'] is not None: bin_store = RASTER.BinStore(settings['BIN_STORE'])
+    for row in read_features(input_file, where_clause, order): # For each feature in the shapefile
+        if row.FID in completed: continue # Finished before the run was resumed
+        
+        for attempt in range (0, settings['RETRIES'] + 1):
+            try:
+                result = process_feature(row, dem_raster, workspace, settings, output_centerlines, bin_store)
+                break
+            except Exception as error:
+                if output_centerlines is not None: remove_centerlines(output_centerlines, row.FID)
+                message = str(row.GLIMSID) + ' - ERROR - Quarantined after ' + str(attempt + 1) + ' attempt(s): ' + str(error)
+                result = [row.FID, str(row.GLIMSID), None, None, None, [message], 'QUARANTINED']
+        yield result
+    
+    if cache_counts is not None and isinstance(dem_raster, RASTER.DEMReader):
+        cache_counts['HITS'] += dem_raster.hits
+        cache_counts['MISSES'] += dem_raster.misses
+
+
+def process_chunk (arguments):
+    """Worker process entry point. Processes one chunk of features in the
+    chunk's own scratch workspace. Chunks in FID order are selected by the
+    range of their FIDs, other chunks are processed in the order of their
+    list of FIDs. Returns the results of every feature, the path to the
+    chunk's centerlines (None if centerlines are not generated) and the
+    chunk's DEM tile cache hits and misses."""
+    input_file, DEM, workspace, settings, chunk_fids, chunk, completed, ordered = arguments
+    
+    if ARCPY.CheckExtension('Spatial') == 'Available': # Each process checks out its own license
+        ARCPY.CheckOutExtension('Spatial')
+    chunk_workspace = workspace + '\\chunk_' + str(chunk)
+    if not os.path.exists(chunk_workspace): # May be left over from a resumed run
+        os.makedirs(chunk_workspace)
+    ARCPY.env.workspace = chunk_workspace
+    
+    chunk_centerlines = None
+    if settings['CENTERLINES'] == True:
+        if ARCPY.Exists(chunk_workspace + '\\centerlines.shp'):
+            ARCPY.Delete_management(chunk_workspace + '\\centerlines.shp')
+        chunk_centerlines = create_centerlines(chunk_workspace, input_file)
+    
+    cache_counts = {'HITS': 0, 'MISSES': 0}
+    if ordered == True:
+        results = list(process_features(input_file, DEM, chunk_workspace, settings, '', chunk_centerlines, completed, chunk_fids, cache_counts))
+    else:
+        where_clause = '"FID" >= ' + str(chunk_fids[0]) + ' AND "FID" <= ' + str(chunk_fids[-1])
+        results = list(process_features(input_file, DEM, chunk_workspace, settings, where_clause, chunk_centerlines, completed, None, cache_counts))
+    return results, chunk_centerlines, cache_counts
+
+
+def process_parallel (input_file, DEM, workspace, settings, workers, completed = set(), order = None):
+    """Generator that splits the features, other than those in the completed
+    set of FIDs, into chunks and processes them in a pool of worker
+    processes. Chunks hold consecutive FIDs, or consecutive FIDs of the order
+    list if one is given. The results of each chunk (see process_chunk) are
+    yielded in chunk order."""
+    fids = [] # FID of every feature left to process in order
+    if order is None:
+        rows = ARCPY.SearchCursor(input_file, '', '', 'FID', 'FID A')
+        for row in rows:
+            if row.FID not in completed: fids.append(row.FID)
+        del rows
+    else:
+        fids = [fid for fid in order if fid not in completed]
+    
+    # Use several chunks per worker so the load stays balanced when some
+    # glaciers take much longer than others.
+    chunk_size = max(int(math.ceil(len(fids) / float(workers * 4))), 1)
+    chunks = []
+    for chunk, start in enumerate (range (0, len(fids), chunk_size)):
+        chunk_fids = fids[start:start + chunk_size]
+        chunk_completed = set([fid for fid in completed if chunk_fids[0] <= fid <= chunk_fids[-1]])
+        chunks.append([input_file, DEM, workspace, settings, chunk_fids, chunk, chunk_completed, order is not None])
+    
+    # When run from inside ArcGIS the executable is the ArcGIS application
+    # and not python, so worker processes need to be pointed at python.
+    if os.name == 'nt' and not os.path.basename(sys.executable).lower().startswith('python'):
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, 'python.exe'))
+    
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap(process_chunk, chunks): # imap keeps chunk order
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+            
 #_______________________________________________________________________________
 #***  DRIVER *******************************************************************
 # HARD CODE INPUTS HERE !
@@ -296,11 +657,14 @@ def driver():
     Output = r'A:\Desktop\Mapdate\Output'
     DEM = r'A:\Desktop\Mapdate\NED_mixed.img'
     
+    # Run with --resume to continue an interrupted run in the same output folder
+    resume = '--resume' in sys.argv
+    
     #Variables - WARNING: Use caution manually changing variables.
     import glacier_utilities.general_utilities.variables  as variables
     variables = variables.Variables()
 
-    process (Input, Output, DEM, variables)
+    process (Input, Output, DEM, variables, resume)
 
 if __name__ == '__main__':
     driver()
\ No newline at end of file
@@ -25,20 +25,25 @@ import arcpy as ARCPY                                        #@UnresolvedImport
 from arcpy import sa as spatial
 import math
 import random
+import numpy as NUMPY
+import glacier_utilities.functions.data_raster as RASTER
+import glacier_utilities.functions.data_centerline as CENTERLINE
+import glacier_utilities.functions.data_context as CONTEXT
+import glacier_utilities.output_file.output_file_csv as CSV
 
-def get_aspect (feature, bin_mask, bins, workspace, raster_scaling = 1000):
+def get_aspect_clip (feature, context, bins):
     """Calculate aspect information from the given feature centerline based
-    on a bin mask. A bin mask is one of the standard outputs from calculating 
-    hypsometry. Aspect is 0 -360 degrees clockwise from north and starts from 
-    the lowest elevation toward the highest."""
+    on the bin mask of the glacier's feature context. Aspect is 0 -360 degrees
+    clockwise from north and starts from the lowest elevation toward the
+    highest. This is the original method, which clips the line to each bin."""
     try:
         aspect_list = [str(0.0)] * len(bins) # string list of 0.0 to return
         bin_list = bins # List of bin values
         centerline_list = [] # List to hold current features length and slope values
         
-        rows = ARCPY.SearchCursor (bin_mask)
+        rows = ARCPY.SearchCursor (context.get_bin_mask())
         for row in rows: # For each bin within the bin mask
-            elevation_bin = int(row.GRIDCODE / raster_scaling) # Get bin value
+            elevation_bin = int(row.GRIDCODE) # Get bin value
             
             # Clip centerline to current bin and count the features generated
             clipped_line = ARCPY.Clip_analysis (feature, row.shape, 'in_memory\\clipped_line')
@@ -78,13 +83,16 @@ def get_aspect (feature, bin_mask, bins, workspace, raster_scaling = 1000):
         return aspect_list, True
     
 
-def get_attributes (feature, Attribute_header):
+def get_attributes (context, Attribute_header):
     """Return feature attribute values: GLIMSID, NAME, GLACTYPE, BGNDATE, 
     ENDDATE, CENLON, CENLAT and AREA. If value doesn't exist it should be
-    left blank. If this function fails at runtime an error is returned for
-    recording in the log file."""
+    left blank. The context may be a feature context or the feature's row
+    when only its attributes are needed (no DEM is read). If this function
+    fails at runtime an error is returned for recording in the log file."""
     attributes = [''] * len(Attribute_header)
     try:
+        feature = context
+        if isinstance(context, CONTEXT.FeatureContext): feature = context.feature
         for position, item in enumerate (Attribute_header):
             attributes[position] =  str(feature.getValue(item))
         return attributes, False
@@ -92,11 +100,54 @@ def get_attributes (feature, Attribute_header):
         return attributes, True
     
     
-def get_centerline (feature, dem, workspace, power = 5, eu_cell_size = 10):
-    """Returns a center line feature of the given polygon feature based on
-    cost over an euclidean distance raster and cost path. points are seeded
-    using minimum and maximum elevation."""    
-    centerline = workspace + '\\centerline.shp'
+def get_centerline (context, power = 5, eu_cell_size = 10):
+    """Returns a center line feature of the glacier in the given feature
+    context based on the least cost path over an inverted euclidean distance
+    surface. The path is found on the DEM window held by the context (see
+    data_centerline) and only the final line is written to the workspace.
+    Points are seeded using minimum and maximum elevation."""
+    feature = context.feature
+    centerline = context.workspace + '\\centerline_array.shp'
+    
+    try:
+        coordinates, center_length, center_slope = context.get_centerline_path(power, eu_cell_size)
+        if center_length == 0: raise ValueError('Center line has no length')
+        
+        # Write the line to a new center line feature
+        spatial_reference = context.dem.spatialReference
+        ARCPY.env.overwriteOutput = True
+        ARCPY.CreateFeatureclass_management(context.workspace, 'centerline_array.shp', 'POLYLINE', '', '', '', spatial_reference)
+        ARCPY.AddField_management(centerline, 'GLIMSID', 'TEXT', '', '', '25')
+        ARCPY.AddField_management(centerline, 'LENGTH', 'FLOAT')
+        ARCPY.AddField_management(centerline, 'SLOPE', 'FLOAT')
+        ARCPY.AddField_management(centerline, 'SRC_FID', 'LONG')
+        ARCPY.DeleteField_management(centerline, 'Id')
+        
+        rows = ARCPY.InsertCursor(centerline)
+        row = rows.newRow()
+        points = ARCPY.Array([ARCPY.Point(x, y) for x, y in coordinates])
+        row.shape = ARCPY.Polyline(points, spatial_reference)
+        row.GLIMSID = feature.GLIMSID # Get GLIMS ID and add it to segment
+        row.LENGTH = center_length
+        row.SLOPE = center_slope
+        row.SRC_FID = feature.FID # FID of the glacier the line came from
+        rows.insertRow(row)
+        del row, rows #Delete cursors and remove locks
+        
+        ARCPY.env.overwriteOutput = False
+        return centerline, center_length, center_slope, False
+    except:
+        ARCPY.env.overwriteOutput = False
+        return centerline, '', '', True
+    
+    
+def get_centerline_costpath (context, power = 5, eu_cell_size = 10):
+    """Returns a center line feature of the glacier in the given feature
+    context based on cost over an euclidean distance raster and cost path.
+    points are seeded using minimum and maximum elevation. This is the
+    original geoprocessing method get_centerline is checked against."""    
+    feature = context.feature
+    centerline = context.workspace + '\\centerline_costpath.shp'
     center_length = 0
     center_slope = 0
     smoothing = 4
@@ -104,14 +155,16 @@ def get_centerline (feature, dem, workspace, power = 5, eu_cell_size = 10):
 
     try: 
         # Setup extents / environments for the current feature
-        ARCPY.env.extent = feature.shape.extent
-        desc = ARCPY.Describe(feature)
-        XMin_new = desc.extent.XMin - 200
-        YMin_new = desc.extent.YMin - 200
-        XMax_new = desc.extent.XMax + 200
-        YMax_new = desc.extent.YMax + 200
+        extent = feature.shape.extent
+        XMin_new = extent.XMin - 200
+        YMin_new = extent.YMin - 200
+        XMax_new = extent.XMax + 200
+        YMax_new = extent.YMax + 200
         ARCPY.env.extent = ARCPY.Extent(XMin_new, YMin_new, XMax_new, YMax_new)
     
+        # The DEM window already held by the feature context is used so the
+        # source DEM is not read again.
+        dem = context.get_dem_raster()
         ARCPY.env.overwriteOutput = True
         ARCPY.env.cellSize = eu_cell_size
         ARCPY.env.snapRaster = dem
@@ -196,6 +249,7 @@ def get_centerline (feature, dem, workspace, power = 5, eu_cell_size = 10):
         ARCPY.AddField_management(centerline, 'GLIMSID', 'TEXT', '', '', '25')
         ARCPY.AddField_management(centerline, 'LENGTH', 'FLOAT')
         ARCPY.AddField_management(centerline, 'SLOPE', 'FLOAT')
+        ARCPY.AddField_management(centerline, 'SRC_FID', 'LONG')
         ARCPY.DeleteField_management(centerline, field_names) # Remove the old fields.
         
         
@@ -204,6 +258,7 @@ def get_centerline (feature, dem, workspace, power = 5, eu_cell_size = 10):
         rows = ARCPY.UpdateCursor (centerline)
         for row in rows:
             row.GLIMSID = feature.GLIMSID # Get GLIMS ID and add it to segment
+            row.SRC_FID = feature.FID # FID of the glacier the line came from
             center_length = row.LENGTH # Get the length of the center line
             # Calculate slope of the line based on change in elevation over length of line
             center_slope = round(math.degrees(math.atan((float(maximum) - float(minimum)) / row.LENGTH)), 2)
@@ -254,10 +309,152 @@ def get_centerline (feature, dem, workspace, power = 5, eu_cell_size = 10):
 
 
 
-def get_hypsometry (feature, dem, workspace, raster_scaling = 1000, max_bin = 8850, min_bin = 0, bin_size = 50):
+def get_centerline_profile (feature, context, bins):
+    """Calculate slope, aspect, length and number of segments of the given
+    feature centerline in each elevation bin. The line is split where it
+    crosses bins on the DEM window of the glacier's feature context (see
+    profile_centerline) once for all four. Returns four string lists, one
+    value per bin in bins, and an error flag.
+    Slope assumes the centerline segment runs the length of the bin, so the
+    first and last bins, and bins the line crosses more than once, are 'NA'.
+    Aspect is 0 - 360 degrees clockwise from north in the direction the line
+    is drawn and is the length weighted mean of its pieces within the bin.
+    Bins the line does not reach are '0.0' (length and segments '0')."""
+    bin_size = context.bin_size
+    slope_list = [str(0.0)] * len(bins) # string lists of 0.0 to return
+    aspect_list = [str(0.0)] * len(bins)
+    length_list = [str(0.0)] * len(bins)
+    segment_list = [str(0)] * len(bins)
+    try:
+        length, segments, direction = profile_centerline(feature, context)
+        crossed = NUMPY.nonzero(length > 0)[0] # Bins the center line is in
+        for index, entry in enumerate (bins): # For each bin (all of them)
+            bin_index = (int(entry[1:]) - context.min_bin) // bin_size # 'B150' to its index
+            if 0 <= bin_index < context.total_bins and length[bin_index] > 0:
+                length_list[index] = str(round(length[bin_index], 1))
+                segment_list[index] = str(segments[bin_index])
+                aspect_list[index] = str(round(direction[bin_index], 1))
+                if segments[bin_index] > 1 or bin_index == crossed.min() or bin_index == crossed.max():
+                    slope_list[index] = str('NA') # Multi-part, min or max bin
+                else:
+                    slope_list[index] = str(round(math.degrees(math.atan(float(bin_size) / length[bin_index])), 1))
+        return slope_list, aspect_list, length_list, segment_list, False
+    except:
+        return slope_list, aspect_list, length_list, segment_list, True
+    
+    
+def get_hypsometry (context):
+    """Calculate hypsometry information from the digital elevation model (DEM)
+    window of the glacier's feature context and return bin statistics, one
+    value for every bin (see get_hypsometry_bins). If this function fails at
+    runtime an error is returned for recording in the log file."""
+    hypsometry_bins, hypso_error = get_hypsometry_bins(context)
+    return CSV.dense_hypsometry(hypsometry_bins, context.total_bins), hypso_error
+
+
+def get_hypsometry_bins (context):
+    """Calculate hypsometry information from the digital elevation model (DEM)
+    window of the glacier's feature context. The area of every bin is summed
+    with a single histogram of the binned elevations weighted by the area
+    each cell contributes to the glacier. Only bins with area are returned,
+    as a list of [bin index, area] pairs in bin order. If this function
+    fails at runtime an error is returned for recording in the log file."""
+    try:
+        # Sum the area of each bin. Cells outside of the mask or bin range are -1.
+        bins = context.get_bins()
+        inside = bins >= 0
+        cell_area = abs(context.get_window()[1][1] * context.get_window()[1][5])
+        areas = NUMPY.bincount(bins[inside], weights = context.get_coverage()[inside] * cell_area, minlength = context.total_bins)
+        
+        return [[int(index), float(areas[index])] for index in NUMPY.flatnonzero(areas[:context.total_bins] > 0)], False
+    except:
+        return [], True
+
+
+def get_regional_hypsometry (dem, label_store, total_bins, min_bin = 0, bin_size = 50, 
+                             statistics_header = None, bin_store = None, block_rows = 512):
+    """Calculate the hypsometry and basic statistics of every glacier in a
+    label raster (see RASTER.build_label_store) in one pass over the DEM.
+    The DEM is read in blocks of rows and the area of each glacier in each
+    bin is added to a sparse accumulator holding only bins with area, so
+    memory is bounded by the block size and the glaciers' bins. The DEM may
+    be a path, an ARCPY.Raster or a DEMStore. Bins are sliced from bin_store
+    (a BinStore) if given. Returns a dictionary of FID: {bin index: area}
+    and a dictionary of FID: statistics in the order of the header.
+    MIN_ELEV, MAX_ELEV, MEAN_ELEV and STD_ELEV are calculated, others are
+    left blank (the header defaults to MIN_ELEV, MAX_ELEV and MEAN_ELEV).
+    If this function fails at runtime an error is returned for recording in
+    the log file."""
+    if statistics_header is None: statistics_header = ['MIN_ELEV', 'MAX_ELEV', 'MEAN_ELEV']
+    hypsometry = {} # Key label * total_bins + bin: area
+    summary = {}    # Label: [cells, sum, sum of squares, min, max]
+    try:
+        labels = RASTER.DEMStore(label_store)
+        if isinstance(dem, RASTER.DEMStore):
+            blocks = ((first_row, dem.array[first_row:first_row + block_rows]) for first_row in range (0, dem.height, block_rows))
+        else:
+            if not isinstance(dem, ARCPY.Raster): dem = ARCPY.Raster(dem)
+            blocks = RASTER.read_blocks(dem, block_rows)
+        cell_area = abs(dem.meanCellWidth * dem.meanCellHeight)
+        
+        for first_row, elevation in blocks:
+            block_labels = labels.array[first_row:first_row + elevation.shape[0]]
+            glacier = (block_labels > 0) & ~NUMPY.isnan(elevation)
+            if not glacier.any(): continue
+            label = block_labels[glacier].astype(NUMPY.int64)
+            z = elevation[glacier].astype(NUMPY.float64)
+            if bin_store is not None:
+                bins = bin_store.array[first_row:first_row + elevation.shape[0]][glacier].astype(NUMPY.int64)
+                bins[bins == RASTER.BIN_NODATA] = -1
+            else:
+                bins = RASTER.bin_elevations(z, min_bin, bin_size)
+            
+            # Area of each glacier bin of the block from one bincount over the
+            # glaciers in the block, added to the accumulator
+            glaciers, label_index = NUMPY.unique(label, return_inverse = True)
+            areas = RASTER.label_hypsometry(label_index, bins, len(glaciers), total_bins, cell_area)
+            for index, bin_index in zip (*NUMPY.nonzero(areas)):
+                key = glaciers[index] * total_bins + bin_index
+                hypsometry[key] = hypsometry.get(key, 0.0) + areas[index, bin_index]
+            
+            # Cells, sums, minimum and maximum of each glacier in the block
+            cells = NUMPY.bincount(label_index)
+            sums = NUMPY.bincount(label_index, weights = z)
+            squares = NUMPY.bincount(label_index, weights = z * z)
+            ordered = z[NUMPY.argsort(label_index, kind = 'mergesort')]
+            starts = NUMPY.concatenate(([0], NUMPY.cumsum(cells)[:-1]))
+            minimums = NUMPY.minimum.reduceat(ordered, starts)
+            maximums = NUMPY.maximum.reduceat(ordered, starts)
+            for index, glacier_label in enumerate (glaciers):
+                if glacier_label in summary:
+                    total = summary[glacier_label]
+                    summary[glacier_label] = [total[0] + cells[index], total[1] + sums[index], total[2] + squares[index],
+                                              min(total[3], minimums[index]), max(total[4], maximums[index])]
+                else:
+                    summary[glacier_label] = [cells[index], sums[index], squares[index], minimums[index], maximums[index]]
+        
+        # Labels are FID + 1
+        hypsometry_bins = {}
+        for key, area in hypsometry.items():
+            hypsometry_bins.setdefault(int(key // total_bins) - 1, {})[int(key % total_bins)] = area
+        statistics = {}
+        for glacier_label, total in summary.items():
+            mean = total[1] / total[0]
+            values = {'MIN_ELEV': total[3], 'MAX_ELEV': total[4], 'MEAN_ELEV': mean,
+                      'STD_ELEV': math.sqrt(max(total[2] / total[0] - mean ** 2, 0.0))}
+            statistics[int(glacier_label) - 1] = [str(round(float(values[heading]), 0)) if heading in values else '' 
+                                                  for heading in statistics_header]
+        return hypsometry_bins, statistics, False
+    except:
+        return {}, {}, True
+
+
+def get_hypsometry_polygon (feature, dem, workspace, raster_scaling = 1000, max_bin = 8850, min_bin = 0, bin_size = 50):
     """Calculate hypsometry information from the given digital elevation model
-    (DEM) and return bin statistics. If this function fails at runtime an error
-    is returned for recording in the log file."""
+    (DEM) by reclassifying it and converting the bins to polygons. This is the
+    original polygon based method. It is slow and is kept to check the array
+    based method against. If this function fails at runtime an error is
+    returned for recording in the log file."""
     hypsometry = []
     try:
         reclassify_range = '' # re-map string
@@ -317,20 +514,21 @@ def get_properties (raster, prop = ''):
     return str(ARCPY.GetRasterProperties_management(raster, prop))
 
 
-def get_slope (feature, bin_mask, bins, workspace, raster_scaling = 1000, bin_size = 50):
+def get_slope_clip (feature, context, bins):
     """Calculate slope information along the center line by clipping segements of the 
-    centerline to each bin. A bin mask is required and is calculated as a standard
-    output of the 'get_hypsometry' function. Slope calculations assume centerline 
-    segment runs the length of the bins so first and last values may be incorrect if
-    if the line end before it reaches the end of a bin or starts within it."""
+    centerline to each bin of the bin mask held by the glacier's feature context.
+    Slope calculations assume centerline segment runs the length of the bins so
+    first and last values may be incorrect if the line end before it reaches the
+    end of a bin or starts within it. This is the original method."""
+    bin_size = context.bin_size
     slope_list = [str(0.0)] * len(bins) # string list of 0.0 to return
     bin_list = bins # List of bin values
     centerline_list = [] # List to hold current features length and slope values
             
     try:
-        rows = ARCPY.SearchCursor (bin_mask)
+        rows = ARCPY.SearchCursor (context.get_bin_mask())
         for row in rows: # For each bin within the bin mask
-            elevation_bin = int(row.GRIDCODE / raster_scaling) # Get bin value
+            elevation_bin = int(row.GRIDCODE) # Get bin value
             
             # Clip centerline to current bin and calculate it's length
             clipped_line = ARCPY.Clip_analysis (feature, row.shape, 'in_memory\\clipped_line' )
@@ -380,9 +578,56 @@ def get_slope (feature, bin_mask, bins, workspace, raster_scaling = 1000, bin_si
         return  slope_list, True # Return anything that was run or empty list of '0.0'
         
         
-def get_statistics (feature, dem, workspace, raster_scaling = 1000):
-    """Return basic feature statistics which include elevation maximum, 
-    elevation minimum, median elevation and mean elevation. If this function
+def profile_centerline (feature, context):
+    """Split the center line feature where it crosses elevation bins on the DEM
+    window of the glacier's feature context. The line is densified to half a
+    DEM cell. Returns arrays, one value per bin, of the length of line within
+    the bin, the number of separate segments and the mean compass direction
+    (see data_centerline.get_profile)."""
+    paths = []
+    rows = ARCPY.SearchCursor(feature)
+    for row in rows:
+        paths.extend(RASTER.get_paths(row.shape))
+    del row, rows
+    
+    geotransform = context.get_window()[1]
+    return CENTERLINE.get_profile(paths, context.get_bins(), geotransform,
+                                  context.total_bins, geotransform[1] / 2.0)
+    
+
+def get_statistics (context, statistics_header = ['MIN_ELEV', 'MAX_ELEV', 'MEAN_ELEV']):
+    """Return zonal feature statistics from the masked digital elevation model
+    (DEM) of the glacier's feature context in the order of the header. The
+    header may include: MIN_ELEV, MAX_ELEV, MEAN_ELEV (area weighted),
+    MED_ELEV (area weighted median), STD_ELEV (area weighted standard
+    deviation) and percentiles written as P##_ELEV (i.e. P10_ELEV). Unknown
+    headings are left blank. If this function fails at runtime an error is
+    returned for recording in the log file."""
+    statistics = [''] * len(statistics_header)
+    try:
+        elevation, area = context.get_masked_dem()
+        mean = NUMPY.sum(elevation * area) / NUMPY.sum(area)
+        
+        for index, heading in enumerate (statistics_header):
+            if heading == 'MIN_ELEV': value = elevation.min()
+            elif heading == 'MAX_ELEV': value = elevation.max()
+            elif heading == 'MEAN_ELEV': value = mean
+            elif heading == 'MED_ELEV': value = RASTER.weighted_percentile(elevation, area, 50)
+            elif heading == 'STD_ELEV': value = math.sqrt(NUMPY.sum(area * (elevation - mean) ** 2) / NUMPY.sum(area))
+            elif heading[0] == 'P' and heading.endswith('_ELEV') and heading[1:-5].isdigit():
+                value = RASTER.weighted_percentile(elevation, area, int(heading[1:-5]))
+            else: continue # Not a known statistic, leave blank
+            statistics[index] = str(round(float(value), 0))
+            
+        return statistics, False
+    except:
+        return statistics, True
+        
+
+def get_statistics_polygon (feature, dem, workspace, raster_scaling = 1000):
+    """Return basic feature statistics which include elevation minimum,
+    elevation maximum and area weighted mean elevation by converting the DEM
+    to polygons. This is the original polygon based method. If this function
     fails at runtime an error is returned for recording in the log file."""
     statistics = [''] * 3
     try:
@@ -454,4 +699,142 @@ def raster_to_polygon (feature, raster, workspace, raster_scaling = 1000):
     
     return feature
     
-    
\ No newline at end of file
+    
+
+
+#_______________________________________________________________________________
+#***  DRIVER *******************************************************************
+def count_differences (values, other_values, tolerance, circular = False):
+    """Return the number of positions where two string lists of bin values
+    (i.e. from get_centerline_profile and get_slope_clip) differ by more than
+    the tolerance. 'NA' only matches 'NA'. Circular values (aspect) are
+    compared the short way around 360 degrees."""
+    differences = 0
+    for value, other_value in zip(values, other_values):
+        if value == 'NA' or other_value == 'NA':
+            if value <> other_value: differences += 1
+            continue
+        difference = abs(float(value) - float(other_value))
+        if circular == True: difference = min(difference, 360.0 - difference)
+        if difference > tolerance: differences += 1
+    return differences
+
+
+# HARD CODE INPUTS HERE !
+def driver():
+    """Check the array based hypsometry, centerline and centerline profile
+    against the original polygon, cost path and clip methods using the test
+    features in the documentation folder. A glacier fails if:
+        - any hypsometry bin differs by more than one DEM cell of area
+        - the center line lengths differ by more than 10 percent or the new
+          line strays more than four centerline cells from the original
+        - any profile slope or aspect differs from the clipped line by more
+          than one degree
+        - either method returns an error
+    Each failure is printed with the method timings and the driver exits
+    with status 1 if any glacier fails."""
+    import os
+    import sys
+    import time
+    length_tolerance = 10.0 # Percent difference in center line length
+    offset_cells = 4 # Center line cells the new line may stray
+    degree_tolerance = 1.0 # Degrees of slope or aspect
+    test_folder = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + '\\documentation\\TestFeatures'
+    features = test_folder + '\\Test_Glaciers_Formated.shp'
+    dem = test_folder + '\\Test_DEM.img'
+    workspace = test_folder + '\\workspace'
+    
+    if ARCPY.CheckExtension('Spatial') == 'Available':
+        ARCPY.CheckOutExtension('Spatial')
+    if not os.path.exists(workspace): os.makedirs(workspace)
+    ARCPY.env.workspace = workspace
+    
+    cell_area = float(get_properties(dem, 'CELLSIZEX')) ** 2
+    failures = [] # [GLIMSID, check] for every failed check
+    rows = ARCPY.SearchCursor(features)
+    for row in rows:
+        subset_dem, subset_error = subset(row, dem, workspace)
+        if subset_error == True: continue
+        context = CONTEXT.FeatureContext(row, dem, workspace)
+        array_hypsometry, array_error = get_hypsometry(context)
+        context.close()
+        polygon_hypsometry, polygon_error, bin_mask = get_hypsometry_polygon(row, subset_dem, workspace)
+        
+        if array_error == True or polygon_error == True:
+            print str(row.GLIMSID) + ' - ERROR - Could not generate hypsometry'
+            failures.append([str(row.GLIMSID), 'hypsometry error'])
+        else:
+            differences = 0
+            for index, (array_bin, polygon_bin) in enumerate (zip(array_hypsometry, polygon_hypsometry)):
+                if abs(float(array_bin) - float(polygon_bin)) > cell_area:
+                    print '    Bin ' + str(index) + ': ' + array_bin + ' (array) / ' + polygon_bin + ' (polygon)'
+                    differences += 1
+            print str(row.GLIMSID) + ' - ' + str(differences) + ' bins differ by more than one cell'
+            if differences > 0: failures.append([str(row.GLIMSID), 'hypsometry'])
+            ARCPY.Delete_management(bin_mask)
+        ARCPY.Delete_management(subset_dem)
+        
+        # Compare the center lines and the time each method takes.
+        eu_cell_size = 10
+        context = CONTEXT.FeatureContext(row, dem, workspace)
+        array_start = time.clock()
+        array_line, array_length, array_slope, array_error = get_centerline(context, 5, eu_cell_size)
+        array_time = time.clock() - array_start
+        coordinates = context.get_centerline_path(5, eu_cell_size)[0] if array_error == False else []
+        costpath_start = time.clock()
+        costpath_line, costpath_length, costpath_slope, costpath_error = get_centerline_costpath(context, 5, eu_cell_size)
+        costpath_time = time.clock() - costpath_start
+        context.close()
+        
+        if array_error == True or costpath_error == True:
+            print str(row.GLIMSID) + ' - ERROR - Could not generate center line'
+            failures.append([str(row.GLIMSID), 'center line error'])
+        else:
+            lines = ARCPY.SearchCursor(costpath_line)
+            costpath_shape = lines.next().shape
+            del lines
+            offset = max([costpath_shape.distanceTo(ARCPY.PointGeometry(ARCPY.Point(x, y))) for x, y in coordinates])
+            length_difference = abs(array_length - costpath_length) / costpath_length * 100.0
+            within = length_difference <= length_tolerance and offset <= offset_cells * eu_cell_size
+            if within == False: failures.append([str(row.GLIMSID), 'center line'])
+            print str(row.GLIMSID) + ' - Center line length ' + str(round(array_length, 1)) + ' (array) / ' + \
+                  str(round(costpath_length, 1)) + ' (cost path), slope ' + str(array_slope) + ' / ' + str(costpath_slope) + \
+                  ', max offset ' + str(round(offset, 1)) + ' - ' + ('within' if within else 'OUTSIDE') + ' tolerance'
+            print '    Time ' + str(round(array_time, 2)) + ' s (array) / ' + str(round(costpath_time, 2)) + ' s (cost path)'
+        
+        # Compare the time taken to split the center line by bins once for both
+        # slope and aspect with clipping it to every bin for each.
+        if array_error == False:
+            context = CONTEXT.FeatureContext(row, dem, workspace)
+            bins = ['B' + str(value) for value in range (context.min_bin, context.max_bin, context.bin_size)]
+            profile_start = time.clock()
+            profile = get_centerline_profile(array_line, context, bins)
+            profile_time = time.clock() - profile_start
+            clip_start = time.clock()
+            clip_slope, slope_error = get_slope_clip(array_line, context, bins)
+            clip_aspect, aspect_error = get_aspect_clip(array_line, context, bins)
+            clip_time = time.clock() - clip_start
+            context.close()
+            
+            if profile[4] == True or slope_error == True or aspect_error == True:
+                print str(row.GLIMSID) + ' - ERROR - Could not generate slope and aspect'
+                failures.append([str(row.GLIMSID), 'slope and aspect error'])
+            else:
+                differences = count_differences(profile[0], clip_slope, degree_tolerance) + \
+                              count_differences(profile[1], clip_aspect, degree_tolerance, True)
+                print '    Slope and aspect ' + str(round(profile_time, 2)) + ' s (one profile) / ' + \
+                      str(round(clip_time, 2)) + ' s (two clip passes), ' + str(differences) + \
+                      ' values differ by more than ' + str(degree_tolerance) + ' degrees'
+                if differences > 0: failures.append([str(row.GLIMSID), 'slope and aspect'])
+        for line in [array_line, costpath_line]:
+            try: ARCPY.Delete_management(line)
+            except: pass
+    del row, rows
+    
+    for glims_id, check in failures: print 'FAILED - ' + glims_id + ' - ' + check
+    print str(len(failures)) + ' checks failed'
+    if len(failures) > 0: sys.exit(1)
+    
+    
+if __name__ == '__main__':
+    driver()
@@ -0,0 +1,264 @@
+"""****************************************************************************
+ Name:         glacier_utilities.functions.data_centerline
+ Purpose:      Array based glacier centerlines. The DEM window of a glacier is
+     resampled to the centerline cell size, a cost surface is built from the
+     distance to the glacier edge and the least cost path between the highest
+     and lowest cells is found. Nothing is written to disk.
+
+Created:         Oct 18, 2026
+Author:          script.glaciers contributors
+Location:
+Contributors:
+
+Copyright:   (c) script.glaciers contributors 2026
+License:     Although this application has been produced and tested
+ successfully, no warranty expressed or implied is made regarding the
+ reliability and accuracy of the utility, or the data produced by it, on any
+ other system or for general or scientific purposes, nor shall the act of
+ distribution constitute any such warranty. It is also strongly recommended
+ that careful attention be paid to the contents of the metadata / help file
+ associated with these data to evaluate application limitations, restrictions
+ or intended use. The creators and distributors of the application shall not
+ be held liable for improper or incorrect use of the utility described and/
+ or contained herein.
+****************************************************************************"""
+import math
+import heapq
+import numpy as NUMPY
+import glacier_utilities.functions.data_raster as RASTER
+
+try: from scipy import ndimage as NDIMAGE # Faster distance transform if available
+except ImportError: NDIMAGE = None
+
+def resample_window (elevation, geotransform, cell_size):
+    """Resample an elevation array to a new cell size using the nearest cell,
+    as the ArcGIS Resample tool does by default. Returns the resampled array
+    and its geotransform."""
+    rows = int(math.ceil(elevation.shape[0] * -geotransform[5] / cell_size))
+    cols = int(math.ceil(elevation.shape[1] * geotransform[1] / cell_size))
+
+    # Row and column of the source cell under the center of each new cell
+    source_rows = ((NUMPY.arange(rows) + 0.5) * cell_size / -geotransform[5]).astype(int)
+    source_cols = ((NUMPY.arange(cols) + 0.5) * cell_size / geotransform[1]).astype(int)
+    source_rows = source_rows.clip(0, elevation.shape[0] - 1)
+    source_cols = source_cols.clip(0, elevation.shape[1] - 1)
+
+    resampled = elevation[source_rows[:, NUMPY.newaxis], source_cols[NUMPY.newaxis, :]]
+    return resampled, (geotransform[0], cell_size, 0.0, geotransform[3], 0.0, -cell_size)
+
+
+def distance_to_edge (mask, cell_size):
+    """Return the euclidean distance from the center of each cell in the mask
+    to the center of the nearest cell outside of it. SciPy is used if it is
+    installed, otherwise the distance is found in two passes: down the
+    columns and then across the rows."""
+    if NDIMAGE is not None:
+        return NDIMAGE.distance_transform_edt(mask) * cell_size
+
+    rows, cols = mask.shape
+    # Distance, in cells, to the nearest outside cell in the same column
+    column = NUMPY.where(mask, float(rows + cols), 0.0)
+    for row in range (1, rows): column[row] = NUMPY.minimum(column[row], column[row - 1] + 1)
+    for row in range (rows - 2, -1, -1): column[row] = NUMPY.minimum(column[row], column[row + 1] + 1)
+
+    # The squared distance is the least column distance squared plus the
+    # squared offset across the row. Offsets are tried until they are larger
+    # than every distance found.
+    squared = column ** 2
+    distance = squared.copy()
+    offset = 1
+    while offset < cols and offset ** 2 < distance.max():
+        distance[:, offset:] = NUMPY.minimum(distance[:, offset:], squared[:, :-offset] + offset ** 2)
+        distance[:, :-offset] = NUMPY.minimum(distance[:, :-offset], squared[:, offset:] + offset ** 2)
+        offset += 1
+    return NUMPY.sqrt(distance) * cell_size
+
+
+def least_cost_path (cost, mask, start, end, cell_size):
+    """Return the cells, as (row, column), on the least cost path from the end
+    cell back to the start cell. Moves are made to any of the eight neighbors
+    in the mask and cost the average of the two cells times the distance
+    moved, as with the ArcGIS Cost Distance tool."""
+    rows, cols = mask.shape
+    costs = cost.ravel().tolist() # Lists are much faster to index than arrays
+    inside = mask.ravel().tolist()
+    total = [float('inf')] * (rows * cols)
+    previous = [-1] * (rows * cols)
+
+    diagonal = cell_size * math.sqrt(2)
+    steps = [(-1, -1, diagonal), (-1, 0, cell_size), (-1, 1, diagonal), (0, -1, cell_size),
+             (0, 1, cell_size), (1, -1, diagonal), (1, 0, cell_size), (1, 1, diagonal)]
+
+    start_index = start[0] * cols + start[1]
+    end_index = end[0] * cols + end[1]
+    total[start_index] = 0.0
+    heap = [(0.0, start_index)]
+    while heap:
+        distance, index = heapq.heappop(heap)
+        if index == end_index: break # The path to the end cell is known
+        if distance > total[index]: continue # Already reached at less cost
+
+        row, col = divmod(index, cols)
+        for row_step, col_step, length in steps:
+            next_row = row + row_step
+            next_col = col + col_step
+            if next_row < 0 or next_row >= rows or next_col < 0 or next_col >= cols: continue
+            neighbor = next_row * cols + next_col
+            if not inside[neighbor]: continue
+
+            neighbor_distance = distance + (costs[index] + costs[neighbor]) * 0.5 * length
+            if neighbor_distance < total[neighbor]:
+                total[neighbor] = neighbor_distance
+                previous[neighbor] = index
+                heapq.heappush(heap, (neighbor_distance, neighbor))
+
+    if previous[end_index] == -1 and end_index <> start_index: return [] # Not connected
+    path = [end_index]
+    while path[-1] <> start_index: path.append(previous[path[-1]])
+    return [divmod(index, cols) for index in path]
+
+
+def smooth_path (coordinates, tolerance, spacing):
+    """Smooth a path of (n, 2) coordinates with a moving average whose length
+    along the line is the tolerance. The path is first resampled to an even
+    spacing. The end points are not moved."""
+    if len(coordinates) < 3: return coordinates
+    segment = NUMPY.sqrt((NUMPY.diff(coordinates, axis = 0) ** 2).sum(axis = 1))
+    along = NUMPY.concatenate([[0.0], NUMPY.cumsum(segment)])
+
+    # Resample to an even spacing along the line
+    samples = NUMPY.linspace(0.0, along[-1], max(int(math.ceil(along[-1] / spacing)), 1) + 1)
+    even = NUMPY.column_stack([NUMPY.interp(samples, along, coordinates[:, 0]),
+                               NUMPY.interp(samples, along, coordinates[:, 1])])
+
+    half = min(int(tolerance / (2.0 * spacing)), (len(even) - 1) // 2)
+    if half < 1: return even
+    kernel = NUMPY.ones(2 * half + 1) / (2 * half + 1)
+    padded = NUMPY.concatenate([NUMPY.repeat(even[:1], half, axis = 0), even,
+                                NUMPY.repeat(even[-1:], half, axis = 0)])
+    smoothed = NUMPY.column_stack([NUMPY.convolve(padded[:, 0], kernel, 'valid'),
+                                   NUMPY.convolve(padded[:, 1], kernel, 'valid')])
+    smoothed[0] = even[0]
+    smoothed[-1] = even[-1]
+    return smoothed
+
+
+def extend_path (coordinates, mask, geotransform, distance):
+    """Extend both ends of a path along their direction until they reach the
+    edge of the mask or have been extended by the given distance."""
+    if len(coordinates) < 2: return coordinates
+    step = geotransform[1] / 2.0
+
+    def __extend (end, inner):
+        direction = end - inner
+        length = math.sqrt((direction ** 2).sum())
+        if length == 0: return end
+        direction = direction / length
+        extended = end
+        for travelled in NUMPY.arange(step, distance + step, step):
+            point = end + direction * travelled
+            row = int((geotransform[3] - point[1]) / -geotransform[5])
+            col = int((point[0] - geotransform[0]) / geotransform[1])
+            if row < 0 or col < 0 or row >= mask.shape[0] or col >= mask.shape[1]: break
+            if not mask[row, col]: break
+            extended = point
+        return extended
+
+    inner = min(3, len(coordinates) - 1) # Direction from a few vertices in
+    start = __extend(coordinates[0], coordinates[inner])
+    end = __extend(coordinates[-1], coordinates[-1 - inner])
+    return NUMPY.vstack([start, coordinates[1:-1], end])
+
+
+def path_length (coordinates):
+    """Return the length of a path of (n, 2) coordinates."""
+    if len(coordinates) < 2: return 0.0
+    return float(NUMPY.sqrt((NUMPY.diff(coordinates, axis = 0) ** 2).sum(axis = 1)).sum())
+
+
+def get_centerline (elevation, geotransform, rings, power = 5, cell_size = 10,
+                    smoothing = 4, extend_distance = 100):
+    """Return the centerline of a glacier as an (n, 2) array of coordinates
+    running from the highest to the lowest cell, with its length and slope
+    in degrees. The cost of crossing a cell is (-d + max)**power, where d is
+    the distance to the glacier edge and max the highest elevation, so the
+    path keeps to the middle of the glacier. A ValueError is raised if the
+    outline covers no cells with elevation data."""
+    grid, grid_transform = resample_window(elevation, geotransform, cell_size)
+    mask = RASTER.rasterize_polygon(rings, grid_transform, grid.shape[0], grid.shape[1]) > 0
+    mask &= ~NUMPY.isnan(grid)
+    if not mask.any(): raise ValueError('No elevation data within the outline')
+
+    # The first highest and lowest cells in row order seed the path
+    maximum = float(grid[mask].max())
+    minimum = float(grid[mask].min())
+    high = NUMPY.unravel_index(NUMPY.where(mask, grid, -NUMPY.inf).argmax(), grid.shape)
+    low = NUMPY.unravel_index(NUMPY.where(mask, grid, NUMPY.inf).argmin(), grid.shape)
+
+    distance = distance_to_edge(mask, cell_size)
+    # Cells further from the edge than the highest elevation would have a
+    # negative cost, so they are held at zero.
+    cost = NUMPY.where(mask, NUMPY.maximum(-distance + maximum, 0.0) ** power, NUMPY.inf)
+    cells = least_cost_path(cost, mask, low, high, cell_size)
+    if len(cells) == 0: raise ValueError('Highest and lowest cells are not connected')
+
+    # Cell centers, highest to lowest
+    cells = NUMPY.array(cells, NUMPY.float64).reshape(-1, 2)
+    coordinates = NUMPY.column_stack([grid_transform[0] + (cells[:, 1] + 0.5) * cell_size,
+                                      grid_transform[3] - (cells[:, 0] + 0.5) * cell_size])
+    coordinates = smooth_path(coordinates, (maximum - minimum) / smoothing, cell_size)
+    coordinates = extend_path(coordinates, mask, grid_transform, extend_distance)
+
+    length = path_length(coordinates)
+    slope = 0.0
+    if length > 0: slope = round(math.degrees(math.atan((maximum - minimum) / length)), 2)
+    return coordinates, length, slope
+
+
+def densify (coordinates, spacing):
+    """Return a path with vertices added so no segment is longer than the
+    spacing. The original vertices are kept."""
+    segment = NUMPY.sqrt((NUMPY.diff(coordinates, axis = 0) ** 2).sum(axis = 1))
+    along = NUMPY.concatenate([[0.0], NUMPY.cumsum(segment)])
+    samples = NUMPY.union1d(NUMPY.arange(0.0, along[-1], spacing), along)
+    return NUMPY.column_stack([NUMPY.interp(samples, along, coordinates[:, 0]),
+                               NUMPY.interp(samples, along, coordinates[:, 1])])
+
+
+def get_profile (paths, bins, geotransform, total_bins, spacing):
+    """Split paths (see data_raster.get_paths) where they cross from one
+    elevation bin to another. bins is the bin index of each cell (-1 for none)
+    on the grid of the geotransform. Paths are densified to the spacing and
+    each piece is given the bin under its middle. Returns, for every bin, the
+    length of path within it, the number of separate segments within it and
+    the direction of the path (compass degrees, length weighted mean)."""
+    length = NUMPY.zeros(total_bins)
+    segments = NUMPY.zeros(total_bins, NUMPY.int64)
+    east = NUMPY.zeros(total_bins)
+    north = NUMPY.zeros(total_bins)
+
+    for path in paths:
+        dense = densify(path, spacing)
+        step = NUMPY.diff(dense, axis = 0)
+        step_length = NUMPY.sqrt((step ** 2).sum(axis = 1))
+        middle = (dense[:-1] + dense[1:]) / 2.0
+
+        # Bin under the middle of each piece
+        rows = NUMPY.floor((geotransform[3] - middle[:, 1]) / -geotransform[5]).astype(int)
+        cols = NUMPY.floor((middle[:, 0] - geotransform[0]) / geotransform[1]).astype(int)
+        inside = (rows >= 0) & (rows < bins.shape[0]) & (cols >= 0) & (cols < bins.shape[1])
+        step_bins = -NUMPY.ones(len(step), NUMPY.int64)
+        step_bins[inside] = bins[rows[inside], cols[inside]]
+        valid = (step_bins >= 0) & (step_length > 0)
+        if not valid.any(): continue # Path is outside every bin
+
+        length += NUMPY.bincount(step_bins[valid], step_length[valid], total_bins)[:total_bins]
+        east += NUMPY.bincount(step_bins[valid], step[valid, 0], total_bins)[:total_bins]
+        north += NUMPY.bincount(step_bins[valid], step[valid, 1], total_bins)[:total_bins]
+
+        # A segment starts wherever the bin differs from the piece before it
+        starts = valid & NUMPY.concatenate([[True], step_bins[1:] <> step_bins[:-1]])
+        segments += NUMPY.bincount(step_bins[starts], None, total_bins)[:total_bins]
+
+    direction = NUMPY.degrees(NUMPY.arctan2(east, north)) % 360.0
+    return length, segments, direction
@@ -0,0 +1,87 @@
+"""****************************************************************************
+ Name:         glacier_utilities.functions.data_centroid
+ Purpose:      Keeps an index of the centroid and extent of every glacier in
+     a shapefile so the GLIMS ID, CENLAT / CENLON and processing order
+     functions do not each walk every geometry. The index is saved next to
+     the shapefile and reused until the shapefile's geometry changes.
+
+Created:         Oct 18, 2026
+Author:          script.glaciers contributors
+Location:
+Contributors:
+
+Copyright:   (c) script.glaciers contributors 2026
+License:     Although this application has been produced and tested
+ successfully, no warranty expressed or implied is made regarding the
+ reliability and accuracy of the utility, or the data produced by it, on any
+ other system or for general or scientific purposes, nor shall the act of
+ distribution constitute any such warranty. It is also strongly recommended
+ that careful attention be paid to the contents of the metadata / help file
+ associated with these data to evaluate application limitations, restrictions
+ or intended use. The creators and distributors of the application shall not
+ be held liable for improper or incorrect use of the utility described and/
+ or contained herein.
+****************************************************************************"""
+import os
+import arcpy as ARCPY                                        #@UnresolvedImport
+import numpy as NUMPY
+import glacier_utilities.general_utilities.file_cache as FILE_CACHE
+
+WGS84 = os.path.dirname(os.path.abspath(__file__)) + '\\projection\\WGS1984.prj'
+
+def get_index_parts (input_file):
+    """Return the files of a shapefile the index depends on, its geometry
+    (.shp) and projection (.prj) if there is one."""
+    return [path for path in FILE_CACHE.shapefile_parts(input_file, ('.shp', '.prj')) if os.path.exists(path)]
+
+
+def build_index (input_file):
+    """Read the centroid of every feature in the shapefile's own coordinate
+    system and its extent. The WGS84 centroid is the native centroid point
+    projected to WGS84 (SHAPE@XY with a spatial reference), not the centroid
+    of the projected outline, so it may differ slightly from the centroid of
+    a WGS84 copy of the shapefile. Features with no geometry are left out.
+    Returns a dictionary of lists (FID, CENTROID, WGS84 and EXTENT) in FID
+    order."""
+    features = {} # FID: [centroid, extent]
+    rows = ARCPY.da.SearchCursor(input_file, ['OID@', 'SHAPE@'])
+    for fid, shape in rows:
+        if shape is None: continue # Null geometry
+        features[fid] = [[shape.centroid.X, shape.centroid.Y],
+                         [shape.extent.XMin, shape.extent.YMin, shape.extent.XMax, shape.extent.YMax]]
+    del rows
+
+    wgs84 = {} # FID: centroid
+    rows = ARCPY.da.SearchCursor(input_file, ['OID@', 'SHAPE@XY'], '', ARCPY.SpatialReference(WGS84))
+    for fid, centroid in rows:
+        if fid in features: wgs84[fid] = list(centroid)
+    del rows
+
+    fids = sorted(features.keys())
+    return {'FID': fids, 'CENTROID': [features[fid][0] for fid in fids],
+            'WGS84': [wgs84[fid] for fid in fids], 'EXTENT': [features[fid][1] for fid in fids]}
+
+
+def get_index (input_file):
+    """Return the centroid index of a shapefile (see build_index) with
+    CENTROID and WGS84 as (n, 2) NumPy arrays and EXTENT as an (n, 4) array.
+    The index is kept in a sidecar (shapefile name + '_Centroids.json') and
+    reused while the content hash of the shapefile's geometry matches."""
+    parts = get_index_parts(input_file)
+    cache = FILE_CACHE.FileCache(os.path.splitext(input_file)[0] + '_Centroids.json')
+    index = cache.lookup('INDEX', parts)
+    if index is None:
+        index = build_index(input_file)
+        cache.store('INDEX', parts, index)
+
+    return {'FID': index['FID'],
+            'CENTROID': NUMPY.array(index['CENTROID'], NUMPY.float64).reshape(-1, 2),
+            'WGS84': NUMPY.array(index['WGS84'], NUMPY.float64).reshape(-1, 2),
+            'EXTENT': NUMPY.array(index['EXTENT'], NUMPY.float64).reshape(-1, 4)}
+
+
+#Driver
+def main():
+    pass
+if __name__ == '__main__':
+    main()
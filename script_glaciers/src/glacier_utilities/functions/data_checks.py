@@ -21,111 +21,218 @@ License:     Although this application has been produced and tested
 ****************************************************************************"""
 import arcpy as ARCPY                                        #@UnresolvedImport
 
+#_______________________________________________________________________________
+#***  SINGLE PASS CHECKS *******************************************************
+class Check (object):
+    """Base class for a check run by scan. A check names the columns it needs 
+    and is handed the values of those columns for each row in the file. Its
+    result is returned in the report from scan.
+    Attributes:
+    name: Key of the check's result in the scan report.
+    columns: Names of the columns the check reads."""
+    
+    def __init__ (self, name, *columns):
+        """init stores the name of the check and the columns it reads."""
+        self.name = name
+        self.columns = list(columns)
+        
+#______________________________________________________________________________
+#***Methods********************************************************************
+    def visit (self, values):
+        """Check one row. values is a dictionary of column: value holding
+        the check's columns that are in the file."""
+        pass
+    
+    def result (self):
+        """Return the result of the check once every row has been visited."""
+        return None
+
+
+class AttributeCheck (Check):
+    """Collects the various attributes in a given column or columns."""
+    def __init__ (self, name, *columns):
+        Check.__init__(self, name, *columns)
+        self.__attributes = []
+        
+    def visit (self, values):
+        for column in self.columns:
+            if column not in values: continue
+            entry = str(values[column])
+            if entry not in self.__attributes: # If attribute isn't in list
+                self.__attributes.append(entry) # Add attribute to list
+    
+    def result (self):
+        return self.__attributes
+    
+
+class AttributeLengthCheck (Check):
+    """Collects the various lengths of attributes in a given column or columns."""
+    def __init__ (self, name, *columns):
+        Check.__init__(self, name, *columns)
+        self.__lengths = []
+        
+    def visit (self, values):
+        for column in self.columns:
+            if column not in values: continue
+            entry_length = str(len(str(values[column]))) # Get length of attribute value
+            if entry_length not in self.__lengths: # If length isn't in list
+                self.__lengths.append(entry_length) # Add length to list
+    
+    def result (self):
+        return self.__lengths
+    
+
+class NodataDateCheck (Check):
+    """Counts dates with no data values set to '00' or '0000' instead of '99'
+    or '9999'."""
+    def __init__ (self, name, *columns):
+        Check.__init__(self, name, *columns)
+        self.__nodata = {'YEAR': 0, 'MONTH': 0, 'DAY': 0}
+        
+    def visit (self, values):
+        for column in self.columns:
+            if column not in values: continue
+            date = values[column]
+            if date[0:4] == '0000': self.__nodata['YEAR'] += 1
+            if date[4:6] == '00': self.__nodata['MONTH'] += 1
+            if date[6:8] == '00': self.__nodata['DAY'] += 1
+    
+    def result (self):
+        return self.__nodata
+    
+
+class DateFormatCheck (Check):
+    """Counts dates that are not in the format 'YYYYMMDD'."""
+    def __init__ (self, name, *columns):
+        Check.__init__(self, name, *columns)
+        self.__format_warning = 0
+        
+    def visit (self, values):
+        for column in self.columns:
+            if column not in values: continue
+            if values[column][0:2] not in ('19', '20', '-9'): self.__format_warning += 1
+    
+    def result (self):
+        return self.__format_warning
+    
+
+class UppercaseCheck (Check):
+    """Counts words that do not start with an upper case letter followed by
+    lower case letters."""
+    def __init__ (self, name, *columns):
+        Check.__init__(self, name, *columns)
+        self.__case_error = 0
+        
+    def visit (self, values):
+        for column in self.columns:
+            if column not in values: continue
+            for word in values[column].split(' '):
+                try:
+                    if word[0].islower(): self.__case_error += 1
+                    if word[1:].isupper(): self.__case_error += 1
+                except:
+                    self.__case_error += 1
+    
+    def result (self):
+        return self.__case_error
+    
+
+class AreaCheck (Check):
+    """Counts polygons with an area less than a specified threshold."""
+    def __init__ (self, name, threshold = 0.001, column = 'AREA'):
+        Check.__init__(self, name, column)
+        self.threshold = threshold
+        self.__threshold_error = 0
+        
+    def visit (self, values):
+        if float(values[self.columns[0]]) < self.threshold: self.__threshold_error += 1
+    
+    def result (self):
+        return self.__threshold_error
+
+
+def scan (input_file, checks):
+    """Run a list of checks over a file in a single pass. The file is read once
+    with a cursor limited to the columns the checks need. Returns a report,
+    a dictionary of check name: result."""
+    field_names = [field.name for field in ARCPY.ListFields(input_file)] # Input field names
+    
+    columns = [] # Columns needed by any check, in file order
+    for check in checks:
+        for column in check.columns:
+            if column not in columns: columns.append(column)
+    # A column required by a check but not in the file is an error, as it was
+    # for check_area. Other checks skip columns they cannot find.
+    for check in checks:
+        if isinstance(check, AreaCheck) and check.columns[0] not in field_names:
+            raise ValueError(check.columns[0] + ' not found in ' + input_file)
+    columns = [column for column in columns if column in field_names]
+    
+    if len(columns) > 0:
+        rows = ARCPY.da.SearchCursor(input_file, columns) # Open search cursor
+        for row in rows:
+            values = dict(zip(columns, row))
+            for check in checks: check.visit(values)
+        del rows
+    
+    report = {} # Check name: result
+    for check in checks: report[check.name] = check.result()
+    return report
+
+
+#_______________________________________________________________________________
+#***  CHECKS *******************************************************************
 def check_attributes (input_file, *columns):
     """Returns the various attributes in a given column or columns.
     The function is intended to be used as a check of column entries to see
     if they match the expected values for a column(s)."""
-    
-    column_attributes = [] # Empty list to append attribute lengths
-    field_names = ARCPY.ListFields(input_file) # Input field names
-    
-    rows = ARCPY.SearchCursor(input_file) # Open search cursor
-    for row in rows:
-        for field in field_names:
-            if any(field.name == col for col in columns): # If the field matches input column
-                entry = str(row.getValue(field.name)) # Get length of attribute value
-                
-                if str(entry) not in column_attributes: # If attribute isn't in list
-                    column_attributes.append(str(entry))# Add attribute to list
-    del row, rows    
-    return column_attributes # Return the list of lengths
+    return scan(input_file, [AttributeCheck('ATTRIBUTES', *columns)])['ATTRIBUTES']
 
 
 def check_attribute_length (input_file, *columns):
     """Returns the various lengths of attributes in a given column or columns.
     The function is intended to be used as a check of column lengths to see
     if they match the number of characters expected for the column(s)."""
-    
-    column_lengths = [] # Empty list to append attribute lengths
-    field_names = ARCPY.ListFields(input_file) # Input field names
-    
-    rows = ARCPY.SearchCursor(input_file) # Open search cursor
-    for row in rows:
-        for field in field_names:
-            if any(field.name == col for col in columns): # If the field matches input column
-                entry_length = len(str(row.getValue(field.name))) # Get length of attribute value
-                
-                if str(entry_length) not in column_lengths: # If length isn't in list
-                    column_lengths.append(str(entry_length))# Add length to list
-                    
-    del row, rows  
-    return column_lengths # Return the list of lengths
+    return scan(input_file, [AttributeLengthCheck('LENGTHS', *columns)])['LENGTHS']
         
         
 def check_nodata_data(input_file, *columns):
     """Returns the number of incorrectly labeled dates. This functions primary 
     purpose is to look for no data values that are set to '00' or '0000' 
     instead of '99' or '9999'."""
-    
-    nodata = {'YEAR': 0, 'MONTH': 0, 'DAY': 0}
-    field_names = ARCPY.ListFields(input_file) # Input field names
-    
-    rows = ARCPY.SearchCursor(input_file) # Open search cursor
-    for row in rows:
-        for field in field_names:
-            if any(field.name == col for col in columns): # If the field matches input column
-                date = row.getValue(field.name)
-                if date[0:4] == '0000': nodata['YEAR'] = nodata['YEAR'] + 1
-                if date[4:6] == '00': nodata['MONTH'] = nodata['MONTH'] + 1
-                if date[6:8] == '00': nodata['DAY'] = nodata['DAY'] + 1
-    del row, rows  
-    return nodata # Return the list of lengths
+    return scan(input_file, [NodataDateCheck('NODATA', *columns)])['NODATA']
 
 
 def check_date_format (input_file, *columns):
     """Check the date format is in the correct order of 'YYYYMMDD'."""
-    format_warning = 0
-    field_names = ARCPY.ListFields(input_file) # Input field names
-    
-    rows = ARCPY.SearchCursor(input_file) # Open search cursor
-    for row in rows:
-        for field in field_names:
-            if any(field.name == col for col in columns): # If the field matches input column
-                date = row.getValue(field.name)
-                if date[0:2] not in ('19', '20', '-9'): format_warning += 1
-    del row, rows
-    return format_warning
+    return scan(input_file, [DateFormatCheck('FORMAT', *columns)])['FORMAT']
                 
 
 def check_is_uppercase (input_file, *columns):
     """Returns the number of records in a table contain all upper case letters. 
     If all letters in a column are upper case it is considered True, else False"""
-    case_error = 0
-    field_names = ARCPY.ListFields(input_file) # Input field names
-    
-    rows = ARCPY.SearchCursor(input_file) # Open search cursor
-    for row in rows:
-        for field in field_names:
-            if any(field.name == col for col in columns): # If the field matches input column
-                
-                for word in row.getValue(field.name).split(' '):
-                    try:
-                        if word[0].islower(): case_error += 1
-                        if word[1:].isupper(): case_error += 1
-                    except:
-                        case_error += 1
-    return case_error
+    return scan(input_file, [UppercaseCheck('CASE', *columns)])['CASE']
 
 
 def check_area (input_file, threshold = 0.001, column = 'AREA'):
     """Returns the number of polygons which are less then a specified threshold."""
-    threshold_error = 0
-    rows = ARCPY.SearchCursor(input_file) # Open search cursor
-    for row in rows:
-        if float(row.getValue(column)) < threshold: threshold_error += 1
-    del row, rows
-    return threshold_error
+    return scan(input_file, [AreaCheck('AREA', threshold, column)])['AREA']
+    
     
+def rgi_checks ():
+    """Return the list of attribute checks run on each RGI file by rgi_analyze."""
+    return [AttributeLengthCheck('RGIID_LENGTH', 'RGIID'),
+            AttributeLengthCheck('GLIMSID_LENGTH', 'GLIMSID'),
+            AttributeLengthCheck('GLACTYPE_LENGTH', 'GLACTYPE'),
+            AttributeLengthCheck('BGNDATE_LENGTH', 'BGNDATE'),
+            AttributeLengthCheck('ENDDATE_LENGTH', 'ENDDATE'),
+            AttributeCheck('RGIFLAG', 'RGIFLAG'),
+            AttributeCheck('GLACTYPE', 'GLACTYPE'),
+            NodataDateCheck('BGNDATE_NODATA', 'BGNDATE'),
+            NodataDateCheck('ENDDATE_NODATA', 'ENDDATE'),
+            DateFormatCheck('DATE_FORMAT', 'BGNDATE', 'ENDDATE'),
+            UppercaseCheck('RGIFLAG_CASE', 'RGIFLAG'),
+            AreaCheck('AREA_THRESHOLD', 0.001, 'AREA')]
     
 
 #_______________________________________________________________________________
@@ -134,6 +241,9 @@ def check_area (input_file, threshold = 0.001, column = 'AREA'):
 def driver():
     returned = check_date_format ('A:\\Desktop\\RGI32\\RGI32RAW\\01_rgi32_Alaska.shp', 'BGNDATE', 'ENDDATE')
     print returned
+    
+    report = scan ('A:\\Desktop\\RGI32\\RGI32RAW\\01_rgi32_Alaska.shp', rgi_checks())
+    for name in sorted(report.keys()): print name, report[name]
 
     
 if __name__ == '__main__':
@@ -0,0 +1,187 @@
+"""****************************************************************************
+ Name:         glacier_utilities.functions.data_context
+ Purpose:      Holds the digital elevation model (DEM) window and the masks
+     of a single glacier. Everything is built the first time it is asked for
+     and kept so the statistics, hypsometry, centerline, slope and aspect
+     functions in data_calc share one DEM read per glacier.
+
+Created:         Oct 18, 2026
+Author:          script.glaciers contributors
+Location:
+Contributors:
+
+Copyright:   (c) script.glaciers contributors 2026
+License:     Although this application has been produced and tested
+ successfully, no warranty expressed or implied is made regarding the
+ reliability and accuracy of the utility, or the data produced by it, on any
+ other system or for general or scientific purposes, nor shall the act of
+ distribution constitute any such warranty. It is also strongly recommended
+ that careful attention be paid to the contents of the metadata / help file
+ associated with these data to evaluate application limitations, restrictions
+ or intended use. The creators and distributors of the application shall not
+ be held liable for improper or incorrect use of the utility described and/
+ or contained herein.
+****************************************************************************"""
+import math
+import arcpy as ARCPY                                        #@UnresolvedImport
+import numpy as NUMPY
+import glacier_utilities.functions.data_raster as RASTER
+import glacier_utilities.functions.data_centerline as CENTERLINE
+
+class FeatureContext (object):
+    """FeatureContext lazily builds and caches the DEM window, outline mask,
+    binned elevations, bin mask polygons and centerline of one glacier.
+    Attributes:
+    feature: The glacier row from a search cursor.
+    dem: The DEM path, an ARCPY.Raster of it, a DEMReader or a DEMStore.
+    workspace: Scratch workspace for any files that must be written.
+    buffer_scale (optional): DEM window buffer as a multiple of the cell size.
+    max_bin, min_bin, bin_size (optional): Elevation bin settings.
+    fractional (optional): Weight outline cells by the fraction covered.
+    supersample (optional): Samples per cell side for fractional coverage.
+    bin_store (optional): A BinStore of the DEM for the same bin settings.
+        Bins are then sliced from it rather than calculated."""
+
+    def __init__ (self, feature, dem, workspace, buffer_scale = 2, max_bin = 8850,
+                  min_bin = 0, bin_size = 50, fractional = False, supersample = 4, bin_store = None):
+        """init stores the glacier and settings. Nothing is read until it
+        is first needed."""
+        self.feature = feature
+        self.shape = feature.shape
+        self.dem = dem
+        self.workspace = workspace
+        self.buffer_scale = buffer_scale
+        self.max_bin = max_bin
+        self.min_bin = min_bin
+        self.bin_size = bin_size
+        self.total_bins = int(round(math.ceil(float(max_bin - min_bin) / float(bin_size)), 0))
+        self.supersample = supersample
+        if fractional == False: self.supersample = 1
+        self.bin_store = bin_store
+
+        self.__window = None      # DEM array and geotransform
+        self.__coverage = None    # Fraction of each cell within the outline
+        self.__mask = None        # Cells within the outline with data
+        self.__bins = None        # Bin index of each cell (-1 outside mask)
+        self.__masked_dem = None  # Elevations and cell areas within the mask
+        self.__dem_raster = None  # In memory raster of the DEM window
+        self.__bin_mask = None    # Bin mask polygons
+        self.__centerline = {}    # (power, cell size): centerline path
+        self.__temporary = []     # In memory items to delete on close
+
+#______________________________________________________________________________
+#***Methods********************************************************************
+    def get_window (self):
+        """Return the DEM window, buffered by buffer_scale cells around the
+        outline, as an array and its geotransform."""
+        if self.__window is None:
+            if not isinstance(self.dem, (ARCPY.Raster, RASTER.DEMReader, RASTER.DEMStore)): self.dem = ARCPY.Raster(self.dem)
+            buffer_size = self.dem.meanCellWidth * self.buffer_scale
+            extent = self.shape.extent
+            window = [extent.XMin - buffer_size, extent.YMin - buffer_size,
+                      extent.XMax + buffer_size, extent.YMax + buffer_size]
+            if isinstance(self.dem, (RASTER.DEMReader, RASTER.DEMStore)): # Tile cache or memory map
+                self.__window = self.dem.read_window(*window)
+            else:
+                self.__window = RASTER.read_window(self.dem, *window)
+        return self.__window
+
+
+    def get_coverage (self):
+        """Return the fraction of each window cell within the outline."""
+        if self.__coverage is None:
+            elevation, geotransform = self.get_window()
+            rows, cols = elevation.shape
+            self.__coverage = RASTER.rasterize_polygon(RASTER.get_rings(self.shape),
+                                                       geotransform, rows, cols, self.supersample)
+        return self.__coverage
+
+
+    def get_mask (self):
+        """Return a boolean array of window cells within the outline that
+        have elevation data."""
+        if self.__mask is None:
+            elevation = self.get_window()[0]
+            self.__mask = (self.get_coverage() > 0) & ~NUMPY.isnan(elevation)
+        return self.__mask
+
+
+    def get_bins (self):
+        """Return the elevation bin index of each window cell. Cells outside
+        of the mask or the bin range are -1."""
+        if self.__bins is None:
+            elevation, geotransform = self.get_window()
+            if self.bin_store is not None: # Precalculated for the whole DEM
+                bins = self.bin_store.read_bins(geotransform, elevation.shape[0], elevation.shape[1])
+            else:
+                bins = RASTER.bin_elevations(elevation, self.min_bin, self.bin_size)
+            bins[~self.get_mask() | (bins >= self.total_bins)] = -1
+            self.__bins = bins
+        return self.__bins
+
+
+    def get_masked_dem (self):
+        """Return a list of the elevations within the mask and the area each
+        of those cells contributes to the glacier."""
+        if self.__masked_dem is None:
+            elevation, geotransform = self.get_window()
+            mask = self.get_mask()
+            cell_area = abs(geotransform[1] * geotransform[5])
+            self.__masked_dem = [elevation[mask], self.get_coverage()[mask] * cell_area]
+        return self.__masked_dem
+
+
+    def get_dem_raster (self):
+        """Return the DEM window as an in memory raster for use with ArcGIS
+        tools. Nothing is written to the workspace."""
+        if self.__dem_raster is None:
+            elevation, geotransform = self.get_window()
+            lower_left = ARCPY.Point(geotransform[0], geotransform[3] + geotransform[5] * elevation.shape[0])
+            filled = NUMPY.where(NUMPY.isnan(elevation), RASTER.NODATA, elevation)
+            self.__dem_raster = ARCPY.NumPyArrayToRaster(filled, lower_left, geotransform[1], -geotransform[5], RASTER.NODATA)
+            ARCPY.DefineProjection_management(self.__dem_raster, self.dem.spatialReference)
+        return self.__dem_raster
+
+
+    def get_bin_mask (self):
+        """Return the bin mask, a polygon feature class with one (possibly
+        multi-part) polygon per elevation bin clipped to the outline. The
+        GRIDCODE field holds the lower elevation of the bin."""
+        if self.__bin_mask is None:
+            bins = self.get_bins()
+            geotransform = self.get_window()[1]
+            values = NUMPY.where(bins >= 0, self.min_bin + bins * self.bin_size, RASTER.NODATA).astype(NUMPY.int32)
+            lower_left = ARCPY.Point(geotransform[0], geotransform[3] + geotransform[5] * bins.shape[0])
+            bin_raster = ARCPY.NumPyArrayToRaster(values, lower_left, geotransform[1], -geotransform[5], RASTER.NODATA)
+            ARCPY.DefineProjection_management(bin_raster, self.dem.spatialReference)
+
+            polygons = ARCPY.RasterToPolygon_conversion(bin_raster, 'in_memory\\bin_polygons', 'NO_SIMPLIFY')
+            clipped = ARCPY.Clip_analysis(polygons, self.shape, 'in_memory\\bin_clipped')
+            self.__bin_mask = ARCPY.Dissolve_management(clipped, 'in_memory\\bin_mask', 'GRIDCODE')
+            ARCPY.Delete_management(polygons)
+            ARCPY.Delete_management(clipped)
+            self.__temporary.append(self.__bin_mask)
+        return self.__bin_mask
+
+
+    def get_centerline_path (self, power = 5, eu_cell_size = 10):
+        """Return the centerline of the glacier as an array of coordinates,
+        highest to lowest, with its length and slope (see data_centerline)."""
+        key = (power, eu_cell_size)
+        if key not in self.__centerline:
+            elevation, geotransform = self.get_window()
+            self.__centerline[key] = CENTERLINE.get_centerline(elevation, geotransform, RASTER.get_rings(self.shape),
+                                                               power, eu_cell_size)
+        return self.__centerline[key]
+
+
+    def close (self):
+        """Delete any in memory items created for this glacier and release
+        the cached arrays."""
+        for item in self.__temporary:
+            try: ARCPY.Delete_management(item)
+            except: pass
+        self.__temporary = []
+        self.__window = self.__coverage = self.__mask = self.__bins = None
+        self.__masked_dem = self.__dem_raster = self.__bin_mask = None
+        self.__centerline = {}
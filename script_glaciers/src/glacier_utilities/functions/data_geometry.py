@@ -0,0 +1,375 @@
+"""****************************************************************************
+ Name:         glacier_utilities.functions.data_geometry
+ Purpose:      A geometry backend that reads shapefiles directly with struct
+     and NumPy. Ring validity, multi-part and equal area checks can be run
+     without ArcGIS, its licenses or any geoprocessing tools, so files can be
+     checked quickly before they are analyzed, on any machine. Also holds
+     an STR-tree spatial index used to find overlapping features.
+
+Created:         Oct 18, 2026
+Author:          script.glaciers contributors
+Location:
+Contributors:
+
+Copyright:   (c) script.glaciers contributors 2026
+License:     Although this application has been produced and tested
+ successfully, no warranty expressed or implied is made regarding the
+ reliability and accuracy of the utility, or the data produced by it, on any
+ other system or for general or scientific purposes, nor shall the act of
+ distribution constitute any such warranty. It is also strongly recommended
+ that careful attention be paid to the contents of the metadata / help file
+ associated with these data to evaluate application limitations, restrictions
+ or intended use. The creators and distributors of the application shall not
+ be held liable for improper or incorrect use of the utility described and/
+ or contained herein.
+****************************************************************************"""
+import os
+import struct
+import numpy as NUMPY
+
+BACKENDS = ('ARCGIS', 'NUMPY') # Geometry backends available to data_prep
+POLYGON_TYPES = (5, 15, 25)     # Polygon, PolygonZ and PolygonM shapes
+
+# WGS 84 ellipsoid used by the Cylindrical Equal Area (world) projection
+SEMI_MAJOR = 6378137.0
+FLATTENING = 1 / 298.257223563
+
+def read_shapefile (input_file):
+    """Generator that reads the polygons of a shapefile (.shp) in FID order.
+    Yields the FID and a list of the rings of each polygon as (n, 2) arrays
+    of x, y coordinates. Null shapes have no rings."""
+    shp = open (os.path.splitext(input_file)[0] + '.shp', 'rb')
+    header = shp.read(100)
+    file_length = struct.unpack('>i', header[24:28])[0] * 2 # Bytes
+    shape_type = struct.unpack('<i', header[32:36])[0]
+    if shape_type not in POLYGON_TYPES and shape_type <> 0:
+        shp.close()
+        raise ValueError('Not a polygon shapefile (shape type ' + str(shape_type) + ')')
+
+    fid = 0
+    position = 100
+    while position + 8 <= file_length:
+        content_length = struct.unpack('>ii', shp.read(8))[1] * 2
+        content = shp.read(content_length)
+        position += 8 + content_length
+
+        rings = []
+        if struct.unpack('<i', content[0:4])[0] in POLYGON_TYPES:
+            part_count, point_count = struct.unpack('<ii', content[36:44])
+            parts = list(struct.unpack('<' + str(part_count) + 'i', content[44:44 + 4 * part_count])) + [point_count]
+            start = 44 + 4 * part_count
+            points = NUMPY.frombuffer(content[start:start + 16 * point_count], '<f8').reshape(-1, 2)
+            rings = [points[parts[index]:parts[index + 1]] for index in range (part_count)]
+        yield fid, rings
+        fid += 1
+    shp.close()
+
+
+def read_dbf_column (input_file, column):
+    """Return the values of a numeric column of a shapefile's attribute table
+    (.dbf) as a list of floats in FID order. Blank values are None. Records
+    flagged as deleted are left out."""
+    dbf = open (os.path.splitext(input_file)[0] + '.dbf', 'rb')
+    record_count, header_length, record_length = struct.unpack('<IHH', dbf.read(32)[4:12])
+
+    offset = 1 # Each record starts with a deleted flag
+    field = None # Offset and width of the column
+    descriptor = dbf.read(32)
+    while descriptor[0:1] <> '\r' and len(descriptor) == 32:
+        name = descriptor[0:11].split('\x00')[0].strip()
+        width = ord(descriptor[16:17])
+        if name.upper() == column.upper(): field = (offset, width)
+        offset += width
+        descriptor = dbf.read(32)
+    if field is None:
+        dbf.close()
+        raise ValueError('Column not found: ' + column)
+
+    values = []
+    dbf.seek(header_length)
+    for record in range (record_count):
+        record = dbf.read(record_length)
+        if record[0:1] == '*': continue # Deleted record
+        value = record[field[0]:field[0] + field[1]].strip()
+        try: values.append(float(value))
+        except ValueError: values.append(None)
+    dbf.close()
+    return values
+
+
+def read_projection (input_file):
+    """Return the projection (.prj) of a shapefile as a string, or an empty
+    string if it has none."""
+    prj = os.path.splitext(input_file)[0] + '.prj'
+    if not os.path.exists(prj): return ''
+    projection = open (prj, 'r')
+    text = projection.read()
+    projection.close()
+    return text
+
+
+def signed_area (ring):
+    """Return the signed (shoelace) area of a ring. Shapefile outer rings are
+    clockwise and have a negative area, holes are counterclockwise and have
+    a positive area."""
+    x = ring[:, 0] - ring[:, 0].mean() # Centered to limit rounding error
+    y = ring[:, 1] - ring[:, 1].mean()
+    return 0.5 * float(NUMPY.sum(x * NUMPY.roll(y, -1) - NUMPY.roll(x, -1) * y))
+
+
+def ring_errors (rings):
+    """Return a list of the problems found with the rings of a polygon: null
+    geometry, short ring (fewer than 4 points), unclosed ring, invalid
+    coordinate, zero area ring and incorrect ring ordering (the first ring
+    is not an outer ring). Self intersections are not looked for."""
+    if len(rings) == 0: return ['null geometry']
+    errors = []
+    for index, ring in enumerate (rings):
+        if len(ring) < 4: errors.append('short ring'); continue
+        if not NUMPY.isfinite(ring).all(): errors.append('invalid coordinate'); continue
+        if not (ring[0] == ring[-1]).all(): errors.append('unclosed ring')
+        area = signed_area(ring)
+        if area == 0: errors.append('zero area ring')
+        elif index == 0 and area > 0: errors.append('incorrect ring ordering')
+    return errors
+
+
+def equal_area (longitude, latitude):
+    """Project longitudes and latitudes (decimal degrees, WGS 84) to the
+    Cylindrical Equal Area (world) projection. Returns x and y in meters."""
+    eccentricity_squared = FLATTENING * (2 - FLATTENING)
+    eccentricity = NUMPY.sqrt(eccentricity_squared)
+    sine = NUMPY.sin(NUMPY.radians(latitude))
+    q = (1 - eccentricity_squared) * (sine / (1 - eccentricity_squared * sine ** 2) -
+         NUMPY.log((1 - eccentricity * sine) / (1 + eccentricity * sine)) / (2 * eccentricity))
+    return SEMI_MAJOR * NUMPY.radians(longitude), SEMI_MAJOR * q / 2
+
+
+def row_crossings (rings, y):
+    """Return the sorted x coordinates where the rings of a polygon cross the
+    horizontal line y. Between each pair of crossings the line is inside the
+    polygon. Edges are used bottom to top so an edge shared by two polygons
+    gives the same crossing for both."""
+    crossings = []
+    for ring in rings:
+        if len(ring) < 4: continue
+        x1 = ring[:-1, 0]; y1 = ring[:-1, 1]; x2 = ring[1:, 0]; y2 = ring[1:, 1]
+        flip = y1 > y2 # Order every edge from its lowest point
+        x_low = NUMPY.where(flip, x2, x1); y_low = NUMPY.where(flip, y2, y1)
+        x_high = NUMPY.where(flip, x1, x2); y_high = NUMPY.where(flip, y1, y2)
+        cross = (y_low <= y) & (y < y_high)
+        crossings.append(x_low[cross] + (y - y_low[cross]) * (x_high[cross] - x_low[cross]) / (y_high[cross] - y_low[cross]))
+    if len(crossings) == 0: return NUMPY.zeros(0)
+    return NUMPY.sort(NUMPY.concatenate(crossings))
+
+
+def overlap_area (rings, other_rings, box, rows = 256):
+    """Return the area two polygons share within a box (the overlap of their
+    extents). The box is scanned along horizontal lines through the middle
+    of each of the given number of rows and the length of each line inside
+    both polygons is added up, so the area is exact for straight sided
+    shapes in the row direction and close otherwise. Polygons that only
+    touch along an edge share no area."""
+    height = (box[3] - box[1]) / float(rows)
+    if height <= 0: return 0.0
+    area = 0.0
+    for row in range (rows):
+        y = box[1] + (row + 0.5) * height
+        first = row_crossings(rings, y)
+        second = row_crossings(other_rings, y)
+        if len(first) == 0 or len(second) == 0: continue
+        x = NUMPY.concatenate((first, second))
+        order = NUMPY.argsort(x, kind = 'mergesort')
+        is_first = NUMPY.concatenate((NUMPY.ones(len(first), bool), NUMPY.zeros(len(second), bool)))[order]
+        inside_first = NUMPY.cumsum(is_first) % 2 == 1 # Inside each polygon after each crossing
+        inside_second = NUMPY.cumsum(~is_first) % 2 == 1
+        both = inside_first[:-1] & inside_second[:-1]
+        area += float(NUMPY.diff(x[order])[both].sum()) * height
+    return area
+
+
+class NumPyBackend (object):
+    """NumPyBackend checks the polygons of a shapefile without ArcGIS. It can
+    report problems but not repair them.
+    Attributes:
+    input_file: Path of the shapefile."""
+
+    def __init__ (self, input_file):
+        """init keeps the path. The shapefile is read by each check."""
+        self.input_file = input_file
+
+#______________________________________________________________________________
+#***Methods********************************************************************
+    def check_geometry (self):
+        """Return the number of features with ring problems (see
+        ring_errors)."""
+        return sum(1 for fid, rings in read_shapefile(self.input_file) if len(ring_errors(rings)) > 0)
+
+
+    def count_multipart (self):
+        """Return the number of features that would be added by splitting
+        multi-part polygons into single parts (outer rings past the first
+        of each feature). Holes do not count as parts."""
+        extra = 0
+        for fid, rings in read_shapefile(self.input_file):
+            outer = sum(1 for ring in rings if len(ring) >= 4 and signed_area(ring) < 0)
+            extra += max(outer - 1, 0)
+        return extra
+
+
+    def get_areas (self):
+        """Return the equal area (km2) of every feature in FID order. The
+        shapefile must be in geographic (longitude, latitude) coordinates."""
+        if not read_projection(self.input_file).upper().startswith('GEOGCS'):
+            raise ValueError('Equal areas need geographic coordinates: ' + self.input_file)
+        areas = []
+        for fid, rings in read_shapefile(self.input_file):
+            area = 0.0
+            for ring in rings:
+                if len(ring) < 4: continue
+                x, y = equal_area(ring[:, 0], ring[:, 1])
+                area += signed_area(NUMPY.column_stack((x, y)))
+            areas.append(abs(area) / 1000000)
+        return areas
+
+
+    def check_area (self):
+        """Return the sum of the AREA column, the sum of the equal areas and
+        their difference (km2)."""
+        original_sum = sum(value for value in read_dbf_column(self.input_file, 'AREA') if value is not None)
+        final_sum = sum(self.get_areas())
+        return original_sum, final_sum, original_sum - final_sum
+
+
+    def find_overlaps (self):
+        """Return the number of features and a list of [FID, FID, overlap
+        area] of features that overlap each other, as data_prep.find_overlaps.
+        Candidate pairs whose extents overlap are found with an STR-tree and
+        their shared area measured in the Cylindrical Equal Area projection
+        (see overlap_area). The shapefile must be in geographic coordinates."""
+        if not read_projection(self.input_file).upper().startswith('GEOGCS'):
+            raise ValueError('Equal areas need geographic coordinates: ' + self.input_file)
+        count = 0
+        fids = []
+        polygons = []
+        for fid, rings in read_shapefile(self.input_file):
+            count += 1
+            rings = [ring for ring in rings if len(ring) >= 4]
+            if len(rings) == 0: continue # Null geometry
+            fids.append(fid)
+            polygons.append([NUMPY.column_stack(equal_area(ring[:, 0], ring[:, 1])) for ring in rings])
+        
+        boxes = NUMPY.array([[min(ring[:, 0].min() for ring in rings), min(ring[:, 1].min() for ring in rings),
+                              max(ring[:, 0].max() for ring in rings), max(ring[:, 1].max() for ring in rings)]
+                             for rings in polygons], NUMPY.float64).reshape(-1, 4)
+        overlaps = []
+        for first, second in STRTree(boxes).query_pairs():
+            box = [max(boxes[first, 0], boxes[second, 0]), max(boxes[first, 1], boxes[second, 1]),
+                   min(boxes[first, 2], boxes[second, 2]), min(boxes[first, 3], boxes[second, 3])]
+            area = overlap_area(polygons[first], polygons[second], box)
+            if area > 0: overlaps.append([fids[first], fids[second], area / 1000000])
+        return count, overlaps
+
+
+class STRTree (object):
+    """STRTree is a Sort-Tile-Recursive packed R-tree of bounding boxes. Boxes
+    are sorted into vertical slices by x, each slice is sorted by y and
+    packed into nodes, and the nodes are packed the same way until a single
+    root remains. A query only visits nodes whose box overlaps its own.
+    Attributes:
+    boxes: An (n, 4) array of boxes (x min, y min, x max, y max).
+    node_size (optional): Number of children packed into each node."""
+
+    def __init__ (self, boxes, node_size = 10):
+        """init packs the tree from the boxes up."""
+        self.boxes = NUMPY.asarray(boxes, NUMPY.float64).reshape(-1, 4)
+        self.node_size = max(int(node_size), 2)
+        self.levels = [] # [node boxes, children] from the leaves to the root
+
+        level_boxes = self.boxes
+        while True:
+            order = self.__pack(level_boxes)
+            children = [order[start:start + self.node_size] for start in range (0, len(order), self.node_size)]
+            node_boxes = NUMPY.array([[level_boxes[child, 0].min(), level_boxes[child, 1].min(),
+                                       level_boxes[child, 2].max(), level_boxes[child, 3].max()] 
+                                      for child in children], NUMPY.float64).reshape(-1, 4)
+            self.levels.append([node_boxes, children])
+            if len(children) <= 1: break
+            level_boxes = node_boxes
+
+#______________________________________________________________________________
+#***Methods********************************************************************
+    def __pack (self, boxes):
+        """Return the order of the boxes sorted into tiles."""
+        count = len(boxes)
+        if count == 0: return NUMPY.arange(0)
+        nodes = int(NUMPY.ceil(count / float(self.node_size)))
+        slice_size = int(NUMPY.ceil(NUMPY.sqrt(nodes))) * self.node_size # Boxes per vertical slice
+        x_center = (boxes[:, 0] + boxes[:, 2]) / 2
+        y_center = (boxes[:, 1] + boxes[:, 3]) / 2
+        by_x = NUMPY.argsort(x_center, kind = 'mergesort')
+        tiles = []
+        for start in range (0, count, slice_size):
+            strip = by_x[start:start + slice_size]
+            tiles.append(strip[NUMPY.argsort(y_center[strip], kind = 'mergesort')])
+        return NUMPY.concatenate(tiles)
+
+
+    def query (self, box):
+        """Return the indexes of the boxes overlapping (or touching) a box."""
+        if len(self.boxes) == 0: return []
+        x_min, y_min, x_max, y_max = box
+        found = []
+        stack = [(len(self.levels) - 1, NUMPY.arange(len(self.levels[-1][1])))]
+        while stack:
+            level, nodes = stack.pop()
+            node_boxes, children = self.levels[level]
+            hit = nodes[(node_boxes[nodes, 0] <= x_max) & (node_boxes[nodes, 2] >= x_min) &
+                        (node_boxes[nodes, 1] <= y_max) & (node_boxes[nodes, 3] >= y_min)]
+            for node in hit:
+                if level == 0: found.extend(children[node].tolist())
+                else: stack.append((level - 1, children[node]))
+        found = NUMPY.array(found, NUMPY.int64)
+        boxes = self.boxes[found] # Keep the boxes of the leaves that overlap
+        return sorted(found[(boxes[:, 0] <= x_max) & (boxes[:, 2] >= x_min) &
+                            (boxes[:, 1] <= y_max) & (boxes[:, 3] >= y_min)].tolist())
+
+
+    def query_pairs (self):
+        """Return every pair (i, j), i < j, of boxes that overlap or touch."""
+        pairs = []
+        for index, box in enumerate (self.boxes):
+            pairs.extend((index, other) for other in self.query(box) if other > index)
+        return pairs
+
+
+def preflight (input_file):
+    """Check a shapefile without ArcGIS. Returns a dictionary of the number of
+    features with geometry problems, extra multi-part polygons, the AREA
+    column, equal area and difference sums and the overlapping features (see
+    NumPyBackend.find_overlaps). AREA and OVERLAPS are None if the file is
+    not in geographic coordinates (or has no AREA column)."""
+    backend = NumPyBackend(input_file)
+    report = {'GEOMETRY': backend.check_geometry(), 'MULTIPART': backend.count_multipart(), 'AREA': None, 'OVERLAPS': None}
+    try: report['AREA'] = backend.check_area()
+    except ValueError: pass
+    try: report['OVERLAPS'] = backend.find_overlaps()[1]
+    except ValueError: pass
+    return report
+
+
+#Driver
+def main():
+    """Print a pre-flight report of each shapefile given on the command line."""
+    import sys
+    for input_file in sys.argv[1:]:
+        report = preflight(input_file)
+        print os.path.basename(input_file)
+        print '    Geometry - ' + str(report['GEOMETRY']) + ' features with errors'
+        print '    Multi-Part Polygons - ' + str(report['MULTIPART']) + ' found'
+        if report['AREA'] is not None:
+            print '    Area - ' + str(round(report['AREA'][2], 3)) + ' difference'
+        if report['OVERLAPS'] is not None:
+            print '    Topology - ' + str(len(report['OVERLAPS'])) + ' overlapping pairs'
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""****************************************************************************
+ Name:         glacier_utilities.functions.data_order
+ Purpose:      Orders glaciers along a space filling curve (Hilbert or Z-order)
+     so glaciers near each other are processed one after another and DEM
+     tiles already in the cache are reused.
+
+Created:         Oct 18, 2026
+Author:          script.glaciers contributors
+Location:
+Contributors:
+
+Copyright:   (c) script.glaciers contributors 2026
+License:     Although this application has been produced and tested
+ successfully, no warranty expressed or implied is made regarding the
+ reliability and accuracy of the utility, or the data produced by it, on any
+ other system or for general or scientific purposes, nor shall the act of
+ distribution constitute any such warranty. It is also strongly recommended
+ that careful attention be paid to the contents of the metadata / help file
+ associated with these data to evaluate application limitations, restrictions
+ or intended use. The creators and distributors of the application shall not
+ be held liable for improper or incorrect use of the utility described and/
+ or contained herein.
+****************************************************************************"""
+import math
+import collections
+import numpy as NUMPY
+import glacier_utilities.functions.data_centroid as CENTROID
+
+ORDERS = ('FID', 'HILBERT', 'ZORDER') # Processing orders available
+
+def get_extents (input_file):
+    """Return the FID of every feature with geometry, in FID order, and an
+    (n, 4) array of their extents (x min, y min, x max, y max) from the
+    shapefile's centroid index (see data_centroid)."""
+    index = CENTROID.get_index(input_file)
+    return index['FID'], index['EXTENT']
+
+
+def to_grid (x, y, bits):
+    """Scale coordinates to integer cells of a 2**bits by 2**bits grid."""
+    cells = 2 ** bits - 1
+    x_range = max(x.max() - x.min(), 1e-9)
+    y_range = max(y.max() - y.min(), 1e-9)
+    return (((x - x.min()) / x_range * cells).astype(NUMPY.int64),
+            ((y - y.min()) / y_range * cells).astype(NUMPY.int64))
+
+
+def zorder_index (x, y, bits = 16):
+    """Return the position of each point along a Z-order (Morton) curve. The
+    bits of the x and y grid cells are interleaved."""
+    x, y = to_grid(x, y, bits)
+    index = NUMPY.zeros(len(x), NUMPY.int64)
+    for bit in range (bits):
+        index |= ((x >> bit) & 1) << (2 * bit)
+        index |= ((y >> bit) & 1) << (2 * bit + 1)
+    return index
+
+
+def hilbert_index (x, y, bits = 16):
+    """Return the position of each point along a Hilbert curve. Unlike the
+    Z-order curve, each step along a Hilbert curve moves to a neighboring
+    cell."""
+    x, y = to_grid(x, y, bits)
+    index = NUMPY.zeros(len(x), NUMPY.int64)
+    size = 2 ** bits
+    scale = size // 2
+    while scale > 0:
+        rx = (x & scale) > 0
+        ry = (y & scale) > 0
+        index += scale * scale * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve within it runs the right way
+        flip = ~ry & rx
+        x = NUMPY.where(flip, size - 1 - x, x)
+        y = NUMPY.where(flip, size - 1 - y, y)
+        swap = ~ry
+        x, y = NUMPY.where(swap, y, x), NUMPY.where(swap, x, y)
+        scale //= 2
+    return index
+
+
+def get_order (fids, extents, order = 'FID'):
+    """Return the FIDs sorted into the given processing order. Spatial orders
+    use the center of each feature's extent."""
+    if order == 'FID' or len(fids) == 0: return list(fids)
+    x = (extents[:, 0] + extents[:, 2]) / 2.0
+    y = (extents[:, 1] + extents[:, 3]) / 2.0
+    if order == 'HILBERT': index = hilbert_index(x, y)
+    elif order == 'ZORDER': index = zorder_index(x, y)
+    else: raise ValueError('Unknown processing order: ' + str(order))
+    return [fids[position] for position in NUMPY.argsort(index, kind = 'mergesort')]
+
+
+def simulate_tile_cache (fids, extents, order, dem, buffer_scale = 2, tile_size = 512, memory_budget = 256):
+    """Return the percent of DEM tile reads that a DEMReader (see data_raster)
+    would find in its cache when the features are processed in the given
+    order of FIDs. Nothing is read from the DEM."""
+    capacity = max(int(memory_budget * 1048576 // (tile_size * tile_size * 4)), 1) # Tiles kept
+    position = dict((fid, index) for index, fid in enumerate (fids))
+    buffer_size = dem.meanCellWidth * buffer_scale
+
+    tiles = collections.OrderedDict()
+    hits = 0
+    requests = 0
+    for fid in order:
+        x_min, y_min, x_max, y_max = extents[position[fid]]
+        first_col = max(int(math.floor((x_min - buffer_size - dem.extent.XMin) / dem.meanCellWidth)), 0) // tile_size
+        last_col = min(int(math.ceil((x_max + buffer_size - dem.extent.XMin) / dem.meanCellWidth)), dem.width) - 1
+        first_row = max(int(math.floor((dem.extent.YMax - y_max - buffer_size) / dem.meanCellHeight)), 0) // tile_size
+        last_row = min(int(math.ceil((dem.extent.YMax - y_min + buffer_size) / dem.meanCellHeight)), dem.height) - 1
+        for tile_row in range (first_row, last_row // tile_size + 1):
+            for tile_col in range (first_col, last_col // tile_size + 1):
+                key = (tile_row, tile_col)
+                requests += 1
+                if key in tiles:
+                    hits += 1
+                    tiles.pop(key)
+                tiles[key] = True # Most recently used
+                if len(tiles) > capacity: tiles.popitem(last = False)
+    if requests == 0: return 0.0
+    return 100.0 * hits / requests
@@ -21,108 +21,106 @@ License:     Although this application has been produced and tested
 ****************************************************************************"""
 import os
 import arcpy as ARCPY                                        #@UnresolvedImport
+import numpy as NUMPY
+import glacier_utilities.functions.data_centroid as CENTROID
 
-def generate_GLIMSIDs (input_file, workspace):
+def format_GLIMSIDs (longitude, latitude):
+    """Return the GLIMS ID of each longitude and latitude in NumPy arrays of
+    decimal degrees. Longitudes are given east from 0 to 360 and latitudes
+    as north or south, both to three decimal places (i.e. G212345E61234N)."""
+    X = (NUMPY.round(longitude, 3) * 1000).astype(NUMPY.int64)
+    Y = (NUMPY.round(latitude, 3) * 1000).astype(NUMPY.int64)
+    X[X < 0] += 360000 # Values 180-360
+    hemisphere = NUMPY.where(Y < 0, 'S', 'N')
+    return ['G%06dE%05d%s' % values for values in zip (X.tolist(), NUMPY.abs(Y).tolist(), hemisphere.tolist())]
+
+
+def generate_GLIMSIDs (input_file, workspace = None):
     """Generate GLIMS id's for the input table. These are based on latitude
-    and longitude. File is re-projected into WGS84 to obtain these. 
+    and longitude of each glacier's centroid in WGS84, read from the
+    shapefile's centroid index (see data_centroid). This is the native
+    centroid projected to WGS84, so the last digit of an ID may differ from
+    IDs made from a WGS84 copy of the outlines. IDs are written in a single
+    pass keyed by FID and features with no geometry are left as they are.
+    The workspace is no longer used and kept for older callers.
     WARNING - ID's checked for Alaska but have NOT YET been verified in 
     other regions."""
-    # Create a copy of the input in WGS 84 for calculating Lat. / Lon.
-    output_wgs84 = workspace + "\\Input_File_WGS84.shp"
-    projection = os.path.dirname(os.path.abspath(__file__)) + '\\projection\\WGS1984.prj'
-    ARCPY.Project_management(input_file, output_wgs84, projection)
+    index = CENTROID.get_index(input_file)
+    glims_values = dict(zip (index['FID'], format_GLIMSIDs(index['WGS84'][:, 0], index['WGS84'][:, 1])))
     
-    glims_values = [] # Hold the ID's to add to non WGS-84 Table
-    
-    rows = ARCPY.UpdateCursor(output_wgs84)
+    # Transfer calculated GLIMS IDs to the input file
+    rows = ARCPY.da.UpdateCursor (input_file, ['OID@', 'GLIMSID'])
     for row in rows:
-        #Find the Centroid Point
-        featureCenter = row.getValue(ARCPY.Describe(output_wgs84).shapeFieldName)
-        X = int(round(featureCenter.centroid.X, 3) * 1000) # Get X of Centroid
-        Y = int(round(featureCenter.centroid.Y, 3) * 1000) # Get Y of Centroid
+        if row[0] in glims_values: rows.updateRow([row[0], glims_values[row[0]]]) # Update the new entry
+    del rows #Delete cursors and remove locks
     
-        # Format the E and N/S values appropriately. 
-        if X < 0: X = str((360000 + X) ) + "E"      # Values 180-360
-        else: X = str(X) + "E" # Values Greater then or equal to 100
-        # Account for values that are not long enough (i.e. 0.0025 would otherwise be 25)
-        X = (7 - len(X)) * '0' + X
+    return str(len(glims_values)) # Return number of IDs generated
 
-        if Y < 0: Y = str(-1 * Y) + "S"     # Values to the south
-        else: Y = str(Y) + "N" # Values to the north
-        Y = (6 - len(Y)) * '0' + Y # Account for values that are not long enough 
 
-        glims_values.append("G"+ str(X) + str(Y)) # Append value to list of values
-    
-    ARCPY.Delete_management(output_wgs84) # Delete temporary re-projected file
-    del row     #Delete cursors and remove locks
-    del rows
+def format_RGIIDs (values, version, region, width = 5):
+    """Return the RGI ID of each number in a NumPy array, zero padded to the
+    width (i.e. RGI32-01.00001). Raises a ValueError if any number needs
+    more digits than the width."""
+    values = NUMPY.asarray(values, NUMPY.int64)
+    if len(values) > 0 and values.max() >= 10 ** width:
+        overflow = int(NUMPY.sum(values >= 10 ** width))
+        raise ValueError(str(overflow) + ' RGI IDs need more than ' + str(width) + ' digits (largest ' + str(values.max()) + ')')
+    rgi_starter = 'RGI' + str(version) + '-' + str(region) + '.'
+    return NUMPY.char.add(rgi_starter, NUMPY.char.zfill(values.astype(str), width)).tolist()
+
+
+def generate_RGIIDs (input_file, version, region, width = 5):
+    """Generate RGI id's for the input table from each FID + 1. This requires
+    including the version and region numbers as input values. The numbers
+    are zero padded to the width. Every ID is calculated and checked first,
+    a ValueError is raised (and nothing written) if an ID needs more digits
+    than the width, is longer than the RGIID field or is not unique. IDs
+    are then written in a single pass keyed by FID."""
+    fids = [row[0] for row in ARCPY.da.SearchCursor(input_file, ['OID@'])]
+    rgi_values = format_RGIIDs(NUMPY.array(fids, NUMPY.int64) + 1, version, region, width)
     
-    # Get ID count to return. i.e. number of glaciers
-    id_count = str(len(glims_values))
+    field_length = ARCPY.ListFields(input_file, 'RGIID')[0].length
+    if len(rgi_values) > 0 and max(len(value) for value in rgi_values) > field_length:
+        raise ValueError('RGI IDs are longer than the RGIID field (' + str(field_length) + ' characters)')
+    if len(set(rgi_values)) <> len(rgi_values):
+        raise ValueError(str(len(rgi_values) - len(set(rgi_values))) + ' RGI IDs are not unique')
+    rgi_values = dict(zip (fids, rgi_values))
     
-    # Transfer calculated GLIMS IDs to the original input file
-    rows = ARCPY.UpdateCursor (input_file)
+    rows = ARCPY.da.UpdateCursor (input_file, ['OID@', 'RGIID'])
     for row in rows:
-        row.GLIMSID = glims_values.pop(0) # pop next value and print it to file.
-        rows.updateRow(row) # Update the new entry
-    del row #Delete cursors and remove locks
-    del rows    
-    
-    return id_count # Return number of IDs generated
+        rows.updateRow([row[0], rgi_values[row[0]]]) # Update the new entry
+    del rows #Delete cursors and remove locks
+    return str(len(rgi_values))
 
 
-def generate_RGIIDs (input_file, version, region):
-    """Generate RGI id's for the input table. This requires including the version
-    and region numbers as input values."""
-    id_count = 0
-    rgi_starter = 'RGI' + str(version) + '-' + str(region) + '.'
-    
-    rows = ARCPY.UpdateCursor (input_file)
-    for row in rows:
-        row_value = row.FID + 1
-        try:
-            if row_value < 10: row.RGIID = rgi_starter + '0000' + str(row_value)
-            if row_value >= 10 and row_value < 100: row.RGIID = rgi_starter + '000' + str(row_value)
-            if row_value >= 100 and row_value < 1000: row.RGIID = rgi_starter + '00' + str(row_value)
-            if row_value >= 1000 and row_value < 10000: row.RGIID = rgi_starter + '0' + str(row_value)
-            if row_value >= 10000 and row_value < 100000: row.RGIID = rgi_starter + '' + str(row_value)
-            rows.updateRow(row) # Update the new entry
-        except:
-            pass
-        id_count += 1
-    del row, rows #Delete cursors and remove locks
-    del row_value, rgi_starter # Delete variables not need
-    return str(id_count)
-
-
-def auto_generate_RGIIDs (input_file, version):
+def auto_generate_RGIIDs (input_file, version, width = 5):
     """Generate RGI ID's automatically. This function uses the 'Gennerate
     RGIIDs' function and is made to simply parse out the region number."""
-    rows = ARCPY.SearchCursor(input_file)
+    rows = ARCPY.da.SearchCursor(input_file, ['O1REGION'])
     for row in rows:
-        region_number = str(row.getValue('O1REGION'))
+        region_number = str(row[0])
         break
     del row, rows
     
     if len(region_number) == 1: 
         region_number = '0' + region_number
     
-    generate_RGIIDs (input_file, version, region_number)
+    generate_RGIIDs (input_file, version, region_number, width)
     return True
 
 
 def generate_centroid (input_file):
-    """Generate RGI Glacier Centroids. Requires the data to be in a geographic
-    projection and both a 'CENLON' and 'CENLAT' field."""
-    rows = ARCPY.UpdateCursor(input_file)
+    """Generate RGI Glacier Centroids from the shapefile's centroid index (see
+    data_centroid). Requires the data to be in a geographic projection and
+    both a 'CENLON' and 'CENLAT' field. Features with no geometry are left
+    as they are."""
+    index = CENTROID.get_index(input_file)
+    centroids = dict(zip (index['FID'], index['CENTROID'].tolist()))
+    
+    rows = ARCPY.da.UpdateCursor(input_file, ['OID@', 'CENLON', 'CENLAT'])
     for row in rows:
-        #Find the Centroid Point
-        featureCenter = row.getValue(ARCPY.Describe(input_file).shapeFieldName)
-        row.setValue('CENLON', featureCenter.centroid.X)
-        row.setValue('CENLAT', featureCenter.centroid.Y)
-        
-        rows.updateRow(row) # Update the new entry
-    del row, rows
+        if row[0] in centroids: rows.updateRow([row[0]] + centroids[row[0]]) # Update the new entry
+    del rows
     return True
 
 
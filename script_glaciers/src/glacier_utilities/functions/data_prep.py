@@ -25,9 +25,15 @@ License:     Although this application has been produced and tested
 import arcpy as ARCPY                                        #@UnresolvedImport
 import os
 import math
+import glacier_utilities.functions.data_geometry as GEOMETRY
 
-def repair_geometry (input_file):
-    """Repair geometry error and report the number of errors if any."""
+def repair_geometry (input_file, backend = 'ARCGIS'):
+    """Repair geometry error and report the number of errors if any. The
+    NUMPY backend (see data_geometry) only checks the rings without ArcGIS
+    and cannot repair them, so both counts are the errors found."""
+    if backend == 'NUMPY':
+        errors = str(GEOMETRY.NumPyBackend(input_file).check_geometry())
+        return [errors, errors]
     
     check = ARCPY.CheckGeometry_management(input_file) # Check geometry
     first_count = ARCPY.GetCount_management (check) # Number of Errors found.
@@ -42,8 +48,11 @@ def repair_geometry (input_file):
     return [str(first_count), str(secound_count)]
     
     
-def check_multipart (input_file, workspace):
-    """Check for multi-part polygons and report how many."""
+def check_multipart (input_file, workspace, backend = 'ARCGIS'):
+    """Check for multi-part polygons and report how many. The NUMPY backend
+    (see data_geometry) counts the outer rings without ArcGIS."""
+    if backend == 'NUMPY': return str(GEOMETRY.NumPyBackend(input_file).count_multipart())
+    
     original_count = 0
     final_count = 0
     
@@ -65,8 +74,14 @@ def check_multipart (input_file, workspace):
     return str(final_count - original_count)
 
 
-def check_area (input_file, workspace):
-    """check the area values and make sure they are reasonable."""
+def check_area (input_file, workspace, backend = 'ARCGIS'):
+    """check the area values and make sure they are reasonable. The NUMPY
+    backend (see data_geometry) projects the rings to the same equal area
+    projection without ArcGIS. The input must be in geographic coordinates."""
+    if backend == 'NUMPY':
+        original_sum, final_sum, difference = GEOMETRY.NumPyBackend(input_file).check_area()
+        return [str(round(original_sum, 3)), str(round(final_sum, 3)), str(round(difference, 3))]
+    
     original_sum = 0
     final_sum = 0
     
@@ -89,30 +104,49 @@ def check_area (input_file, workspace):
     return [str(round(original_sum, 3)), str(round(final_sum, 3)), str(round(original_sum-final_sum, 3))]
 
 
-def check_topology (input_file, workspace):
-    """Create Database and check for overlapping features. This function
-    is based on one previously created by Christian Kienholz, University
-    of Alaska, Fairbanks, 03/2012"""
-    # Create Database, add a data set and upload the features
-    database = ARCPY.CreateFileGDB_management (workspace, 'database.gdb')
-    dataset = ARCPY.CreateFeatureDataset_management (database, 'validation', input_file)
-    feature = str(dataset) +'\\feature'
-    ARCPY.CopyFeatures_management (input_file, feature)
-    
-    #Create topology and rules. Add feature to it
-    topology = ARCPY.CreateTopology_management (dataset, 'topology_rules')
-    ARCPY.AddFeatureClassToTopology_management (topology, feature, 1, 1)
-    ARCPY.AddRuleToTopology_management (topology, 'Must Not Overlap (Area)' , feature)
-    ARCPY.ValidateTopology_management (topology)
-    
-    # Export Errors
-    ARCPY.ExportTopologyErrors_management (topology, database, 'Errors')
-    error_count = ARCPY.GetCount_management (str(database)+ '\\Errors_poly')
-    original_count = ARCPY.GetCount_management (input_file)
+def find_overlaps (input_file):
+    """Find the features that overlap each other. Candidate pairs are those
+    whose extents overlap, found with an STR-tree (see data_geometry), and
+    only these are intersected. Returns a list of [FID, FID, overlap area]
+    where the area (km2) is from the Cylindrical Equal Area projection used
+    by check_area. Features that only touch along their edges are not
+    overlaps."""
+    fids = []
+    shapes = []
+    rows = ARCPY.da.SearchCursor(input_file, ['OID@', 'SHAPE@'])
+    for fid, shape in rows:
+        if shape is None: continue # Null geometry
+        fids.append(fid)
+        shapes.append(shape)
+    del rows
+    
+    boxes = [[shape.extent.XMin, shape.extent.YMin, shape.extent.XMax, shape.extent.YMax] for shape in shapes]
+    projection = ARCPY.SpatialReference(os.path.dirname(os.path.abspath(__file__)) + '\\projection\\Cylindrical_Equal_Area_world.prj')
     
-    ARCPY.Delete_management(database) # Delete database
+    overlaps = []
+    for first, second in GEOMETRY.STRTree(boxes).query_pairs():
+        if shapes[first].disjoint(shapes[second]): continue
+        overlap = shapes[first].intersect(shapes[second], 4) # Polygon of the shared area
+        if overlap.area > 0:
+            overlaps.append([fids[first], fids[second], overlap.projectAs(projection).area / 1000000])
+    return overlaps
 
-    return [str(error_count), str(original_count)]        
+
+def check_topology (input_file, workspace = None, backend = 'ARCGIS'):
+    """Check for overlapping features. Returns the number of overlapping
+    pairs, the number of features and the overlaps (see find_overlaps).
+    This replaces the 'Must Not Overlap (Area)' topology rule, originally
+    checked by Christian Kienholz, University of Alaska, Fairbanks, 03/2012,
+    in a file geodatabase. Nothing is written to the workspace, it is kept
+    for older callers. The NUMPY backend (see data_geometry) measures the
+    overlaps without ArcGIS. The input must be in geographic coordinates."""
+    if backend == 'NUMPY':
+        original_count, overlaps = GEOMETRY.NumPyBackend(input_file).find_overlaps()
+        return [str(len(overlaps)), str(original_count), overlaps]
+    
+    overlaps = find_overlaps(input_file)
+    original_count = ARCPY.GetCount_management (input_file)
+    return [str(len(overlaps)), str(original_count), overlaps]
 
 
 def check_formate (input_file, headings):
@@ -0,0 +1,495 @@
+"""****************************************************************************
+ Name:         glacier_utilities.functions.data_raster
+ Purpose:      Array based raster helpers. Rasters are read into NumPy arrays
+     and glacier outlines are rasterized onto the same grid so that per
+     glacier statistics can be calculated without converting rasters to
+     polygons.
+
+Created:         Oct 18, 2026
+Author:          script.glaciers contributors
+Location:
+Contributors:
+
+Copyright:   (c) script.glaciers contributors 2026
+License:     Although this application has been produced and tested
+ successfully, no warranty expressed or implied is made regarding the
+ reliability and accuracy of the utility, or the data produced by it, on any
+ other system or for general or scientific purposes, nor shall the act of
+ distribution constitute any such warranty. It is also strongly recommended
+ that careful attention be paid to the contents of the metadata / help file
+ associated with these data to evaluate application limitations, restrictions
+ or intended use. The creators and distributors of the application shall not
+ be held liable for improper or incorrect use of the utility described and/
+ or contained herein.
+****************************************************************************"""
+import os
+import math
+import json
+import collections
+import arcpy as ARCPY                                        #@UnresolvedImport
+import numpy as NUMPY
+import glacier_utilities.general_utilities.file_cache as FILE_CACHE
+
+NODATA = -9999 # Value no data cells are set to while reading a raster
+BIN_NODATA = 65535 # Bin index of cells with no data or outside the bin range
+
+def read_window (raster, x_min, y_min, x_max, y_max):
+    """Read the block of a raster that covers the given extent into a floating
+    point NumPy array without writing a subset to disk. The extent is snapped
+    outward to the raster's cells and limited to the raster's extent. No data
+    cells are set to NaN. The array is returned with its geotransform which
+    is ordered the same as GDAL: (x min, cell width, 0, y max, 0, -cell height)."""
+    if not isinstance(raster, ARCPY.Raster): raster = ARCPY.Raster(raster)
+    cell_width = raster.meanCellWidth
+    cell_height = raster.meanCellHeight
+    
+    # Cell rows and columns of the window within the raster
+    first_col = max(int(math.floor((x_min - raster.extent.XMin) / cell_width)), 0)
+    last_col = min(int(math.ceil((x_max - raster.extent.XMin) / cell_width)), raster.width)
+    first_row = max(int(math.floor((raster.extent.YMax - y_max) / cell_height)), 0)
+    last_row = min(int(math.ceil((raster.extent.YMax - y_min) / cell_height)), raster.height)
+    
+    lower_left = ARCPY.Point(raster.extent.XMin + first_col * cell_width,
+                             raster.extent.YMax - last_row * cell_height)
+    array = ARCPY.RasterToNumPyArray(raster, lower_left, last_col - first_col,
+                                     last_row - first_row, NODATA).astype(NUMPY.float64)
+    array[array == NODATA] = NUMPY.nan
+    
+    geotransform = (lower_left.X, cell_width, 0.0,
+                    raster.extent.YMax - first_row * cell_height, 0.0, -cell_height)
+    return array, geotransform
+
+
+def get_rings (shape):
+    """Return the rings (outer boundaries and holes) of a polygon geometry as
+    a list of (n, 2) arrays of x, y coordinates. ArcGIS separates the rings
+    within a part with a None point."""
+    rings = []
+    for part in shape:
+        ring = []
+        for point in part:
+            if point is None: # Start of an interior ring
+                if len(ring) > 2: rings.append(NUMPY.array(ring, NUMPY.float64))
+                ring = []
+            else:
+                ring.append((point.X, point.Y))
+        if len(ring) > 2: rings.append(NUMPY.array(ring, NUMPY.float64))
+    return rings
+
+
+class DEMReader (object):
+    """DEMReader reads windows of a DEM through a cache of square tiles so
+    neighboring glaciers do not read the same cells again. The least recently
+    used tiles are dropped once the cache grows past its memory budget. It
+    has the same extent and cell attributes as an ARCPY.Raster so it can be
+    used in place of one by FeatureContext.
+    Attributes:
+    raster: The DEM path or an ARCPY.Raster of it.
+    tile_size (optional): Number of cells along each side of a tile.
+    memory_budget (optional): Megabytes of tiles to keep in the cache."""
+
+    def __init__ (self, raster, tile_size = 512, memory_budget = 256):
+        """init opens the DEM. Nothing is read until a window is asked for."""
+        if not isinstance(raster, ARCPY.Raster): raster = ARCPY.Raster(raster)
+        self.raster = raster
+        self.extent = raster.extent
+        self.spatialReference = raster.spatialReference
+        self.meanCellWidth = raster.meanCellWidth
+        self.meanCellHeight = raster.meanCellHeight
+        self.width = raster.width
+        self.height = raster.height
+        self.tile_size = tile_size
+        self.memory_budget = memory_budget * 1048576 # Bytes
+        self.hits = 0   # Tiles found in the cache
+        self.misses = 0 # Tiles read from the DEM
+
+        self.__tiles = collections.OrderedDict() # (tile row, tile col): array
+        self.__bytes = 0 # Size of the tiles in the cache
+
+#______________________________________________________________________________
+#***Methods********************************************************************
+    def get_tile (self, tile_row, tile_col):
+        """Return a tile of the DEM as a float32 array with no data as NaN.
+        Tiles on the right and bottom edges may be smaller than tile_size."""
+        key = (tile_row, tile_col)
+        if key in self.__tiles:
+            self.hits += 1
+            tile = self.__tiles.pop(key) # Move to the most recently used end
+            self.__tiles[key] = tile
+            return tile
+
+        self.misses += 1
+        first_row = tile_row * self.tile_size
+        first_col = tile_col * self.tile_size
+        rows = min(self.tile_size, self.height - first_row)
+        cols = min(self.tile_size, self.width - first_col)
+        lower_left = ARCPY.Point(self.extent.XMin + first_col * self.meanCellWidth,
+                                 self.extent.YMax - (first_row + rows) * self.meanCellHeight)
+        tile = ARCPY.RasterToNumPyArray(self.raster, lower_left, cols, rows, NODATA).astype(NUMPY.float32)
+        tile[tile == NODATA] = NUMPY.nan
+
+        self.__tiles[key] = tile
+        self.__bytes += tile.nbytes
+        while self.__bytes > self.memory_budget and len(self.__tiles) > 1:
+            self.__bytes -= self.__tiles.popitem(last = False)[1].nbytes # Drop least recently used
+        return tile
+
+
+    def read_window (self, x_min, y_min, x_max, y_max):
+        """Read the block of the DEM that covers the given extent into a
+        floating point NumPy array, snapped and limited the same as
+        read_window. The array is returned with its geotransform."""
+        first_col = max(int(math.floor((x_min - self.extent.XMin) / self.meanCellWidth)), 0)
+        last_col = min(int(math.ceil((x_max - self.extent.XMin) / self.meanCellWidth)), self.width)
+        first_row = max(int(math.floor((self.extent.YMax - y_max) / self.meanCellHeight)), 0)
+        last_row = min(int(math.ceil((self.extent.YMax - y_min) / self.meanCellHeight)), self.height)
+
+        # Copy the part of each tile that falls in the window
+        array = NUMPY.empty((max(last_row - first_row, 0), max(last_col - first_col, 0)), NUMPY.float64)
+        for tile_row in range (first_row // self.tile_size, (last_row - 1) // self.tile_size + 1):
+            for tile_col in range (first_col // self.tile_size, (last_col - 1) // self.tile_size + 1):
+                tile = self.get_tile(tile_row, tile_col)
+                top = tile_row * self.tile_size
+                left = tile_col * self.tile_size
+                row_start = max(first_row, top); row_end = min(last_row, top + tile.shape[0])
+                col_start = max(first_col, left); col_end = min(last_col, left + tile.shape[1])
+                array[row_start - first_row:row_end - first_row, col_start - first_col:col_end - first_col] = \
+                    tile[row_start - top:row_end - top, col_start - left:col_end - left]
+
+        geotransform = (self.extent.XMin + first_col * self.meanCellWidth, self.meanCellWidth, 0.0,
+                        self.extent.YMax - first_row * self.meanCellHeight, 0.0, -self.meanCellHeight)
+        return array, geotransform
+
+
+def read_blocks (raster, block_rows = 512):
+    """Generator that reads a raster in blocks of rows, top to bottom, so it
+    is never held in memory. Yields the first row of each block and the
+    block as a float32 array with no data as NaN."""
+    for first_row in range (0, raster.height, block_rows):
+        rows = min(block_rows, raster.height - first_row)
+        lower_left = ARCPY.Point(raster.extent.XMin, raster.extent.YMax - (first_row + rows) * raster.meanCellHeight)
+        block = ARCPY.RasterToNumPyArray(raster, lower_left, raster.width, rows, NODATA).astype(NUMPY.float32)
+        block[block == NODATA] = NUMPY.nan
+        yield first_row, block
+
+
+def write_sidecar (raster, source, store_file, settings = {}):
+    """Write the JSON sidecar (store_file + '.json') of a store holding the
+    georeference of the raster it was made from, the size and modified time
+    of the source if it is a file and any settings the store depends on."""
+    source_stamp = None
+    if os.path.isfile(str(source)): source_stamp = FILE_CACHE.file_stamp([str(source)])
+    georeference = {'SOURCE': str(source), 'STAMP': source_stamp,
+                    'XMIN': raster.extent.XMin, 'YMIN': raster.extent.YMin,
+                    'XMAX': raster.extent.XMax, 'YMAX': raster.extent.YMax,
+                    'CELLWIDTH': raster.meanCellWidth, 'CELLHEIGHT': raster.meanCellHeight,
+                    'WIDTH': raster.width, 'HEIGHT': raster.height,
+                    'SPATIALREFERENCE': raster.spatialReference.exportToString()}
+    georeference.update(settings)
+    sidecar = open (store_file + '.json', 'w')
+    json.dump(georeference, sidecar)
+    sidecar.close()
+
+
+def is_current (source, store_file, settings = {}):
+    """Return True if a store exists and was made from the source as it is
+    now with the same settings. An out of date store has its sidecar removed
+    so it is not used."""
+    if not (os.path.exists(store_file) and os.path.exists(store_file + '.json')): return False
+    sidecar = open (store_file + '.json', 'r')
+    georeference = json.load(sidecar)
+    sidecar.close()
+    if georeference['STAMP'] is None or georeference['STAMP'] == FILE_CACHE.file_stamp([str(source)]):
+        if all(georeference.get(key) == value for key, value in settings.items()): return True
+    os.remove(store_file + '.json') # Source or settings changed
+    return False
+
+
+def build_dem_store (raster, store_file, block_rows = 512):
+    """Convert a DEM to an uncompressed float32 NumPy (.npy) file, with no
+    data as NaN, that DEMStore can memory map. The JSON sidecar is written
+    last and marks the store complete."""
+    source = raster
+    if not isinstance(raster, ARCPY.Raster): raster = ARCPY.Raster(raster)
+    store = NUMPY.lib.format.open_memmap(store_file, 'w+', NUMPY.float32, (raster.height, raster.width))
+    for first_row, block in read_blocks(raster, block_rows):
+        store[first_row:first_row + block.shape[0]] = block
+    store.flush()
+    del store
+    write_sidecar(raster, source, store_file)
+    return store_file
+
+
+def get_dem_store (dem, store_file = None):
+    """Return the path of the memory mapped store of a DEM, building it if
+    it does not exist or the DEM has changed since it was built. By default
+    the store is kept next to the DEM (DEM name + '_Store.npy') so later runs
+    reuse it."""
+    if store_file is None: store_file = os.path.splitext(str(dem))[0] + '_Store.npy'
+    if is_current(dem, store_file): return store_file
+    return build_dem_store(dem, store_file)
+
+
+def build_bin_store (raster, store_file, min_bin = 0, max_bin = 8850, bin_size = 50, block_rows = 512):
+    """Convert a DEM to a uint16 NumPy (.npy) file of the elevation bin index,
+    floor((z - min_bin) / bin_size), of every cell that BinStore can memory
+    map. Cells with no data or outside of the bin range are BIN_NODATA."""
+    source = raster
+    if not isinstance(raster, ARCPY.Raster): raster = ARCPY.Raster(raster)
+    total_bins = int(round(math.ceil(float(max_bin - min_bin) / float(bin_size)), 0))
+    store = NUMPY.lib.format.open_memmap(store_file, 'w+', NUMPY.uint16, (raster.height, raster.width))
+    for first_row, block in read_blocks(raster, block_rows):
+        bins = bin_elevations(block.astype(NUMPY.float64), min_bin, bin_size)
+        bins[(bins < 0) | (bins >= total_bins)] = BIN_NODATA
+        store[first_row:first_row + block.shape[0]] = bins
+    store.flush()
+    del store
+    write_sidecar(raster, source, store_file, {'MINBIN': min_bin, 'MAXBIN': max_bin, 'BINSIZE': bin_size})
+    return store_file
+
+
+def get_bin_store (dem, min_bin = 0, max_bin = 8850, bin_size = 50, store_file = None):
+    """Return the path of the bin index store of a DEM for the bin settings,
+    building it if it does not exist or the DEM has changed. By default the
+    store is kept next to the DEM (DEM name + '_Bins_MINBIN_MAXBIN_BINSIZE.npy')
+    so each combination of bin settings is built once."""
+    if store_file is None:
+        store_file = os.path.splitext(str(dem))[0] + '_Bins_' + str(min_bin) + '_' + str(max_bin) + '_' + str(bin_size) + '.npy'
+    if is_current(dem, store_file, {'MINBIN': min_bin, 'MAXBIN': max_bin, 'BINSIZE': bin_size}): return store_file
+    return build_bin_store(dem, store_file, min_bin, max_bin, bin_size)
+
+
+def build_label_store (input_file, dem, store_file):
+    """Rasterize every glacier outline of a shapefile onto the grid of a DEM
+    as an int32 NumPy (.npy) label raster that DEMStore can memory map. Each
+    cell holds the FID + 1 of the glacier whose outline contains its center
+    (0 for no glacier). Where outlines overlap the higher FID is kept, and
+    the number of cells each lower FID lost is kept in the sidecar (see
+    get_label_overlaps). Only the window around each outline is rasterized
+    and written."""
+    raster = dem
+    if not isinstance(raster, ARCPY.Raster): raster = ARCPY.Raster(raster)
+    store = NUMPY.lib.format.open_memmap(store_file, 'w+', NUMPY.int32, (raster.height, raster.width))
+    store[:] = 0
+    overlaps = {} # FID: cells taken by a higher FID
+    rows = ARCPY.SearchCursor(input_file, '', '', 'FID; Shape', 'FID A')
+    for row in rows:
+        extent = row.shape.extent
+        first_col = max(int(math.floor((extent.XMin - raster.extent.XMin) / raster.meanCellWidth)), 0)
+        last_col = min(int(math.ceil((extent.XMax - raster.extent.XMin) / raster.meanCellWidth)), raster.width)
+        first_row = max(int(math.floor((raster.extent.YMax - extent.YMax) / raster.meanCellHeight)), 0)
+        last_row = min(int(math.ceil((raster.extent.YMax - extent.YMin) / raster.meanCellHeight)), raster.height)
+        if last_col <= first_col or last_row <= first_row: continue # Outside of the DEM
+        
+        geotransform = (raster.extent.XMin + first_col * raster.meanCellWidth, raster.meanCellWidth, 0.0,
+                        raster.extent.YMax - first_row * raster.meanCellHeight, 0.0, -raster.meanCellHeight)
+        coverage = rasterize_polygon(get_rings(row.shape), geotransform, last_row - first_row, last_col - first_col)
+        window = store[first_row:last_row, first_col:last_col]
+        taken = window[coverage > 0]
+        taken = NUMPY.sort(taken[taken > 0]) - 1 # FIDs of cells already labeled
+        if taken.size > 0:
+            fids, starts = NUMPY.unique(taken, return_index = True)
+            for fid, cells in zip(fids, NUMPY.diff(NUMPY.append(starts, taken.size))):
+                overlaps[str(fid)] = overlaps.get(str(fid), 0) + int(cells)
+        window[coverage > 0] = row.FID + 1
+    del row, rows
+    store.flush()
+    del store
+    write_sidecar(raster, dem, store_file, {'FEATURES': FILE_CACHE.file_stamp(FILE_CACHE.shapefile_parts(input_file)),
+                                            'OVERLAPS': overlaps})
+    return store_file
+
+
+def get_label_store (input_file, dem, store_file = None):
+    """Return the path of the label raster (see build_label_store) of a
+    shapefile's glaciers on a DEM, building it if it does not exist or the
+    shapefile or DEM have changed. By default it is kept next to the
+    shapefile (shapefile name + '_Labels.npy')."""
+    if store_file is None: store_file = os.path.splitext(input_file)[0] + '_Labels.npy'
+    features = FILE_CACHE.file_stamp(FILE_CACHE.shapefile_parts(input_file))
+    if is_current(dem, store_file, {'FEATURES': features}): return store_file
+    return build_label_store(input_file, dem, store_file)
+
+
+def get_label_overlaps (store_file):
+    """Return a dictionary of FID: the number of cells of the glacier that
+    were given to a higher FID where outlines overlap in a label raster (see
+    build_label_store). Empty if no outlines overlap."""
+    sidecar = open (store_file + '.json', 'r')
+    overlaps = json.load(sidecar).get('OVERLAPS', {})
+    sidecar.close()
+    return dict((int(fid), cells) for fid, cells in overlaps.items())
+
+
+def label_hypsometry (labels, bins, total_labels, total_bins, cell_area):
+    """Return a (total_labels, total_bins) array of the area of every label
+    in every elevation bin from a block of labels (0 to total_labels - 1)
+    and the matching block of bin indexes, with a single bincount. For a
+    block of a label raster row 0 is cells that are not glacier. Cells with
+    a bin index of -1 or BIN_NODATA are left out."""
+    labels = NUMPY.asarray(labels).ravel().astype(NUMPY.int64)
+    bins = NUMPY.asarray(bins).ravel().astype(NUMPY.int64)
+    inside = (bins >= 0) & (bins < total_bins)
+    counts = NUMPY.bincount(labels[inside] * total_bins + bins[inside], minlength = total_labels * total_bins)
+    return counts[:total_labels * total_bins].reshape(total_labels, total_bins) * cell_area
+
+
+def open_dem (dem, tile_size = 512, memory_budget = 256):
+    """Open a DEM for reading windows. A DEM store (.npy) is opened as a
+    DEMStore, anything else as a DEMReader."""
+    if str(dem).lower().endswith('.npy'): return DEMStore(dem)
+    return DEMReader(dem, tile_size, memory_budget)
+
+
+class DEMStore (object):
+    """DEMStore reads windows of a DEM converted by build_dem_store. The store
+    is memory mapped so a window is a slice of the file rather than a copy,
+    and worker processes opening the same store share the operating
+    system's page cache instead of each reading the DEM. It has the same
+    extent and cell attributes as an ARCPY.Raster and the same read_window
+    as a DEMReader so it can be used in place of either by FeatureContext.
+    Attributes:
+    store_file: Path of the .npy file written by build_dem_store."""
+
+    def __init__ (self, store_file):
+        """init memory maps the store and reads its georeference."""
+        sidecar = open (store_file + '.json', 'r')
+        georeference = json.load(sidecar)
+        sidecar.close()
+        self.store_file = store_file
+        self.georeference = georeference
+        self.array = NUMPY.load(store_file, mmap_mode = 'r') # Read only
+        self.extent = ARCPY.Extent(georeference['XMIN'], georeference['YMIN'],
+                                   georeference['XMAX'], georeference['YMAX'])
+        self.spatialReference = ARCPY.SpatialReference()
+        self.spatialReference.loadFromString(georeference['SPATIALREFERENCE'])
+        self.meanCellWidth = georeference['CELLWIDTH']
+        self.meanCellHeight = georeference['CELLHEIGHT']
+        self.width = georeference['WIDTH']
+        self.height = georeference['HEIGHT']
+
+#______________________________________________________________________________
+#***Methods********************************************************************
+    def read_window (self, x_min, y_min, x_max, y_max):
+        """Return the block of the DEM that covers the given extent, snapped
+        and limited the same as read_window, as a read only float32 view of
+        the store. The array is returned with its geotransform."""
+        first_col = max(int(math.floor((x_min - self.extent.XMin) / self.meanCellWidth)), 0)
+        last_col = min(int(math.ceil((x_max - self.extent.XMin) / self.meanCellWidth)), self.width)
+        first_row = max(int(math.floor((self.extent.YMax - y_max) / self.meanCellHeight)), 0)
+        last_row = min(int(math.ceil((self.extent.YMax - y_min) / self.meanCellHeight)), self.height)
+
+        array = self.array[first_row:max(last_row, first_row), first_col:max(last_col, first_col)]
+        geotransform = (self.extent.XMin + first_col * self.meanCellWidth, self.meanCellWidth, 0.0,
+                        self.extent.YMax - first_row * self.meanCellHeight, 0.0, -self.meanCellHeight)
+        return array, geotransform
+
+
+    def read_block (self, geotransform, rows, cols):
+        """Return the rows x cols block of the store whose upper left cell
+        is at the origin of the geotransform, such as that of a window read
+        from the same DEM, as a read only view of the store. Bin and label
+        stores (see build_bin_store and build_label_store) can be read the
+        same way."""
+        first_col = int(round((geotransform[0] - self.extent.XMin) / self.meanCellWidth))
+        first_row = int(round((self.extent.YMax - geotransform[3]) / self.meanCellHeight))
+        return self.array[first_row:first_row + rows, first_col:first_col + cols]
+
+
+class BinStore (DEMStore):
+    """BinStore reads blocks of the elevation bin index of a DEM converted by
+    build_bin_store, so binning a glacier is a slice of the store rather
+    than a calculation on its DEM window.
+    Attributes:
+    store_file: Path of the .npy file written by build_bin_store."""
+
+    def __init__ (self, store_file):
+        """init memory maps the store and reads its bin settings."""
+        DEMStore.__init__(self, store_file)
+        self.min_bin = self.georeference['MINBIN']
+        self.max_bin = self.georeference['MAXBIN']
+        self.bin_size = self.georeference['BINSIZE']
+
+#______________________________________________________________________________
+#***Methods********************************************************************
+    def read_bins (self, geotransform, rows, cols):
+        """Return the bin index of each cell of a block (see read_block) the
+        same as bin_elevations. Cells with no data or outside of the bin
+        range are -1."""
+        bins = self.read_block(geotransform, rows, cols).astype(NUMPY.int64)
+        bins[bins == BIN_NODATA] = -1
+        return bins
+
+
+def get_paths (shape):
+    """Return the parts of a polyline geometry as a list of (n, 2) arrays of
+    x, y coordinates."""
+    paths = []
+    for part in shape:
+        path = [(point.X, point.Y) for point in part if point is not None]
+        if len(path) > 1: paths.append(NUMPY.array(path, NUMPY.float64))
+    return paths
+
+
+def rasterize_polygon (rings, geotransform, rows, cols, supersample = 1):
+    """Rasterize polygon rings onto a grid. Returns an array the size of the
+    grid holding the fraction of each cell covered by the polygon. With a
+    supersample of 1 a cell is either in (1.0) or out (0.0) based on its
+    center, which is how ArcGIS rasterizes polygons. Larger values split
+    each cell into supersample x supersample samples to estimate partial
+    coverage along the outline. The even-odd rule is used so holes
+    (nunataks) are excluded."""
+    coverage = NUMPY.zeros((rows * supersample, cols * supersample), NUMPY.float32)
+    if len(rings) == 0: return coverage[::supersample, ::supersample]
+
+    # Gather every edge of every ring into start and end coordinate arrays
+    x_start = NUMPY.concatenate([ring[:, 0] for ring in rings])
+    y_start = NUMPY.concatenate([ring[:, 1] for ring in rings])
+    x_end = NUMPY.concatenate([NUMPY.roll(ring[:, 0], -1) for ring in rings])
+    y_end = NUMPY.concatenate([NUMPY.roll(ring[:, 1], -1) for ring in rings])
+
+    x_min = geotransform[0]
+    y_max = geotransform[3]
+    x_step = geotransform[1] / supersample
+    y_step = -geotransform[5] / supersample
+
+    # Limit scan lines to those within the rings extent
+    first = max(int(math.floor((y_max - y_start.max()) / y_step)), 0)
+    last = min(int(math.ceil((y_max - y_start.min()) / y_step)) + 1, rows * supersample)
+
+    for row in range (first, last): # Scan line through the center of each sample row
+        y = y_max - (row + 0.5) * y_step
+        crossing = (y_start > y) != (y_end > y) # Edges the scan line crosses
+        if not crossing.any(): continue
+
+        x0 = x_start[crossing]; y0 = y_start[crossing]
+        x = x0 + (y - y0) * (x_end[crossing] - x0) / (y_end[crossing] - y0)
+        x.sort()
+
+        # Fill samples whose centers fall between pairs of crossings
+        start = NUMPY.ceil((x[0::2] - x_min) / x_step - 0.5).astype(int).clip(0, cols * supersample)
+        stop = NUMPY.ceil((x[1::2] - x_min) / x_step - 0.5).astype(int).clip(0, cols * supersample)
+        for begin, end in zip(start, stop):
+            coverage[row, begin:end] = 1.0
+
+    if supersample > 1: # Average the samples back to the grid cells
+        coverage = coverage.reshape(rows, supersample, cols, supersample).mean(axis = 3).mean(axis = 1)
+    return coverage
+
+
+def bin_elevations (elevation, min_bin = 0, bin_size = 50):
+    """Return the elevation bin index, floor((z - min_bin) / bin_size), of
+    every cell in an elevation array. No data cells are given an index of -1."""
+    index = NUMPY.floor((elevation - min_bin) / float(bin_size))
+    index[NUMPY.isnan(index)] = -1
+    return index.astype(NUMPY.int64)
+
+
+def weighted_percentile (values, weights, percent):
+    """Return the weighted percentile (0 - 100) of a list of values. The value
+    returned is the first value, in sorted order, at which the cumulative
+    weight reaches the percent of the total weight."""
+    order = NUMPY.argsort(values)
+    cumulative = NUMPY.cumsum(weights[order])
+    position = NUMPY.searchsorted(cumulative, cumulative[-1] * percent / 100.0)
+    return values[order][min(position, len(values) - 1)]
@@ -0,0 +1,117 @@
+"""****************************************************************************
+ Name: glacier_utilities.general_utilities.file_cache
+ Purpose: Remembers results calculated from input files so they can be reused
+         while the files are unchanged. A file is considered unchanged if its
+         size and modified time match, or failing that, if its content hash
+         matches.
+
+Created: Oct 18, 2026
+Author:  script.glaciers contributors
+Location:
+Contributors:
+
+Copyright:   (c) script.glaciers contributors 2026
+License:     Although this application has been produced and tested
+ successfully, no warranty expressed or implied is made regarding the
+ reliability and accuracy of the utility, or the data produced by it, on any
+ other system or for general or scientific purposes, nor shall the act of
+ distribution constitute any such warranty. It is also strongly recommended
+ that careful attention be paid to the contents of the metadata / help file
+ associated with these data to evaluate application limitations, restrictions
+ or intended use. The creators and distributors of the application shall not
+ be held liable for improper or incorrect use of the utility described and/
+ or contained herein.
+****************************************************************************"""
+import os
+import json
+import hashlib
+
+def shapefile_parts (shapefile, extensions = ('.shp', '.dbf')):
+    """Return the paths of the files making up a shapefile that hold its
+    geometry and attributes."""
+    base = os.path.splitext(shapefile)[0]
+    return [base + extension for extension in extensions]
+
+
+def file_stamp (paths):
+    """Return the size and modified time of each file."""
+    return [[os.path.getsize(path), os.path.getmtime(path)] for path in paths]
+
+
+def file_hash (paths, block_size = 1048576):
+    """Return a SHA-1 hash of the content of the files, read in blocks."""
+    content_hash = hashlib.sha1()
+    for path in paths:
+        input_file = open (path, 'rb')
+        block = input_file.read(block_size)
+        while block:
+            content_hash.update(block)
+            block = input_file.read(block_size)
+        input_file.close()
+    return content_hash.hexdigest()
+
+
+class FileCache (object):
+    """FileCache stores values against a key and the files they were made
+    from in a JSON file.
+    Attributes:
+    cache_file: Path of the JSON file the cache is kept in."""
+
+    def __init__ (self, cache_file):
+        """init reads the cache file if there is one."""
+        self.__cache_file = cache_file
+        self.__entries = {} # Key: {'STAMP', 'HASH', 'SALT', 'VALUE'}
+        if os.path.exists(cache_file):
+            try:
+                cache = open (cache_file, 'r')
+                self.__entries = json.load(cache)
+                cache.close()
+            except ValueError: # Unreadable cache, start over
+                self.__entries = {}
+
+#______________________________________________________________________________
+#***Methods********************************************************************
+    def lookup (self, key, paths, salt = ''):
+        """Return the value stored for the key if the files and salt (any
+        string describing the settings the value depends on) match those it
+        was stored with. Otherwise return None."""
+        entry = self.__entries.get(key)
+        if entry is None or entry['SALT'] <> salt: return None
+        if not all(os.path.exists(path) for path in paths): return None
+
+        stamp = file_stamp(paths)
+        if stamp == entry['STAMP']: return entry['VALUE']
+
+        # Files were touched or copied. Compare the content.
+        if file_hash(paths) <> entry['HASH']: return None
+        entry['STAMP'] = stamp
+        self.save()
+        return entry['VALUE']
+
+
+    def store (self, key, paths, value, salt = ''):
+        """Store a value for the key along with the state of the files it was
+        made from and save the cache. The value must be JSON serializable."""
+        self.__entries[key] = {'STAMP': file_stamp(paths), 'HASH': file_hash(paths),
+                               'SALT': salt, 'VALUE': value}
+        self.save()
+
+
+    def save (self):
+        """Write the cache to a temporary file which then replaces the cache
+        file so it is never left partly written."""
+        temporary = self.__cache_file + '.tmp'
+        cache = open (temporary, 'w')
+        json.dump(self.__entries, cache)
+        cache.close()
+        try: os.rename(temporary, self.__cache_file)
+        except OSError: # Windows will not rename over an existing file
+            os.remove(self.__cache_file)
+            os.rename(temporary, self.__cache_file)
+
+
+#Driver
+def main():
+    pass
+if __name__ == '__main__':
+    main()
@@ -22,12 +22,34 @@ License:     Although this application has been produced and tested
  or contained herein.
 ****************************************************************************"""
 import os
+import copy
 import glob
 
+def parse_value (var_type, value):
+    """Convert the value of a variable from the .var file to its type."""
+    if var_type == 'STRING': # Return the value as a string
+        return value
+    if var_type == 'INTEGER': # Return the value as an int
+        return int(value)
+    if var_type == 'FLOAT': # Return the value as a float
+        return float(value)
+    if var_type == 'BOOLEAN': # Return the value as boolean
+        return value in ('True', '1')
+    if var_type == 'LIST': # Return the value as a list
+        return value.replace(' ', '').split (',')
+    if var_type == 'LISTS': # Return the value as a list of lists
+        list_strings = value.replace(' ', '').split (',')
+        for index, item in enumerate (list_strings):
+            list_strings [index] = item.replace('(', '').replace(')', '').split(';')
+        return list_strings
+    return 'VARIABLE NOT FOUND' # Unknown type
+
+
 class Variables (object):
     """Stores and calls variables to be used by the application. This module
        works with a configuration file and stores the information perminatly
-       so that changes are remembered between runs."""
+       so that changes are remembered between runs. The file is parsed once
+       and read again only if it is changed on disk."""
   
     def __init__ (self):
         """ init starts the variables module and locates the associated .var
@@ -35,6 +57,10 @@ class Variables (object):
         module or an error will be generated."""
         
         self.__variables = '' #Store the path of the variables file
+        self.__values = {}    # Variable name: typed value
+        self.__types = {}     # Variable name: type
+        self.__raw = {}       # Variable name: value as written in the file
+        self.__mtime = None   # Modified time of the .var file when parsed
         
         path = os.path.dirname(os.path.abspath(__file__)) # Get modules path.
         # Search files in path with the extension .var and add the path to it.
@@ -42,83 +68,115 @@ class Variables (object):
             self.__variables = path + '\\' + os.path.basename(f) 
 #______________________________________________________________________________
 #***Methods********************************************************************
-    def read_variable (self, var_name):
-        """Read a variable from the .var file and return its value."""
+    def __load (self):
+        """Parse the .var file into the variable dictionaries if it has not
+        been parsed or has been modified since."""
+        mtime = os.path.getmtime(self.__variables)
+        if mtime == self.__mtime: return
+        
+        values = {}
+        types = {}
+        raw = {}
         variables = open (self.__variables, 'r')
         for line in variables:
             if line[0] <> '#': # Don't bother reading note lines
                 # Remove spaces and page breaks in order to create a list of
                 # just variable name and value.
-                var_line = (line.replace(' ', '').replace('\n', '')).split ('=')
-                if var_line [0] == var_name: 
-                    if var_line [1] == 'STRING': # Return the value as a string
-                        return var_line [2] 
-                        break
-                    if var_line [1] == 'INTEGER': # Return the value as an int
-                        return int(var_line [2]) 
-                        break 
-                    if var_line [1] == 'FLOAT': # Return the value as a float
-                        return float(var_line[2])
-                        break
-                    if var_line [1] == 'BOOLEAN': # Return the value as boolean
-                        return var_line[2] in ('True', '1')
-                        break
-                    if var_line [1] == 'LIST': # Return the value as a list
-                        return var_line [2].replace(' ', '').split (',')
-                        break
-                    if var_line [1] == 'LISTS': # Return the value as a list
-                        list_strings = var_line [2].replace(' ', '').split (',')
-                        for index, item in enumerate (list_strings):
-                            list_strings [index] = item.replace('(', '').replace(')', '').split(';')
-                        return list_strings
-                        break
+                var_line = (line.replace(' ', '').replace('\r', '').replace('\n', '')).split ('=')
+                if len(var_line) < 3 or var_line[0] in values: continue
+                types[var_line[0]] = var_line[1]
+                raw[var_line[0]] = var_line[2]
+                values[var_line[0]] = parse_value(var_line[1], var_line[2])
         variables.close() # Close the file and discard reference.
-        return 'VARIABLE NOT FOUND' # Return value if no variable is found.
+        
+        self.__values = values
+        self.__types = types
+        self.__raw = raw
+        self.__mtime = mtime
+    
+    
+    def read_variable (self, var_name):
+        """Read a variable from the .var file and return its value."""
+        self.__load()
+        if var_name not in self.__values: 
+            return 'VARIABLE NOT FOUND' # Return value if no variable is found.
+        return copy.deepcopy(self.__values[var_name]) # Lists are not shared
+
+
+    def get_snapshot (self):
+        """Return a read only copy of the current variables. The copy never
+        reads the .var file and can be passed to worker processes."""
+        self.__load()
+        return Snapshot(self.__values)
 
         
     def set_variable (self, var_name, var_type, var_value):
         """Write a new variable to the .var file, replacing the original."""
+        return self.set_variables({var_name: (var_type, var_value)})
+    
+    
+    def set_variables (self, new_values):
+        """Write several variables to the .var file at once, replacing the
+        originals. new_values is a dictionary of variable name: (type, value).
+        The file is written to a temporary file which then replaces the .var
+        file so it is never left partly written."""
         variables = open (self.__variables, 'r')
         var_list = [] #List to hold contents of .var file.
         result = "VALUE NOT SET" # Return value
         for line in variables:
             var_list.append(line) # Add items (lines) to var_list.
         variables.close() # Close the file and discard reference.
-          
-        new_variables = open (self.__variables, 'w')  
+        
+        temporary = self.__variables + '.tmp'
+        new_variables = open (temporary, 'w')  
         for item in var_list:
             if item[0] <> '#': # Don't bother reading note lines
                 # Remove spaces and page breaks in order to create a list of
                 # just variable name and value.
-                var_line = (item.replace(' ', '').replace('\n', '')).split ('=')
-                if var_line [0] == var_name: # If value is found replace with new
-                    item = str(var_name) + ' = ' + var_type + ' = ' + str(var_value) + '\n'
+                var_line = (item.replace(' ', '').replace('\r', '').replace('\n', '')).split ('=')
+                if var_line [0] in new_values: # If value is found replace with new
+                    var_type, var_value = new_values[var_line [0]]
+                    item = str(var_line [0]) + ' = ' + var_type + ' = ' + str(var_value) + '\n'
                     result = "VALUE SET"
             new_variables.write(item) # Write line to file.
         new_variables.close() # Close the file and discard reference.
+        
+        try: os.rename(temporary, self.__variables)
+        except OSError: # Windows will not rename over an existing file
+            os.remove(self.__variables)
+            os.rename(temporary, self.__variables)
+        self.__mtime = None # Parse the new file on the next read
         return result
     
     
     def reset_defaults (self):
         """Iterate through the .var document and reset the default values of
         all variables to their original state using the set_variables method.""" 
-        variables = open (self.__variables, 'r')
-        var_list = [] #List to hold contents of .var file.
-        for line in variables:
-            var_list.append(line) # Add items (lines) to var_list.
-        variables.close() # Close the file and discard reference.
+        self.__load()
+        defaults = {}
+        for var_name, var_type in self.__types.items():
+            # If a default value is found use it to reset the variable
+            if var_name.find('(Default)') <> -1:
+                defaults[var_name.replace('(Default)', '')] = (var_type, self.__raw[var_name])
+        self.set_variables(defaults)
+        return "RESET COMPLETE"
         
         
-        for item in var_list:
-            if item[0] <> '#': # Don't bother reading note lines
-                # Remove spaces and page breaks in order to create a list of
-                # just variable name and value.
-                var_line = (item.replace(' ', '').replace('\n', '')).split ('=')
-                # If value is found replace with new value (-1 is not found)
-                if var_line [0].find('(Default)') <> -1:
-                    #Reset the default value using the set_variable method
-                    self.set_variable(var_line[0].replace('(Default)', ''), var_line[1], var_line[2])
-        return "RESET COMPLETE"
+class Snapshot (object):
+    """A read only copy of the variables taken from Variables.get_snapshot.
+    Snapshot holds only a dictionary so it can be pickled and sent to worker
+    processes."""
+    
+    def __init__ (self, values):
+        """init copies the variable values."""
+        self.__values = copy.deepcopy(values)
+#______________________________________________________________________________
+#***Methods********************************************************************
+    def read_variable (self, var_name):
+        """Return the value of a variable."""
+        if var_name not in self.__values: 
+            return 'VARIABLE NOT FOUND' # Return value if no variable is found.
+        return copy.deepcopy(self.__values[var_name]) # Lists are not shared
         
         
 #Driver
@@ -0,0 +1,129 @@
+"""****************************************************************************
+Name:        Output File Checkpoint
+Purpose:     Create and maintain a checkpoint file recording the features a
+    run has finished so that an interrupted run can be resumed.
+
+Created:     Oct 18, 2026
+Author:      script.glaciers contributors
+Location:
+Contributors:
+
+Copyright: (c) script.glaciers contributors 2026
+License: Although this application has been produced and tested
+ successfully, no warranty expressed or implied is made regarding the
+ reliability and accuracy of the utility, or the data produced by it, on any
+ other system or for general or scientific purposes, nor shall the act of
+ distribution constitute any such warranty. It is also strongly recommended
+ that careful attention be paid to the contents of the metadata / help file
+ associated with these data to evaluate application limitations, restrictions
+ or intended use. The creators and distributors of the application shall not
+ be held liable for improper or incorrect use of the utility described and/
+ or contained herein.
+****************************************************************************"""
+import os
+import json
+
+class Checkpoint (object):
+    """Checkpoint records every finished feature, together with its table
+    rows, as one line of JSON appended to a checkpoint file. Lines are flushed
+    to disk as they are written so the file survives a crash. Only where each
+    finished feature's record starts in the file is kept in memory, records
+    are read back from the file when they are needed.
+    Attributes:
+    output: The folder to write the checkpoint file to.
+    checkpoint_name (optional): A String for the name of the checkpoint file.
+    resume (optional): If True, records already in the file are read back
+        and new records are appended. Otherwise the file is started over."""
+
+    def __init__ (self, output, checkpoint_name = 'Checkpoint', resume = False):
+        """init creates the checkpoint file or, when resuming, finds the
+        records already in it."""
+        self.__checkpointfile = output + '\\' + checkpoint_name + '.txt'
+        self.__completed = {}   # FID: file offset of the record of features that finished
+        self.__quarantined = {} # FID: record of features that failed (no table rows)
+        self.__reader = None    # Open when records are read back
+
+        if resume == True and os.path.exists(self.__checkpointfile):
+            checkpoint = open (self.__checkpointfile, 'rb+')
+            while True:
+                offset = checkpoint.tell()
+                line = checkpoint.readline()
+                if line == '': break
+                if not line.endswith('\n'): # Partial line written during a crash
+                    checkpoint.truncate(offset)
+                    break
+                try: record = json.loads(line)
+                except ValueError: continue
+                if record['STATUS'] == 'DONE':
+                    self.__completed[record['FID']] = offset
+                    self.__quarantined.pop(record['FID'], None)
+                else:
+                    self.__quarantined[record['FID']] = record
+            checkpoint.close()
+        else:
+            open (self.__checkpointfile, 'wb').close() # Start an empty checkpoint
+
+#______________________________________________________________________________
+#***Methods********************************************************************
+    def get_name (self):
+        """Return the checkpoint path and name."""
+        return self.__checkpointfile
+
+
+    def get_completed (self):
+        """Return a set of the FIDs of every finished feature."""
+        return set(self.__completed.keys())
+
+
+    def get_quarantined (self):
+        """Return the records of features that failed every attempt, in FID
+        order. These are attempted again when the run is resumed."""
+        return [self.__quarantined[fid] for fid in sorted(self.__quarantined.keys())]
+
+
+    def is_complete (self, fid):
+        """Return True if the feature has finished."""
+        return fid in self.__completed
+
+
+    def read_record (self, fid):
+        """Read the record of a finished feature back from the checkpoint
+        file (see print_record)."""
+        if self.__reader is None: self.__reader = open (self.__checkpointfile, 'rb')
+        self.__reader.seek(self.__completed[fid])
+        return json.loads(self.__reader.readline())
+
+
+    def print_record (self, fid, glimsid, hypsometry = None, slope = None, aspect = None, log = [], status = 'DONE'):
+        """Append a feature's record to the checkpoint file. Status is either
+        'DONE' or 'QUARANTINED'."""
+        record = {'FID': fid, 'GLIMSID': glimsid, 'HYPSOMETRY': hypsometry,
+                  'SLOPE': slope, 'ASPECT': aspect, 'LOG': log, 'STATUS': status}
+
+        checkpoint = open (self.__checkpointfile, 'ab')
+        checkpoint.seek(0, os.SEEK_END)
+        offset = checkpoint.tell()
+        checkpoint.write(json.dumps(record) + '\n')
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno()) # Make sure the record reaches the disk
+        checkpoint.close()
+
+        if status == 'DONE':
+            self.__completed[fid] = offset
+            self.__quarantined.pop(fid, None)
+        else:
+            self.__quarantined[fid] = record
+        return record
+
+
+    def close (self):
+        """Close the file records are read back from."""
+        if self.__reader is not None: self.__reader.close()
+        self.__reader = None
+
+
+#Driver
+def main():
+    pass
+if __name__ == '__main__':
+    main()
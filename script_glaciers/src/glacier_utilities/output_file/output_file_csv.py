@@ -19,28 +19,38 @@ License: Although this application has been produced and tested
  be held liable for improper or incorrect use of the utility described and/
  or contained herein.
 ****************************************************************************"""
+import os
+import csv
+import collections
 
 class CSV (object):
-    """csv is used to create, update and print information to a csv file.
+    """csv is used to create, update and print information to a csv file. The
+    file is opened once and rows are appended to it as they are printed, so
+    memory use does not grow with the number of rows.
     Attributes:
     csv Name (optional): A String for the name of the csv file.
-    headers (optional): A list of headers to populate the csv file."""
+    headers (optional): A list of headers to populate the csv file.
+    flush_rows (optional): Rows written between flushes to disk.
+    tail (optional): Number of the most recent rows kept in memory for
+        get_records. If 0 get_records reads the rows back from the file."""
     
     # Create the csv file (.csv file) and populate the first line with headers.
-    def __init__ (self, output, csv_name = 'csv', headers = []):
-        """init starts the stop watch, creates the Log '.txt' file and populates
-        it with the current date and time."""
+    def __init__ (self, output, csv_name = 'csv', headers = [], flush_rows = 100, tail = 0):
+        """init creates the csv file, writes the header to it and leaves it
+        open for rows to be appended."""
         
         # initialize instance variables
         self.__csvfile = output + '\\' + csv_name + '.csv'
         self.__header = headers # Global variable - The header of the csv file.
-        self.__content = [] # List of Lists. Each internal list contains one row.
+        self.__flush_rows = max(int(flush_rows), 1)
+        self.__tail = collections.deque([], max(int(tail), 0)) # Most recent rows
         self.__records = 0
+        self.__unflushed = 0 # Rows written since the last flush
         
-        output_file = open (self.__csvfile, 'w') # Open CSV hard copy
-        for item in self.__header: # Print the header to the CSV.
-            output_file.write(item + ',')
-        output_file.close() # Close the csv hard copy
+        self.__output_file = open (self.__csvfile, 'wb') # Open CSV hard copy
+        self.__writer = csv.writer(self.__output_file, lineterminator = '\n')
+        self.__writer.writerow(list(self.__header) + ['']) # Print the header to the CSV.
+        self.flush()
         
 #______________________________________________________________________________
 #***Methods********************************************************************
@@ -55,8 +65,19 @@ class CSV (object):
     
     
     def get_records (self):
-        """Returns a list of lists. Each internal list represents a record"""
-        return self.__content
+        """Returns a list of lists. Each internal list represents a record. If
+        a tail is kept only the most recent rows are returned, otherwise every
+        row is read back from the file."""
+        if self.__tail.maxlen > 0: return list(self.__tail)
+        
+        self.flush()
+        records = []
+        input_file = open (self.__csvfile, 'rb')
+        reader = csv.reader(input_file)
+        reader.next() # Skip the header
+        for row in reader: records.append(row[:-1]) # Drop the trailing empty item
+        input_file.close()
+        return records
     
     
     def get_rows (self):
@@ -65,27 +86,88 @@ class CSV (object):
     
     
     def print_line (self, row_list):
-        """Prints a line to the csv file."""
+        """Appends a line to the csv file. The file is flushed to disk every
+        flush_rows rows."""
         try:
-            self.__content.append(row_list) # Append new row to content.
-            
-            output_file = open (self.__csvfile, 'w') # Open CSV hard copy
-            for item in self.__header: # Print the header to the CSV.
-                output_file.write(item + ',')
-            output_file.write('\n') # Move cursor to next line
-            
-            # Write __content to the CSV.
-            for each_list in self.__content: # Iterate through each List
-                for each_item in each_list: # Iterate through Items
-                    output_file.write(each_item + ',')
-                output_file.write('\n') # Move cursor to next row in CSV
-            
-            output_file.close() # Close the csv hard copy
+            # Rows end with a separator to match the header and older tables.
+            self.__writer.writerow(list(row_list) + [''])
+            if self.__tail.maxlen > 0: self.__tail.append(row_list)
             self.__records += 1 # Increase the Record Count by 1
+            
+            self.__unflushed += 1
+            if self.__unflushed >= self.__flush_rows: self.flush()
             return "PRINTED TO CSV"
         except:
             return "COULD NOT PRINT TO CSV"
+    
+    
+    def flush (self):
+        """Write any buffered rows to disk."""
+        if self.__output_file.closed: return
+        self.__output_file.flush()
+        os.fsync(self.__output_file.fileno())
+        self.__unflushed = 0
+    
+    
+    def close (self):
+        """Flush and close the csv file. No more lines can be printed."""
+        if self.__output_file.closed: return
+        self.flush()
+        self.__output_file.close()
+
 
+
+def dense_hypsometry (hypsometry_bins, total_bins):
+    """Expand [bin index, area] pairs to a list of every bin's area as the
+    hypsometry table expects. Bins without area are 0.0."""
+    hypsometry = [str(0.0)] * total_bins
+    for index, bin_area in hypsometry_bins:
+        hypsometry[index] = str(round(float(bin_area), 0))
+    return hypsometry
+
+
+class HypsometryCSV (CSV):
+    """HypsometryCSV writes hypsometry kept as [bin index, area] pairs, only
+    for bins with area, to a csv file. The DENSE format is the original
+    table with a column for every bin. The LONG format has a row for each
+    bin with area holding the bin (its column name in the dense table) and
+    its area, which is much smaller as most bins of a glacier are empty. A
+    glacier with no bins with area has a single row with a BIN of 'NA' and
+    an AREA of 0.0 so every glacier is in the table.
+    Attributes:
+    csv Name (optional): A String for the name of the csv file.
+    info_header (optional): A list of the headers of the attribute and
+        statistics columns that start each row.
+    bin_header (optional): A list of the bin headers (see
+        DP.generate_bin_header).
+    table_format (optional): 'DENSE' or 'LONG'.
+    flush_rows, tail (optional): See CSV."""
+    
+    def __init__ (self, output, csv_name = 'csv', info_header = [], bin_header = [], table_format = 'DENSE', flush_rows = 100, tail = 0):
+        """init creates the csv file with the header for the format."""
+        if table_format not in ('DENSE', 'LONG'): raise ValueError('Unknown hypsometry format: ' + str(table_format))
+        self.__bin_header = bin_header
+        self.__format = table_format
+        if table_format == 'DENSE': headers = list(info_header) + list(bin_header)
+        else: headers = list(info_header) + ['BIN', 'AREA']
+        CSV.__init__(self, output, csv_name, headers, flush_rows, tail)
+        
+#______________________________________________________________________________
+#***Methods********************************************************************
+    def print_hypsometry (self, info, hypsometry_bins):
+        """Write the hypsometry of one glacier. Info is the list of attribute
+        and statistics values and hypsometry_bins the [bin index, area]
+        pairs of bins with area."""
+        if self.__format == 'DENSE':
+            return self.print_line(list(info) + dense_hypsometry(hypsometry_bins, len(self.__bin_header)))
+        
+        if len(hypsometry_bins) == 0: # Keep the glacier in the table
+            return self.print_line(list(info) + ['NA', str(0.0)])
+        result = "PRINTED TO CSV"
+        for index, bin_area in hypsometry_bins:
+            if self.print_line(list(info) + [self.__bin_header[index], str(round(float(bin_area), 0))]) <> "PRINTED TO CSV":
+                result = "COULD NOT PRINT TO CSV"
+        return result
              
 #Driver
 def main():
@@ -18,22 +18,45 @@ License:     Although this application has been produced and tested
  be held liable for improper or incorrect use of the utility described and/
  or contained herein.
 ****************************************************************************"""
+import os
+import time
+import atexit
 import glacier_utilities.general_utilities.stop_watch as stop_watch 
 
 class Log (object):
     """Log is used to create, update and print information to a Log file.
+    Lines are appended to the file from a small buffer which is written out
+    once it holds flush_lines lines or flush_seconds have passed since it was
+    last written, and when the application exits.
         Attributes:
             Log Name (optional): A String for the name of the Log file.
             Application (optional): The name of the application the Log file
-                is reporting on."""
+                is reporting on.
+            flush_lines (optional): Lines held before the buffer is written.
+            flush_seconds (optional): Seconds before the buffer is written.
+            max_bytes (optional): Size at which the Log file is rotated. The
+                full file is renamed 'Log.1.txt' (older files 'Log.2.txt' ...)
+                and a new file started. 0 never rotates.
+            backups (optional): Number of rotated Log files kept."""
 
-    def __init__ (self, output, log_name = 'Log', app_name = 'Application'):
+    def __init__ (self, output, log_name = 'Log', app_name = 'Application', 
+                  flush_lines = 20, flush_seconds = 5, max_bytes = 0, backups = 5):
         """init starts the stop watch, creates the Log '.txt' file and populates 
         it with the current date and time."""
         self.__clock = stop_watch.StopWatch() # Keeps a reference to the stop watch
+        self.__output = output
+        self.__log_name = log_name
         self.__logfile = output + '\\' + log_name + '.txt' # Assemble Log file path and name
-        #The content of the Log file. This is reprinted in it's entirety every time print line is called. 
-        self.__content = app_name + ' Log File: ' + '\n' 
+        self.__flush_lines = max(int(flush_lines), 1)
+        self.__flush_seconds = flush_seconds
+        self.__max_bytes = max_bytes
+        self.__backups = backups
+        self.__last_flush = time.time()
+        #Lines waiting to be written to the Log file.
+        self.__buffer = [app_name + ' Log File: ' + '\n']
+        
+        open (self.__logfile, 'w').close() # Start a new Log file
+        atexit.register(self.flush) # Buffered lines are written on exit
         
         # Assemble Date and Time for the Log file.
         content ='Year: ' + str(self.__clock.get_year()) + ' |'
@@ -49,31 +72,60 @@ class Log (object):
         """Prints a line to the Log file. supress_ts (time stamp) allows the user 
         to not include a time stamp. used for adding page breaks"""
         if supress_ts == False: # No suppression of time stamp.
-            self.__content = self.__content + str(self.__clock.get_elapsed_time()) + ' - ' + text + '\n'
+            self.__buffer.append(str(self.__clock.get_elapsed_time()) + ' - ' + text + '\n')
             print text
             
         if supress_ts == True: # Time stamp suppressed. Used in 'print_break'
-            self.__content = self.__content + text + '\n'
+            self.__buffer.append(text + '\n')
             print text
         
-        # Print old and new content to log file.
-        self.print_to_logfile()
+        # Write the buffer out if it is full or has been held long enough.
+        if len(self.__buffer) >= self.__flush_lines or \
+           time.time() - self.__last_flush >= self.__flush_seconds:
+            self.flush()
+
+    def flush (self):
+        """Appends the buffered lines to the Log file and rotates the file if
+        it has grown past max_bytes."""
+        if len(self.__buffer) > 0:
+            log = open (self.__logfile, 'a')
+            log.write(''.join(self.__buffer))
+            log.close()
+            self.__buffer = []
+        self.__last_flush = time.time()
+        
+        if self.__max_bytes > 0 and os.path.getsize(self.__logfile) >= self.__max_bytes:
+            self.__rotate()
 
     def print_to_logfile (self):
-        """ Prints '__content' to the log file overwriting what is currently there.
-        this is kept as a separate method so that it can be reprinted from outside
-        the module."""
-        log = open (self.__logfile, 'w')
-        log.write(self.__content)
-        log.close()
+        """ Writes any buffered lines to the log file. This is kept as a separate
+        method so that it can be called from outside the module."""
+        self.flush()
 
     def print_break (self, num_brks = 1):
         """Prints a line break in the Log file."""
         for _ in range (0, num_brks): self.print_line('', True)
         
     def get_content (self):
-        """Returns the string value of __content."""
-        return self.__content
+        """Returns the content of the current Log file as a string. The file is
+        read when this is called. Rotated files are not included."""
+        self.flush()
+        log = open (self.__logfile, 'r')
+        content = log.read()
+        log.close()
+        return content
+    
+    def __rotate (self):
+        """Renames the Log file to 'Log.1.txt', shifting older files up by one
+        and removing any beyond the number of backups, then starts a new file."""
+        def __backup (number): # Path of a rotated Log file
+            return self.__output + '\\' + self.__log_name + '.' + str(number) + '.txt'
+        
+        if os.path.exists(__backup(self.__backups)): os.remove(__backup(self.__backups))
+        for number in range (self.__backups - 1, 0, -1):
+            if os.path.exists(__backup(number)): os.rename(__backup(number), __backup(number + 1))
+        if self.__backups > 0: os.rename(self.__logfile, __backup(1))
+        open (self.__logfile, 'w').close()
 
 #Driver
 def main():